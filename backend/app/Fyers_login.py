@@ -8,7 +8,12 @@ import requests
 from urllib.parse import parse_qs, urlparse
 import pandas as pd
 import base64
+import json
+import threading
+import time
 import pytz
+from upstream import upstream_scheduler
+from master_download import download_master
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -26,31 +31,82 @@ FY_ID = "FA2060"
 TOTP_KEY = "FTJEBP37ZFWVUTGOBAJEXTS7D3CUPE7M"
 PIN = "5417"
 
+# Refresh the token this many seconds before it expires
+TOKEN_REFRESH_LEAD = 15 * 60
+# Retry delay when a scheduled refresh fails
+TOKEN_REFRESH_RETRY = 60
+# Refresh interval for a token whose expiry cannot be decoded
+TOKEN_REFRESH_FALLBACK = 8 * 60 * 60
+
+# In-memory token state shared by the REST client and the live socket
+_token_cache = {"token": None, "expires_at": 0, "fyers": None}
+_token_lock = threading.Lock()
+_token_listeners = []
+_refresh_timer = None
+# Held while a refresh runs, so concurrent triggers do not log in twice
+_refresh_lock = threading.Lock()
+
 def getEncodedString(string):
     string = str(string)
     base64_bytes = base64.b64encode(string.encode("ascii"))
     return base64_bytes.decode("ascii")
 
-def is_token_valid():
-    """Check if the current access token is valid"""
+def decode_token_expiry(access_token):
+    """Decode the `exp` claim of a Fyers JWT access token without a network call"""
     try:
+        payload = access_token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return int(claims['exp'])
+    except Exception:
+        return None
+
+def _set_cached_token(access_token):
+    """Store a token and its decoded expiry in the in-memory cache"""
+    with _token_lock:
+        if _token_cache["token"] != access_token:
+            _token_cache["fyers"] = None
+        _token_cache["token"] = access_token
+        _token_cache["expires_at"] = decode_token_expiry(access_token) or 0
+
+def _load_cached_token():
+    """Return the cached token, reading the token file on first use"""
+    if _token_cache["token"] is None:
         token_path = DATA_DIR / "access_token.txt"
         if not token_path.exists():
             logger.info("No access token file found")
-            return False
-            
+            return None
         with open(token_path, 'r') as f:
             access_token = f.read().strip()
-            
         if not access_token:
             logger.info("Empty access token")
+            return None
+        _set_cached_token(access_token)
+    return _token_cache["token"]
+
+def token_expires_in():
+    """Seconds until the cached token expires (0 if unknown or expired)"""
+    if _load_cached_token() is None:
+        return 0
+    return max(0, _token_cache["expires_at"] - time.time())
+
+def is_token_valid():
+    """Check if the current access token is valid using its decoded expiry"""
+    try:
+        access_token = _load_cached_token()
+        if not access_token:
             return False
-            
-        # Initialize Fyers model with the token
+
+        if _token_cache["expires_at"]:
+            remaining = _token_cache["expires_at"] - time.time()
+            if remaining > 60:
+                return True
+            logger.info(f"Access token expired or expiring in {int(remaining)}s")
+            return False
+
+        # Token could not be decoded, fall back to a profile check
         fyers = fyersModel.FyersModel(client_id=CLIENT_ID, is_async=False, token=access_token)
-        
-        # Try to get profile data to check token validity
-        profile_response = fyers.get_profile()
+        profile_response = upstream_scheduler.call("profile", fyers.get_profile, key=("profile", access_token))
         
         if profile_response.get('code') == 200:
             logger.info("Access token is valid")
@@ -68,8 +124,7 @@ def ensure_valid_token():
     try:
         if is_token_valid():
             logger.info("Using existing valid token")
-            with open(DATA_DIR / "access_token.txt", 'r') as f:
-                return f.read().strip()
+            return _token_cache["token"]
         
         logger.info("Getting new access token")
         return get_access_token()
@@ -78,6 +133,78 @@ def ensure_valid_token():
         logger.error(f"Error ensuring valid token: {str(e)}")
         raise
 
+def get_fyers_model():
+    """Get a shared REST client for the current access token"""
+    access_token = _load_cached_token()
+    if not access_token:
+        raise RuntimeError("No access token available")
+    with _token_lock:
+        if _token_cache["fyers"] is None:
+            _token_cache["fyers"] = fyersModel.FyersModel(client_id=CLIENT_ID, is_async=False, token=access_token)
+        return _token_cache["fyers"]
+
+def add_token_listener(callback):
+    """Register a callback invoked with the new token after every refresh"""
+    _token_listeners.append(callback)
+
+def token_refresh_running():
+    """Check if a token refresh is in progress"""
+    return _refresh_lock.locked()
+
+def refresh_access_token():
+    """
+    Generate a new token and hot-swap it into every registered listener.
+
+    Returns None without logging in when another refresh is already running.
+    """
+    if not _refresh_lock.acquire(blocking=False):
+        logger.info("Token refresh already in progress")
+        return None
+    try:
+        access_token = get_access_token()
+        for callback in list(_token_listeners):
+            try:
+                callback(access_token)
+            except Exception as e:
+                logger.error(f"Error in token listener {callback}: {str(e)}")
+        return access_token
+    finally:
+        _refresh_lock.release()
+
+def _scheduled_refresh():
+    try:
+        if refresh_access_token() is None:
+            # Another refresh is running, check again once it is likely done
+            schedule_token_refresh(delay=TOKEN_REFRESH_RETRY)
+            return
+        logger.info("Scheduled token refresh completed")
+        schedule_token_refresh()
+    except Exception as e:
+        logger.error(f"Scheduled token refresh failed: {str(e)}")
+        schedule_token_refresh(delay=TOKEN_REFRESH_RETRY)
+
+def schedule_token_refresh(delay=None):
+    """Schedule a background refresh ahead of the cached token's expiry"""
+    global _refresh_timer
+    cancel_token_refresh()
+    if delay is None:
+        if _load_cached_token() and not _token_cache["expires_at"]:
+            # Expiry unknown: refresh on a fixed interval instead of right away
+            delay = TOKEN_REFRESH_FALLBACK
+        else:
+            delay = max(0, token_expires_in() - TOKEN_REFRESH_LEAD)
+    _refresh_timer = threading.Timer(delay, _scheduled_refresh)
+    _refresh_timer.daemon = True
+    _refresh_timer.start()
+    logger.info(f"Token refresh scheduled in {int(delay)}s")
+
+def cancel_token_refresh():
+    """Cancel a pending scheduled refresh"""
+    global _refresh_timer
+    if _refresh_timer is not None:
+        _refresh_timer.cancel()
+        _refresh_timer = None
+
 def get_access_token():
     try:
         logger.info("Starting access token generation process")
@@ -145,6 +272,7 @@ def get_access_token():
         token_path = DATA_DIR / "access_token.txt"
         with open(token_path, 'w') as f:
             f.write(response['access_token'])
+        _set_cached_token(response['access_token'])
         logger.info(f"Access token saved to: {token_path}")
         
         return response['access_token']
@@ -153,47 +281,17 @@ def get_access_token():
         logger.error(f"Error in get_access_token: {str(e)}")
         raise
 
-def download_master_instruments():
+def download_master_instruments(force=False):
+    """Refresh master_file.csv, skipped when the upstream files have not changed"""
     try:
-        urls = {
-            "NSE_FO": "https://public.fyers.in/sym_details/NSE_FO_sym_master.json",
-            "BSE_FO": "https://public.fyers.in/sym_details/BSE_FO_sym_master.json"
-        }
-
-        df_all = pd.DataFrame()
-        for exchange, url in urls.items():
-            response = requests.get(url)
-            data = response.json()
-            df = pd.DataFrame.from_dict(data, orient='index')
-            df.reset_index(inplace=True)
-            df.rename(columns={'index': 'symbol'}, inplace=True)
-            
-            columns_to_keep = ['symbol', 'exSymbol', 'segment', 'exchange', 'expiryDate', 'strikePrice', 'exSymName']
-            df = df[columns_to_keep]
-            df = df[df['exSymbol'].isin(['NIFTY', 'BANKNIFTY','MIDCPNIFTY', 'FINNIFTY', 'SENSEX', 'BANKEX'])]
-            
-            # Add logging to check dates
-            logger.info(f"Sample raw expiry dates: {df['expiryDate'].head()}")
-            df['expiryDate'] = pd.to_datetime(df['expiryDate'], unit='s')
-            logger.info(f"Sample converted expiry dates: {df['expiryDate'].head()}")
-            
-            df_all = pd.concat([df_all, df])
-
-        output_path = DATA_DIR / "master_file.csv"
-        df_all.to_csv(output_path, index=False)
-        logger.info(f"Master instruments data saved to {output_path}")
-        
+        return download_master(DATA_DIR / "master_file.csv", force=force)
     except Exception as e:
         logger.error(f"Error in download_master_instruments: {str(e)}")
         raise
 
 def get_historical_data(symbol, days_back=10):
     try:
-        token_path = DATA_DIR / "access_token.txt"
-        with open(token_path, 'r') as f:
-            access_token = f.read().strip()
-
-        fyers = fyersModel.FyersModel(client_id=CLIENT_ID, is_async=False, token=access_token)
+        fyers = get_fyers_model()
         
         today = datetime.today()
         range_from = (today - timedelta(days=days_back)).strftime('%Y-%m-%d')
@@ -208,7 +306,7 @@ def get_historical_data(symbol, days_back=10):
             "cont_flag": "1"
         }
 
-        response = fyers.history(data=data)
+        response = upstream_scheduler.call("history", fyers.history, data=data)
         df = pd.DataFrame(response["candles"], 
                          columns=["timestamp", "open", "high", "low", "close", "volume"])
         
@@ -0,0 +1,339 @@
+import functools
+import re
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from datetime import time as dtime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from candle_store import CANDLE_SCHEMA, CandleStore, symbol_key
+from market_hours import IST_OFFSET, MARKET_CLOSE, MARKET_OPEN, now_ist
+from master_download import UNDERLYINGS
+from tick_archive import TICK_SCHEMA, TickArchive
+
+REQUIRED = object()
+# Longest range one query may scan
+MAX_DAYS = 400
+
+MONTHS = ("JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC")
+# Weekly contracts carry YY M DD (M is 1-9, O, N, D), monthly ones YY MMM
+_OPTION = re.compile(
+    r"^(?:[A-Z]+:)?(?P<underlying>%s)(?P<yy>\d{2})(?:(?P<mon>%s)|(?P<m>[1-9OND])(?P<dd>\d{2}))"
+    r"(?P<strike>\d+(?:\.\d+)?)(?P<kind>CE|PE)$" % ("|".join(sorted(UNDERLYINGS, key=len, reverse=True)), "|".join(MONTHS))
+)
+
+class QueryError(ValueError):
+    """Invalid analytics query parameters"""
+
+def parse_option(symbol: str) -> Optional[Tuple[str, Optional[date], Tuple[int, int], float, str]]:
+    """(underlying, expiry, (year, month), strike, CE/PE) of an option symbol; expiry is None for monthlies"""
+    match = _OPTION.match(symbol)
+    if not match:
+        return None
+    year = 2000 + int(match["yy"])
+    if match["mon"]:
+        expiry, month = None, MONTHS.index(match["mon"]) + 1
+    else:
+        month = {"O": 10, "N": 11, "D": 12}.get(match["m"]) or int(match["m"])
+        try:
+            expiry = date(year, month, int(match["dd"]))
+        except ValueError:
+            return None
+    return match["underlying"], expiry, (year, month), float(match["strike"]), match["kind"]
+
+def _to_date(value: str) -> date:
+    return date.fromisoformat(value)
+
+def _to_time(value: str) -> dtime:
+    return datetime.strptime(value, "%H:%M").time()
+
+def _to_bool(value: str) -> bool:
+    return value.lower() in ("1", "true", "yes")
+
+def _to_resolution(value: str) -> str:
+    if not re.fullmatch(r"\d+|1?D", value):
+        raise ValueError(value)
+    return value
+
+def _to_symbols(value: str) -> List[str]:
+    symbols = [item.strip() for item in value.split(",") if item.strip()]
+    # They become paths, so nothing but exchange:name
+    if not symbols or not all(re.fullmatch(r"[A-Z]+:[A-Z0-9&_.-]+", symbol) for symbol in symbols):
+        raise ValueError(value)
+    return symbols
+
+def _to_underlying(value: str) -> str:
+    if value not in (*UNDERLYINGS, "OTHER"):
+        raise ValueError(value)
+    return value
+
+def _seconds(when: dtime) -> int:
+    return when.hour * 3600 + when.minute * 60
+
+def _window_filter(days: List[str], start: dtime, end: dtime) -> ds.Expression:
+    """timestamp inside [start, end] IST on any of the days; plain ranges, so row group stats apply"""
+    ranges = []
+    for day in days:
+        midnight = int((np.datetime64(day, "s") - np.datetime64(0, "s")).astype(np.int64)) - IST_OFFSET
+        ranges.append((pc.field("timestamp") >= midnight + _seconds(start)) &
+                      (pc.field("timestamp") <= midnight + _seconds(end) + 59))
+    return functools.reduce(lambda a, b: a | b, ranges) if ranges else pc.scalar(False)
+
+def _with_day(table: pa.Table) -> pa.Table:
+    """Adds the IST day as days since the epoch"""
+    day = pc.divide(pc.add(table["timestamp"], IST_OFFSET), 86400)
+    return table.append_column("day", day)
+
+def _day_strings(days: pa.ChunkedArray) -> List[str]:
+    return [str(value) for value in (np.asarray(days, dtype=np.int64).astype("datetime64[D]"))]
+
+def _first_last(table: pa.Table, keys: List[str], aggregates: List[Tuple[str, str]]) -> pa.Table:
+    # first/last need input order, which the threaded hash aggregate does not keep
+    table = table.sort_by([(key, "ascending") for key in keys] + [("timestamp", "ascending")])
+    return table.group_by(keys, use_threads=False).aggregate(aggregates)
+
+@dataclass
+class Query:
+    description: str
+    params: Dict[str, Tuple[Callable[[str], Any], Any]]
+    run: Callable[..., Tuple[pa.Table, Optional[Dict[str, Any]]]]
+
+class Analytics:
+    """
+    Whitelisted aggregate queries over the local candle store and tick archive.
+
+    Every query is a fixed pyarrow.dataset scan: files are pruned by day
+    (and by underlying for ticks) before reading, the remaining filters
+    are pushed down to row group statistics, and the scan and aggregation
+    run multi-threaded. Only local data is read, the broker is never
+    called. Results are columnar: one list per column.
+    """
+
+    def __init__(self, candle_store: CandleStore, tick_archive: TickArchive, index_symbols: Dict[str, str]):
+        self.candle_store = candle_store
+        self.tick_archive = tick_archive
+        self.index_symbols = index_symbols
+        window = {"start": (_to_date, None), "end": (_to_date, None),
+                  "from_time": (_to_time, MARKET_OPEN), "to_time": (_to_time, MARKET_CLOSE)}
+        self.queries: Dict[str, Query] = {
+            "straddle_decay": Query(
+                "ATM straddle premium change between two times of day, per day, on the nearest expiry",
+                {"index": (str, REQUIRED), "resolution": (_to_resolution, "1"), "expiry_days_only": (_to_bool, False), **window},
+                self.straddle_decay),
+            "candle_summary": Query(
+                "Daily OHLCV of stored candles inside a time-of-day window",
+                {"symbols": (_to_symbols, REQUIRED), "resolution": (_to_resolution, "1"), **window},
+                self.candle_summary),
+            "tick_summary": Query(
+                "Daily tick count, range, traded volume and average quoted spread of archived ticks",
+                {"underlying": (_to_underlying, None), "symbols": (_to_symbols, None), **window},
+                self.tick_summary),
+        }
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            name: {"description": query.description,
+                   "params": {param: {"required": default is REQUIRED,
+                                      "default": None if default is REQUIRED or default is None else str(default)}
+                              for param, (_, default) in query.params.items()}}
+            for name, query in self.queries.items()
+        }
+
+    def run(self, name: str, raw: Dict[str, str]) -> Dict[str, Any]:
+        query = self.queries[name]
+        unknown = set(raw) - set(query.params)
+        if unknown:
+            raise QueryError(f"Unknown parameters for {name}: {sorted(unknown)}")
+        params = {}
+        for param, (parse, default) in query.params.items():
+            if param in raw:
+                try:
+                    params[param] = parse(raw[param])
+                except ValueError:
+                    raise QueryError(f"Invalid {param}: {raw[param]!r}")
+            elif default is REQUIRED:
+                raise QueryError(f"Missing parameter: {param}")
+            else:
+                params[param] = default
+        params["end"] = params["end"] or now_ist().date()
+        params["start"] = params["start"] or params["end"] - timedelta(days=30)
+        if params["start"] > params["end"] or (params["end"] - params["start"]).days > MAX_DAYS:
+            raise QueryError(f"start must not be after end, and the range at most {MAX_DAYS} days")
+
+        started = time.perf_counter()
+        table, summary = query.run(**params)
+        return {
+            "query": name,
+            "params": {key: value if isinstance(value, (str, int, float, bool, list)) or value is None else str(value)
+                       for key, value in params.items()},
+            "rows": table.num_rows,
+            "columns": table.column_names,
+            "data": table.to_pydict(),
+            "summary": summary,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    def _candles(self, files: List[str], resolution: str, columns: List[str],
+                 filter: Optional[ds.Expression] = None) -> pa.Table:
+        """Scan candle day files, with the store's symbol directory as a `symbol` column"""
+        schema = CANDLE_SCHEMA.append(pa.field("symbol", pa.string()))
+        if not files:
+            return pa.schema([schema.field(column) for column in columns]).empty_table()
+        dataset = ds.dataset(
+            files, format="parquet", schema=schema,
+            partitioning=ds.partitioning(pa.schema([("symbol", pa.string())]), flavor="hive"),
+            partition_base_dir=str(self.candle_store.root / f"resolution={resolution}"),
+        )
+        return dataset.to_table(columns=columns, filter=filter, use_threads=True)
+
+    def _day_files(self, symbol: str, resolution: str, start: date, end: date) -> Dict[str, str]:
+        directory = self.candle_store.symbol_dir(symbol, resolution)
+        return {day: str(directory / f"{day}.parquet")
+                for day in self.candle_store.days(symbol, resolution, start, end)}
+
+    def candle_summary(self, symbols: List[str], resolution: str, start: date, end: date,
+                       from_time: dtime, to_time: dtime):
+        files, days = [], set()
+        for symbol in symbols:
+            day_files = self._day_files(symbol, resolution, start, end)
+            files += day_files.values()
+            days.update(day_files)
+        table = self._candles(files, resolution, ["symbol", *CANDLE_SCHEMA.names],
+                              _window_filter(sorted(days), from_time, to_time))
+        result = _first_last(_with_day(table), ["symbol", "day"], [
+            ("open", "first"), ("high", "max"), ("low", "min"), ("close", "last"), ("volume", "sum"),
+            ("timestamp", "count"),
+        ])
+        result = result.rename_columns(["symbol", "day", "open", "high", "low", "close", "volume", "candles"])
+        return self._readable(result), None
+
+    def tick_summary(self, underlying: Optional[str], symbols: Optional[List[str]], start: date, end: date,
+                     from_time: dtime, to_time: dtime):
+        archive = self.tick_archive
+        days = [day for day in sorted(set(archive.days()) | set(archive.segment_days()))
+                if start.isoformat() <= day <= end.isoformat()]
+        sources = []
+        date_partitioning = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+        compacted = [str(path) for day in days for path in archive.day_dir(day).glob(
+            f"underlying={underlying}/*.parquet" if underlying else "underlying=*/*.parquet")]
+        if compacted:
+            sources.append(ds.dataset(compacted, format="parquet", schema=TICK_SCHEMA.append(pa.field("date", pa.string())),
+                                      partitioning=ds.partitioning(pa.schema([("date", pa.string()), ("underlying", pa.string())]),
+                                                                   flavor="hive"),
+                                      partition_base_dir=str(archive.root)))
+        segments = [str(path) for day in days for path in archive.segment_dir(day).glob("*.parquet")]
+        if segments:
+            sources.append(ds.dataset(segments, format="parquet", schema=TICK_SCHEMA.append(pa.field("date", pa.string())),
+                                      partitioning=date_partitioning, partition_base_dir=str(archive.root / "_segments")))
+        filter = _window_filter(days, from_time, to_time)
+        if underlying:
+            filter = filter & (pc.field("underlying") == underlying)
+        if symbols:
+            filter = filter & pc.field("symbol").isin(symbols)
+        columns = ["symbol", "date", "timestamp", "ltp", "volume", "bid", "ask"]
+        if not sources:
+            return pa.table({"symbol": pa.array([], pa.string())}), None
+        table = ds.dataset(sources).to_table(columns=columns, filter=filter, use_threads=True)
+        quoted = pc.and_(pc.greater(table["bid"], 0), pc.greater(table["ask"], 0))
+        table = table.append_column("spread", pc.if_else(quoted, pc.subtract(table["ask"], table["bid"]),
+                                                        pa.scalar(None, pa.float64())))
+        result = _first_last(table, ["symbol", "date"], [
+            ("timestamp", "count"), ("ltp", "first"), ("ltp", "max"), ("ltp", "min"), ("ltp", "last"),
+            ("volume", "min"), ("volume", "max"), ("spread", "mean"),
+        ])
+        traded = pc.subtract(result["volume_max"], result["volume_min"])
+        result = pa.table({
+            "symbol": result["symbol"], "day": result["date"], "ticks": result["timestamp_count"],
+            "first": result["ltp_first"], "high": result["ltp_max"], "low": result["ltp_min"],
+            "last": result["ltp_last"], "volume": traded, "avg_spread": pc.round(result["spread_mean"], 4),
+        })
+        return result, None
+
+    def _option_catalog(self, underlying: str, resolution: str) -> Dict[date, Dict[float, Dict[str, str]]]:
+        """expiry -> strike -> {CE, PE} of the option legs in the candle store"""
+        base = self.candle_store.root / f"resolution={resolution}"
+        catalog: Dict[date, Dict[float, Dict[str, str]]] = {}
+        for directory in base.glob(f"symbol=*{underlying}*"):
+            symbol = directory.name.split("=", 1)[1].replace("_", ":", 1)
+            parsed = parse_option(symbol)
+            if not parsed or parsed[0] != underlying:
+                continue
+            _, expiry, _, strike, kind = parsed
+            if expiry is None:
+                # Monthly symbols do not spell out the day; the last stored day is the expiry
+                days = sorted(path.stem for path in directory.glob("*.parquet"))
+                if not days:
+                    continue
+                expiry = date.fromisoformat(days[-1])
+            catalog.setdefault(expiry, {}).setdefault(strike, {})[kind] = symbol
+        return catalog
+
+    def straddle_decay(self, index: str, resolution: str, expiry_days_only: bool, start: date, end: date,
+                       from_time: dtime, to_time: dtime):
+        index_symbol = self.index_symbols.get(index)
+        if not index_symbol:
+            raise QueryError(f"Unknown index: {index}")
+        spot_files = self._day_files(index_symbol, resolution, start, end)
+        days = sorted(spot_files)
+        # Spot at the start of each day's window picks the ATM strike
+        spot = _first_last(_with_day(self._candles(list(spot_files.values()), resolution, ["timestamp", "close"],
+                                                   _window_filter(days, from_time, to_time))),
+                           ["day"], [("close", "first")])
+        spot_by_day = dict(zip(_day_strings(spot["day"]), spot["close_first"].to_pylist()))
+
+        catalog = self._option_catalog(index, resolution)
+        expiries = sorted(catalog)
+        chosen, files = [], []
+        for day in days:
+            if day not in spot_by_day:
+                continue
+            expiry = next((e for e in expiries if e.isoformat() >= day), None)
+            if expiry is None or (expiry_days_only and expiry.isoformat() != day):
+                continue
+            straddles = [(strike, legs) for strike, legs in catalog[expiry].items() if len(legs) == 2 and all(
+                (self.candle_store.symbol_dir(legs[kind], resolution) / f"{day}.parquet").exists() for kind in legs)]
+            if not straddles:
+                continue
+            strike, legs = min(straddles, key=lambda item: abs(item[0] - spot_by_day[day]))
+            chosen.append((day, expiry.isoformat(), strike, legs["CE"], legs["PE"]))
+            files += [str(self.candle_store.symbol_dir(legs[kind], resolution) / f"{day}.parquet") for kind in ("CE", "PE")]
+
+        legs = _first_last(_with_day(self._candles(files, resolution, ["symbol", "timestamp", "close"],
+                                                   _window_filter(sorted({c[0] for c in chosen}), from_time, to_time))),
+                           ["symbol", "day"], [("close", "first"), ("close", "last")])
+        prices = {(symbol, day): (first, last) for symbol, day, first, last in zip(
+            legs["symbol"].to_pylist(), _day_strings(legs["day"]), legs["close_first"].to_pylist(),
+            legs["close_last"].to_pylist())}
+
+        rows = []
+        for day, expiry, strike, ce_symbol, pe_symbol in chosen:
+            ce, pe = prices.get((symbol_key(ce_symbol), day)), prices.get((symbol_key(pe_symbol), day))
+            if not ce or not pe:
+                continue
+            start_premium, end_premium = ce[0] + pe[0], ce[1] + pe[1]
+            rows.append({
+                "day": day, "expiry": expiry, "spot": spot_by_day[day], "strike": strike,
+                "ce_symbol": ce_symbol, "pe_symbol": pe_symbol,
+                "start_premium": round(start_premium, 2), "end_premium": round(end_premium, 2),
+                "decay": round(end_premium - start_premium, 2),
+                "decay_pct": round((end_premium - start_premium) / start_premium * 100, 3) if start_premium else None,
+            })
+        table = pa.Table.from_pylist(rows) if rows else pa.table({"day": pa.array([], pa.string())})
+        decay_pct = [row["decay_pct"] for row in rows if row["decay_pct"] is not None]
+        summary = {
+            "days": len(rows),
+            "mean_decay": round(float(np.mean([row["decay"] for row in rows])), 2) if rows else None,
+            "mean_decay_pct": round(float(np.mean(decay_pct)), 3) if decay_pct else None,
+        }
+        return table, summary
+
+    def _readable(self, table: pa.Table) -> pa.Table:
+        """Store keys back to symbols and epoch days to ISO dates"""
+        symbols = [value.replace("_", ":", 1) for value in table["symbol"].to_pylist()]
+        table = table.set_column(table.column_names.index("symbol"), "symbol", pa.array(symbols, pa.string()))
+        return table.set_column(table.column_names.index("day"), "day", pa.array(_day_strings(table["day"]), pa.string()))
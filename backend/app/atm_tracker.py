@@ -0,0 +1,115 @@
+import logging
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from market_hours import IST_OFFSET
+from master_index import MasterIndex
+from subscriptions import SubscriptionLimitError, SubscriptionManager
+
+logger = logging.getLogger(__name__)
+
+class AtmTracker:
+    """
+    Keeps the CE/PE legs of ATM +/- `width` strikes of every index subscribed.
+
+    Every index tick is checked against a precomputed band around the
+    current ATM strike, so the common case is two comparisons. The window
+    only moves once spot is `hysteresis` of a strike gap past the midpoint
+    to the next strike, so spot hovering around a midpoint does not churn
+    the subscriptions. Each index holds its legs in the subscription
+    manager as `atm:<index>`; `on_change` gets the legs that rolled in.
+    When the subscription cap refuses a window, that index is left alone
+    for `retry_after` seconds instead of being re-resolved on every tick.
+    """
+
+    def __init__(self, master_index: MasterIndex, subscriptions: SubscriptionManager,
+                 index_symbols: Dict[str, str], width: int = 5, hysteresis: float = 0.2,
+                 on_change: Optional[Callable[[str, List[str]], Any]] = None, retry_after: float = 30):
+        self.master_index = master_index
+        self.subscriptions = subscriptions
+        self.width = width
+        self.hysteresis = hysteresis
+        self.on_change = on_change
+        self.retry_after = retry_after
+        self._index_of = {symbol: index for index, symbol in index_symbols.items()}
+        self._state: Dict[str, Dict[str, Any]] = {}
+        # Index -> monotonic time before which a refused window is not retried
+        self._retry_at: Dict[str, float] = {}
+        # Indexes whose window is being moved, so two ticks never swap the same legs at once
+        self._updating: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def on_tick(self, symbol: str, ltp: float) -> bool:
+        """Feed an index tick, returns whether that index's legs moved"""
+        index = self._index_of.get(symbol)
+        if index is None or not ltp or time.monotonic() < self._retry_at.get(index, 0):
+            return False
+        state = self._state.get(index)
+        if (state and state["low"] <= ltp <= state["high"] and state["version"] == self.master_index.version
+                and state["day"] == (int(time.time()) + IST_OFFSET) // 86400):
+            return False
+        return self.update(index, ltp)
+
+    def update(self, index: str, spot: float) -> bool:
+        """Re-centre an index's window on spot if it left the band; returns whether legs moved"""
+        with self._lock:
+            if index in self._updating:
+                return False
+            state = self._state.get(index)
+            day = (int(time.time()) + IST_OFFSET) // 86400
+            expiry = self.master_index.nearest_expiry(index)
+            strikes = self.master_index.ladder(index, expiry) if expiry else []
+            if not len(strikes):
+                return False
+            fresh = not state or state["expiry"] != expiry or state["version"] != self.master_index.version
+            if not fresh and state["low"] <= spot <= state["high"]:
+                state["day"] = day
+                return False
+
+            atm = self.master_index.atm_index(strikes, spot)
+            gap = self.hysteresis + 0.5
+            low = strikes[atm] - (strikes[atm] - strikes[atm - 1]) * gap if atm > 0 else -math.inf
+            high = strikes[atm] + (strikes[atm + 1] - strikes[atm]) * gap if atm + 1 < len(strikes) else math.inf
+            window = strikes[max(0, atm - self.width):atm + self.width + 1]
+            ce_symbols, pe_symbols = self.master_index.chain_legs(index, expiry, window)
+            symbols = [*ce_symbols, *pe_symbols]
+            previous = set(state["symbols"]) if state else set()
+            self._updating.add(index)
+
+        # Subscription calls happen outside the lock, so other indexes keep ticking meanwhile
+        holder = f"atm:{index}"
+        try:
+            # Take the new legs before letting go of the old, so shared legs never go idle
+            try:
+                self.subscriptions.acquire(holder, symbols)
+            except SubscriptionLimitError as e:
+                self._retry_at[index] = time.monotonic() + self.retry_after
+                logger.error(f"ATM {index} legs at {strikes[atm]} refused, retrying in {self.retry_after}s: {str(e)}")
+                return False
+            if previous:
+                self.subscriptions.release(holder, previous)
+            with self._lock:
+                self._retry_at.pop(index, None)
+                self._state[index] = {
+                    "expiry": expiry, "version": self.master_index.version, "day": day,
+                    "atm": float(strikes[atm]), "low": float(low), "high": float(high), "symbols": symbols,
+                }
+        finally:
+            with self._lock:
+                self._updating.discard(index)
+
+        added = [symbol for symbol in symbols if symbol not in previous]
+        logger.info(f"ATM {index} {expiry} at {strikes[atm]} (spot {spot}): {len(added)} legs rolled in")
+        if added and self.on_change:
+            self.on_change(index, added)
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            index: {"expiry": state["expiry"], "atm": state["atm"], "legs": len(state["symbols"]),
+                    # Open-ended at the ends of the ladder
+                    "band": [bound if math.isfinite(bound) else None for bound in (state["low"], state["high"])]}
+            for index, state in list(self._state.items())
+        }
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from candle_store import CandleStore
+from upstream import BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+# Longest range Fyers serves in one history request, per resolution
+MAX_DAYS_INTRADAY = 100
+MAX_DAYS_DAILY = 366
+
+def max_chunk_days(resolution: str) -> int:
+    return MAX_DAYS_DAILY if resolution.upper() in ("D", "1D") else MAX_DAYS_INTRADAY
+
+def chunk_ranges(start: date, end: date, resolution: str) -> List[Tuple[date, date]]:
+    """Split [start, end] into inclusive ranges Fyers accepts in a single request"""
+    step = timedelta(days=max_chunk_days(resolution))
+    ranges = []
+    while start <= end:
+        chunk_end = min(end, start + step - timedelta(days=1))
+        ranges.append((start, chunk_end))
+        start = chunk_end + timedelta(days=1)
+    return ranges
+
+class BackfillJob:
+    """
+    Backfill of candles for a set of symbols over a date range.
+
+    The range is split into broker-sized chunks per symbol, fetched in
+    parallel at background priority and written to the candle store. Every
+    finished chunk is recorded in a JSON checkpoint, so running a job with
+    the same spec again only fetches the chunks that are still missing.
+    """
+
+    def __init__(self, symbols: List[str], resolution: str, start: date, end: date,
+                 store: CandleStore, checkpoint_dir: Path, workers: int = 4):
+        self.symbols = sorted(set(symbols))
+        self.resolution = resolution
+        self.start = start
+        self.end = end
+        self.store = store
+        self.workers = workers
+        self.job_id = hashlib.sha1(json.dumps(self.spec(), sort_keys=True).encode()).hexdigest()[:12]
+        self.checkpoint_path = Path(checkpoint_dir) / f"{self.job_id}.json"
+        self.done = set()
+        self.errors: Dict[str, str] = {}
+        self.state = "pending"
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.candles = 0
+        self._lock = threading.Lock()
+        self._load_checkpoint()
+
+    def spec(self) -> Dict[str, Any]:
+        return {
+            "symbols": self.symbols,
+            "resolution": self.resolution,
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+        }
+
+    @classmethod
+    def from_checkpoint(cls, path: Path, store: CandleStore, workers: int = 4) -> "BackfillJob":
+        spec = json.loads(Path(path).read_text())["spec"]
+        return cls(spec["symbols"], spec["resolution"], date.fromisoformat(spec["start"]),
+                   date.fromisoformat(spec["end"]), store, Path(path).parent, workers)
+
+    def chunks(self) -> List[str]:
+        """Chunk ids as `symbol|from|to`"""
+        ranges = chunk_ranges(self.start, self.end, self.resolution)
+        return [f"{symbol}|{start}|{end}" for symbol in self.symbols for start, end in ranges]
+
+    def _load_checkpoint(self):
+        if self.checkpoint_path.exists():
+            checkpoint = json.loads(self.checkpoint_path.read_text())
+            self.done = set(checkpoint.get("done", []))
+            self.state = checkpoint.get("state", "pending")
+
+    def _save_checkpoint(self):
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.checkpoint_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"spec": self.spec(), "state": self.state, "done": sorted(self.done)}))
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def run(self, fetch: Callable[..., pd.DataFrame]):
+        """Fetch every missing chunk; fetch(symbol, range_from, range_to, resolution, priority)"""
+        self.state = "running"
+        self.started_at = time.time()
+        self.errors = {}
+        pending = [chunk for chunk in self.chunks() if chunk not in self.done]
+        logger.info(f"Backfill {self.job_id}: {len(pending)} of {len(self.chunks())} chunks to fetch")
+
+        def fetch_chunk(chunk: str) -> Tuple[int, bool]:
+            symbol, range_from, range_to = chunk.split("|")
+            df = fetch(symbol, range_from, range_to, self.resolution, BACKGROUND)
+            closed = self.store.write_range(symbol, self.resolution, df, date.fromisoformat(range_from),
+                                            date.fromisoformat(range_to))
+            return len(df), closed
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"backfill-{self.job_id}") as pool:
+            futures = {pool.submit(fetch_chunk, chunk): chunk for chunk in pending}
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    rows, closed = future.result()
+                    with self._lock:
+                        # A chunk reaching into today is fetched again on the next run
+                        if closed:
+                            self.done.add(chunk)
+                        self.candles += rows
+                        self._save_checkpoint()
+                except Exception as e:
+                    logger.error(f"Backfill {self.job_id} chunk {chunk} failed: {str(e)}")
+                    self.errors[chunk] = str(e)
+
+        self.state = "failed" if self.errors else "completed"
+        self.finished_at = time.time()
+        self._save_checkpoint()
+        logger.info(f"Backfill {self.job_id} {self.state}: {len(self.done)} chunks, {self.candles} candles")
+
+    def status(self) -> Dict[str, Any]:
+        total = len(self.chunks())
+        return {
+            "job_id": self.job_id,
+            **self.spec(),
+            "state": self.state,
+            "chunks_done": len(self.done),
+            "chunks_total": total,
+            "progress": round(len(self.done) / total, 4) if total else 1.0,
+            "candles": self.candles,
+            "errors": self.errors,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+class BackfillManager:
+    """Runs backfill jobs in background threads and resumes interrupted ones"""
+
+    def __init__(self, store: CandleStore, checkpoint_dir: Path, fetch: Callable[..., pd.DataFrame]):
+        self.store = store
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        self.fetch = fetch
+        self.jobs: Dict[str, BackfillJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, symbols: List[str], resolution: str, start: date, end: date) -> BackfillJob:
+        """Start a job, or return the running job with the same spec"""
+        job = BackfillJob(symbols, resolution, start, end, self.store, self.checkpoint_dir)
+        with self._lock:
+            existing = self.jobs.get(job.job_id)
+            if existing and existing.state in ("pending", "running"):
+                return existing
+            job.state = "running"
+            self.jobs[job.job_id] = job
+        threading.Thread(target=job.run, args=(self.fetch,), daemon=True).start()
+        return job
+
+    def resume_interrupted(self) -> List[str]:
+        """Restart every checkpointed job that did not finish"""
+        resumed = []
+        for path in self.checkpoint_dir.glob("*.json"):
+            try:
+                job = BackfillJob.from_checkpoint(path, self.store)
+            except Exception as e:
+                logger.error(f"Unreadable backfill checkpoint {path}: {str(e)}")
+                continue
+            if job.state == "running":
+                job = self.submit(job.symbols, job.resolution, job.start, job.end)
+                resumed.append(job.job_id)
+        if resumed:
+            logger.info(f"Resumed interrupted backfills: {resumed}")
+        return resumed
+
+    def get(self, job_id: str) -> Optional[BackfillJob]:
+        job = self.jobs.get(job_id)
+        if job is None:
+            path = self.checkpoint_dir / f"{job_id}.json"
+            if path.exists():
+                job = BackfillJob.from_checkpoint(path, self.store)
+        return job
@@ -0,0 +1,140 @@
+import json
+import logging
+import os
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from market_hours import format_ist, now_ist
+
+logger = logging.getLogger(__name__)
+
+CANDLE_COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+CANDLE_SCHEMA = pa.schema([
+    ("timestamp", pa.int64()),
+    ("open", pa.float64()),
+    ("high", pa.float64()),
+    ("low", pa.float64()),
+    ("close", pa.float64()),
+    ("volume", pa.int64()),
+])
+
+def symbol_key(symbol: str) -> str:
+    """Filesystem-safe form of a Fyers symbol"""
+    return symbol.replace(':', '_')
+
+class CandleStore:
+    """
+    Local Parquet store of historical candles.
+
+    Layout is `root/resolution=<res>/symbol=<symbol>/<YYYY-MM-DD>.parquet`
+    with one file per IST trading day, sorted and de-duplicated on the
+    epoch-second `timestamp` column. Date ranges known to be complete are
+    tracked in `_coverage.json` next to the day files, so readers can tell
+    a holiday from a day that was never fetched.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def symbol_dir(self, symbol: str, resolution: str) -> Path:
+        return self.root / f"resolution={resolution}" / f"symbol={symbol_key(symbol)}"
+
+    def write(self, symbol: str, resolution: str, df: pd.DataFrame) -> int:
+        """Merge candles into the per-day files, returns the number of days touched"""
+        if df.empty:
+            return 0
+        df = df[CANDLE_COLUMNS]
+        days = format_ist(df["timestamp"].to_numpy(), unit='D')
+        directory = self.symbol_dir(symbol, resolution)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        for day, day_df in df.groupby(days):
+            path = directory / f"{day}.parquet"
+            with self._lock:
+                if path.exists():
+                    day_df = pd.concat([pq.read_table(path).to_pandas(), day_df])
+                day_df = day_df.drop_duplicates("timestamp", keep="last").sort_values("timestamp")
+                table = pa.Table.from_pandas(day_df, schema=CANDLE_SCHEMA, preserve_index=False)
+                tmp_path = path.with_suffix(".tmp")
+                pq.write_table(table, tmp_path)
+                os.replace(tmp_path, path)
+        return len(np.unique(days))
+
+    def write_range(self, symbol: str, resolution: str, df: pd.DataFrame, start: date, end: date) -> bool:
+        """
+        Store the candles fetched for [start, end] and record the range as complete.
+
+        Today is still trading, so only days up to yesterday count as
+        complete. Returns whether the whole range was.
+        """
+        self.write(symbol, resolution, df)
+        last_closed = now_ist().date() - timedelta(days=1)
+        self.mark_covered(symbol, resolution, start, min(end, last_closed))
+        return end <= last_closed
+
+    def _coverage_path(self, symbol: str, resolution: str) -> Path:
+        return self.symbol_dir(symbol, resolution) / "_coverage.json"
+
+    def coverage(self, symbol: str, resolution: str) -> List[List[str]]:
+        """Merged [start, end] ISO date ranges that are fully stored"""
+        path = self._coverage_path(symbol, resolution)
+        return json.loads(path.read_text()) if path.exists() else []
+
+    def mark_covered(self, symbol: str, resolution: str, start: date, end: date):
+        """Record that every candle in [start, end] has been written"""
+        if start > end:
+            return
+        with self._lock:
+            ranges = [(date.fromisoformat(a), date.fromisoformat(b)) for a, b in self.coverage(symbol, resolution)]
+            ranges.append((start, end))
+            ranges.sort()
+            merged = [list(ranges[0])]
+            for range_start, range_end in ranges[1:]:
+                if range_start <= merged[-1][1] + timedelta(days=1):
+                    merged[-1][1] = max(merged[-1][1], range_end)
+                else:
+                    merged.append([range_start, range_end])
+            path = self._coverage_path(symbol, resolution)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps([[a.isoformat(), b.isoformat()] for a, b in merged]))
+
+    def is_covered(self, symbol: str, resolution: str, start: date, end: date) -> bool:
+        """Check if [start, end] lies inside one stored range"""
+        return any(a <= start.isoformat() and end.isoformat() <= b for a, b in self.coverage(symbol, resolution))
+
+    def days(self, symbol: str, resolution: str, start: Optional[date] = None,
+             end: Optional[date] = None) -> List[str]:
+        """Stored trading days for a symbol, optionally limited to [start, end]"""
+        directory = self.symbol_dir(symbol, resolution)
+        if not directory.exists():
+            return []
+        days = sorted(path.stem for path in directory.glob("*.parquet"))
+        if start:
+            days = [day for day in days if day >= start.isoformat()]
+        if end:
+            days = [day for day in days if day <= end.isoformat()]
+        return days
+
+    def iter_days(self, symbol: str, resolution: str, start: Optional[date] = None,
+                  end: Optional[date] = None) -> Iterator[pd.DataFrame]:
+        """Yield one day of candles at a time"""
+        directory = self.symbol_dir(symbol, resolution)
+        for day in self.days(symbol, resolution, start, end):
+            yield pq.read_table(directory / f"{day}.parquet").to_pandas()
+
+    def read(self, symbol: str, resolution: str, start: Optional[date] = None,
+             end: Optional[date] = None) -> pd.DataFrame:
+        """All stored candles in [start, end]"""
+        frames = list(self.iter_days(symbol, resolution, start, end))
+        if not frames:
+            return pd.DataFrame(columns=CANDLE_COLUMNS)
+        return pd.concat(frames, ignore_index=True)
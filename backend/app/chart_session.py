@@ -0,0 +1,307 @@
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from live_bars import resolution_seconds, straddle_bars
+from market_hours import format_ist
+
+logger = logging.getLogger(__name__)
+
+SERIES = ("ce", "pe", "straddle")
+# Ticks held while a feed waits for its history
+MAX_EARLY_TICKS = 10_000
+
+def _candle_rows(df: pd.DataFrame) -> List[List[float]]:
+    if df.empty:
+        return []
+    rows = df[["timestamp", "open", "high", "low", "close", "volume"]].to_numpy(dtype=np.float64)
+    return [[int(row[0]), *row[1:].tolist()] for row in rows]
+
+class ChartFeed:
+    """
+    History and live bars of one straddle at one resolution.
+
+    The CE, PE and straddle bar series are seeded once from candles and
+    then extended by every leg tick, each tick bumping `seq`. Ticks that
+    arrive before the history are held and folded in on top of it, so
+    there is no gap at the cutoff. `snapshot` and `on_tick` share a lock:
+    a snapshot at seq N is followed by exactly the updates N+1, N+2, ...
+    """
+
+    def __init__(self, ce_symbol: str, pe_symbol: str, resolution: str = "1", days_back: int = 10,
+                 max_bars: int = 20_000):
+        self.ce_symbol = ce_symbol
+        self.pe_symbol = pe_symbol
+        self.resolution = resolution
+        self.interval = resolution_seconds(resolution)
+        self.max_bars = max_bars
+        self.key = f"chart:{ce_symbol}|{pe_symbol}|{resolution}|{days_back}"
+        self.seq = 0
+        self.seeded = False
+        self.bars: Dict[str, List[List[float]]] = {name: [] for name in SERIES}
+        self._legs = {ce_symbol: "ce", pe_symbol: "pe"}
+        self._ltp: Dict[str, float] = {}
+        self._day_volume: Dict[str, int] = {}
+        self._early: Deque[Tuple[str, float, int, int]] = deque(maxlen=MAX_EARLY_TICKS)
+        self._dates: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def symbols(self):
+        return (self.ce_symbol, self.pe_symbol)
+
+    def seed(self, ce_df: pd.DataFrame, pe_df: pd.DataFrame):
+        """Load history, then replay the ticks that arrived meanwhile"""
+        timestamps, straddle = straddle_bars(ce_df, pe_df)
+        straddle_rows = np.column_stack([timestamps, *(straddle[field] for field in
+                                                       ("open", "high", "low", "close", "volume"))])
+        with self._lock:
+            self.bars = {
+                "ce": _candle_rows(ce_df)[-self.max_bars:],
+                "pe": _candle_rows(pe_df)[-self.max_bars:],
+                "straddle": [[int(row[0]), *row[1:].tolist()] for row in straddle_rows[-self.max_bars:]],
+            }
+            # Until a leg ticks its price is its last close, so the straddle moves on the first tick
+            for symbol, leg in self._legs.items():
+                if self.bars[leg]:
+                    self._ltp.setdefault(symbol, self.bars[leg][-1][4])
+            self.seeded = True
+            early, self._early = list(self._early), deque(maxlen=MAX_EARLY_TICKS)
+            for tick in early:
+                self._apply(*tick)
+
+    def on_tick(self, symbol: str, ltp: float, day_volume: int, timestamp: int) -> Optional[Dict[str, Any]]:
+        """Fold a leg tick (epoch seconds) into the bars, returns the update to send"""
+        with self._lock:
+            if not self.seeded:
+                self._early.append((symbol, ltp, day_volume, timestamp))
+                return None
+            return self._apply(symbol, ltp, day_volume, timestamp)
+
+    def _apply(self, symbol: str, ltp: float, day_volume: int, timestamp: int) -> Optional[Dict[str, Any]]:
+        leg = self._legs.get(symbol)
+        if leg is None:
+            return None
+        previous_volume = self._day_volume.get(symbol)
+        self._ltp[symbol] = ltp
+        self._day_volume[symbol] = day_volume
+        if previous_volume is None:
+            traded = 0
+        else:
+            # The counter restarts at zero each session
+            traded = day_volume - previous_volume if day_volume >= previous_volume else day_volume
+
+        start = timestamp - timestamp % self.interval
+        bar = self._fold(leg, start, ltp, traded)
+        if bar is None:
+            # Late tick for a bar that has already closed
+            return None
+        self.seq += 1
+        update = {"seq": self.seq, leg: self._row(bar)}
+        if len(self._ltp) == 2:
+            price = self._ltp[self.ce_symbol] + self._ltp[self.pe_symbol]
+            straddle = self._fold("straddle", start, price, traded)
+            if straddle is not None:
+                update["straddle"] = self._row(straddle)
+        return update
+
+    def _fold(self, name: str, start: int, price: float, traded: int) -> Optional[List[float]]:
+        bars = self.bars[name]
+        if not bars or start > bars[-1][0]:
+            bars.append([start, price, price, price, price, traded])
+            if len(bars) > self.max_bars:
+                del bars[:len(bars) - self.max_bars]
+            return bars[-1]
+        bar = bars[-1]
+        if start < bar[0]:
+            return None
+        bar[2] = max(bar[2], price)
+        bar[3] = min(bar[3], price)
+        bar[4] = price
+        bar[5] += traded
+        return bar
+
+    def _row(self, bar: List[float]) -> List[Any]:
+        """A bar in the `/historical_straddle` row format"""
+        date = self._dates.get(bar[0])
+        if date is None:
+            if len(self._dates) > 1024:
+                self._dates.clear()
+            date = self._dates[bar[0]] = str(format_ist(np.array([bar[0]], dtype=np.int64))[0])
+        return [date, *bar[1:]]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Every bar up to the current seq"""
+        with self._lock:
+            seq = self.seq
+            arrays = {name: np.array(bars, dtype=np.float64).reshape(-1, 6) for name, bars in self.bars.items()}
+        history = {}
+        for name, values in arrays.items():
+            dates = format_ist(values[:, 0].astype(np.int64)).astype(object)
+            history[name] = [[date, *row] for date, row in zip(dates.tolist(), values[:, 1:].tolist())]
+        return {"seq": seq, **history}
+
+class _Session:
+    __slots__ = ("sid", "chart", "feed", "meta", "start_seq", "queue", "task")
+
+    def __init__(self, sid: str, chart: str, feed: ChartFeed, meta: Dict[str, Any], max_queue: int):
+        self.sid = sid
+        self.chart = chart
+        self.feed = feed
+        self.meta = meta
+        self.start_seq = 0
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.task: Optional[asyncio.Task] = None
+
+class ChartSessions:
+    """
+    Chart sessions: history followed by sequenced updates on one socket.
+
+    A session is opened per (socket, chart id) on a shared ChartFeed. Its
+    first message is `chart_history` with the bars up to seq N, followed by
+    `chart_update` messages N+1, N+2, ... All of a session's messages go
+    through its own queue and sender task, so history always arrives
+    first. A client too slow to drain `max_queue` updates gets a fresh
+    `chart_history` instead.
+    """
+
+    def __init__(self, emit: Callable[..., Awaitable], max_queue: int = 1000):
+        self.emit = emit
+        self.max_queue = max_queue
+        self.feeds: Dict[str, ChartFeed] = {}
+        # Copy-on-write: read from the feed thread on every tick
+        self._by_symbol: Dict[str, Tuple[ChartFeed, ...]] = {}
+        self._sessions: Dict[Tuple[str, str], _Session] = {}
+        self._by_feed: Dict[str, List[_Session]] = {}
+        self._seeding: Dict[str, asyncio.Future] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stats = {"opened": 0, "closed": 0, "updates": 0, "resyncs": 0}
+
+    def _register(self, feed: ChartFeed):
+        self.feeds[feed.key] = feed
+        by_symbol = dict(self._by_symbol)
+        for symbol in feed.symbols:
+            by_symbol[symbol] = (*by_symbol.get(symbol, ()), feed)
+        self._by_symbol = by_symbol
+
+    def _drop_feed(self, feed: ChartFeed):
+        if self.feeds.get(feed.key) is feed:
+            del self.feeds[feed.key]
+        by_symbol = dict(self._by_symbol)
+        for symbol in feed.symbols:
+            remaining = tuple(f for f in by_symbol.get(symbol, ()) if f is not feed)
+            if remaining:
+                by_symbol[symbol] = remaining
+            else:
+                by_symbol.pop(symbol, None)
+        self._by_symbol = by_symbol
+
+    async def prepare(self, ce_symbol: str, pe_symbol: str, resolution: str, days_back: int,
+                      load: Callable[[], Tuple[pd.DataFrame, pd.DataFrame]]) -> ChartFeed:
+        """The shared feed of a straddle, seeded from `load()` (run on a thread) the first time"""
+        self._loop = asyncio.get_running_loop()
+        feed = ChartFeed(ce_symbol, pe_symbol, resolution, days_back)
+        if feed.key in self.feeds:
+            feed = self.feeds[feed.key]
+        else:
+            # Registered before loading so ticks during the load are kept
+            self._register(feed)
+            self._seeding[feed.key] = asyncio.ensure_future(asyncio.to_thread(lambda: feed.seed(*load())))
+        seeding = self._seeding.get(feed.key)
+        if seeding is not None:
+            try:
+                await asyncio.shield(seeding)
+            except Exception:
+                if self._seeding.get(feed.key) is seeding:
+                    del self._seeding[feed.key]
+                    if not self._by_feed.get(feed.key):
+                        self._drop_feed(feed)
+                raise
+            self._seeding.pop(feed.key, None)
+        return feed
+
+    def open(self, sid: str, chart: str, feed: ChartFeed, **meta) -> Dict[str, Any]:
+        """Start a session on a seeded feed; call on the event loop"""
+        self.close(sid, chart)
+        if self.feeds.get(feed.key) is not feed:
+            # Its last session closed while this one was being prepared
+            self._register(feed)
+        session = _Session(sid, chart, feed, meta, self.max_queue)
+        self._sessions[(sid, chart)] = session
+        self._by_feed[feed.key] = [*self._by_feed.get(feed.key, []), session]
+        # No await between the snapshot and queueing it: updates after it land behind it
+        self._send_history(session)
+        session.task = asyncio.create_task(self._sender(session))
+        self._stats["opened"] += 1
+        return {"chart": chart, "seq": session.start_seq}
+
+    def _send_history(self, session: _Session):
+        snapshot = session.feed.snapshot()
+        session.start_seq = snapshot["seq"]
+        session.queue.put_nowait(("chart_history", {"chart": session.chart, **session.meta, **snapshot}))
+
+    async def _sender(self, session: _Session):
+        while True:
+            event, payload = await session.queue.get()
+            try:
+                await self.emit(event, payload, to=session.sid)
+            except Exception as e:
+                logger.error(f"Error sending {event} to {session.sid}: {str(e)}")
+
+    def close(self, sid: str, chart: str) -> Optional[ChartFeed]:
+        """End a session, returns its feed; the feed is dropped with its last session"""
+        session = self._sessions.pop((sid, chart), None)
+        if session is None:
+            return None
+        if session.task:
+            session.task.cancel()
+        self._stats["closed"] += 1
+        key = session.feed.key
+        remaining = [s for s in self._by_feed.get(key, []) if s is not session]
+        if remaining:
+            self._by_feed[key] = remaining
+        else:
+            self._by_feed.pop(key, None)
+            self._drop_feed(session.feed)
+        return session.feed
+
+    def close_all(self, sid: str) -> List[ChartFeed]:
+        """End every session of a socket"""
+        return [self.close(sid, chart) for session_sid, chart in list(self._sessions) if session_sid == sid]
+
+    def on_tick(self, symbol: str, ltp: float, day_volume: int, timestamp: int):
+        """Ingest side: fold a tick into the feeds on that symbol and queue their updates"""
+        feeds = self._by_symbol.get(symbol)
+        if not feeds:
+            return
+        for feed in feeds:
+            update = feed.on_tick(symbol, ltp, day_volume, timestamp)
+            if update and self._loop:
+                self._loop.call_soon_threadsafe(self._publish, feed, update)
+
+    def _publish(self, feed: ChartFeed, update: Dict[str, Any]):
+        self._stats["updates"] += 1
+        for session in self._by_feed.get(feed.key, ()):
+            # Anything up to start_seq is already in the session's history
+            if session.feed is not feed or update["seq"] <= session.start_seq:
+                continue
+            try:
+                session.queue.put_nowait(("chart_update", {"chart": session.chart, **update}))
+            except asyncio.QueueFull:
+                while not session.queue.empty():
+                    session.queue.get_nowait()
+                self._send_history(session)
+                self._stats["resyncs"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "feeds": len(self.feeds),
+            "sessions": len(self._sessions),
+            "max_queued": max((s.queue.qsize() for s in self._sessions.values()), default=0),
+        }
@@ -0,0 +1,245 @@
+import asyncio
+import logging
+import multiprocessing as mp
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from greeks import implied_vol, straddle_analytics, time_to_expiry
+from indicators import IndicatorConfig, compute_indicators
+from live_bars import straddle_bars
+from market_hours import format_ist
+from straddle_chain import FIELDS, align_candles, build_straddle_chain, format_candles, time_axis, to_json_grid
+
+logger = logging.getLogger(__name__)
+
+class ComputeBusy(RuntimeError):
+    """Raised when the compute queue is full"""
+
+def pack_frame(df: pd.DataFrame) -> pa.Buffer:
+    """Candle frame as an Arrow IPC stream, the hand-off format to compute workers"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+def unpack_frame(buffer: pa.Buffer) -> pd.DataFrame:
+    return pa.ipc.open_stream(buffer).read_all().to_pandas()
+
+def _timed(fn: Callable, args: tuple):
+    """Worker side wrapper: the result with wall-clock start and end times"""
+    started = time.time()
+    result = fn(*args)
+    return result, started, time.time()
+
+def _ready() -> bool:
+    return True
+
+def spawn_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool of spawned workers: forking a threaded server is not safe"""
+    return ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"))
+
+def _etag_tail(*inputs) -> List[list]:
+    """Last bar of each input, for the ETag"""
+    return [np.asarray(values)[-1:].tolist() for values in inputs]
+
+class _TaskStats:
+    __slots__ = ("calls", "errors", "waits", "runs")
+
+    def __init__(self, samples: int):
+        self.calls = 0
+        self.errors = 0
+        self.waits: Deque[float] = deque(maxlen=samples)
+        self.runs: Deque[float] = deque(maxlen=samples)
+
+def _percentile_ms(samples: Deque[float], q: float) -> float:
+    return round(float(np.percentile(samples, q)) * 1000, 2) if samples else 0
+
+class ComputeExecutor:
+    """
+    Size-limited pool for CPU-heavy analytics.
+
+    Tasks run in spawned worker processes, so straddle synthesis and IV
+    solves neither hold the GIL nor block the event loop; with `workers`
+    set to 0 they run on threads instead. Candle frames are handed over
+    as Arrow IPC buffers. At most `max_pending` tasks are queued or
+    running, beyond that `submit` raises ComputeBusy so the API sheds load
+    instead of stacking requests. Queue wait and run time are sampled per
+    task for `stats()`.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 32, samples: int = 1000):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.samples = samples
+        self._pool = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._counts = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+        self._tasks: Dict[str, _TaskStats] = {}
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                if self.workers:
+                    self._pool = spawn_pool(self.workers)
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="compute")
+            return self._pool
+
+    def start(self):
+        """Create the pool and spawn its workers ahead of the first request"""
+        pool = self._executor()
+        for _ in range(self.workers):
+            pool.submit(_ready)
+
+    def stop(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """Queue `fn(*args)` on the pool; `fn` must be a module-level function"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._counts["rejected"] += 1
+                raise ComputeBusy(f"{self._pending} compute tasks pending")
+            self._pending += 1
+            self._counts["submitted"] += 1
+        outer: Future = Future()
+        submitted = time.time()
+        try:
+            pool = self._executor()
+            inner = pool.submit(_timed, fn, args)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        inner.add_done_callback(lambda future: self._done(fn.__name__, pool, submitted, future, outer))
+        return outer
+
+    async def run(self, fn: Callable, *args) -> Any:
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def _done(self, name: str, pool, submitted: float, future: Future, outer: Future):
+        error = None if future.cancelled() else future.exception()
+        with self._lock:
+            self._pending -= 1
+            stats = self._tasks.get(name) or self._tasks.setdefault(name, _TaskStats(self.samples))
+            stats.calls += 1
+            if future.cancelled() or error:
+                stats.errors += 1
+                self._counts["failed"] += 1
+                # A worker died: the next submit starts a fresh pool
+                if isinstance(error, BrokenProcessPool) and self._pool is pool:
+                    self._pool = None
+            else:
+                result, started, finished = future.result()
+                stats.waits.append(max(started - submitted, 0))
+                stats.runs.append(finished - started)
+                self._counts["completed"] += 1
+        if future.cancelled():
+            outer.cancel()
+        elif error:
+            logger.error(f"Compute task {name} failed: {str(error)}")
+            outer.set_exception(error)
+        else:
+            outer.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, counts and per-task wait and run time percentiles"""
+        with self._lock:
+            capacity = self.workers or 2
+            return {
+                "workers": self.workers,
+                "mode": "process" if self.workers else "thread",
+                "pending": self._pending,
+                "running": min(self._pending, capacity),
+                "queued": max(self._pending - capacity, 0),
+                "max_pending": self.max_pending,
+                **self._counts,
+                "tasks": {
+                    name: {
+                        "calls": stats.calls,
+                        "errors": stats.errors,
+                        "wait_p50_ms": _percentile_ms(stats.waits, 50),
+                        "wait_p99_ms": _percentile_ms(stats.waits, 99),
+                        "run_p50_ms": _percentile_ms(stats.runs, 50),
+                        "run_p99_ms": _percentile_ms(stats.runs, 99),
+                        "run_max_ms": round(max(stats.runs) * 1000, 2) if stats.runs else 0,
+                    }
+                    for name, stats in self._tasks.items()
+                }
+            }
+
+# Tasks below run inside the workers and take Arrow buffers from pack_frame
+
+def straddle_payload_task(frames: Dict[str, pa.Buffer], symbols: Dict[str, str],
+                          time_format: str = "ist") -> Dict[str, Any]:
+    """Leg candles shaped into the `/historical_straddle` response"""
+    return {
+        name: {"symbol": symbols[name], "data": format_candles(unpack_frame(buffer), time_format).values.tolist()}
+        for name, buffer in frames.items()
+    }
+
+def straddle_chain_task(frames: Dict[str, pa.Buffer], ce_symbols: List[str], pe_symbols: List[str],
+                        strikes: np.ndarray, spot_symbol: Optional[str] = None,
+                        expiry_ts: Optional[int] = None, rate: float = 0.0) -> Dict[str, Any]:
+    """Straddle grids of a strike ladder, with spot and an IV grid when `spot_symbol` is given"""
+    candles = {symbol: unpack_frame(buffer) for symbol, buffer in frames.items()}
+    chain = build_straddle_chain([candles[s] for s in ce_symbols], [candles[s] for s in pe_symbols])
+    extra = {}
+    if spot_symbol:
+        # One vectorized solve over the whole (strike x time) grid
+        spot = align_candles([candles[spot_symbol]], chain["timestamps"])[0, :, FIELDS.index("close")]
+        t = time_to_expiry(chain["timestamps"], expiry_ts)
+        iv = implied_vol(chain["straddle"]["close"], spot[None, :], strikes[:, None], t[None, :], rate)
+        extra = {"spot": to_json_grid(spot), "iv": to_json_grid(iv)}
+    return {
+        "timestamps": chain["timestamps"].tolist(),
+        "dates": format_ist(chain["timestamps"]).tolist(),
+        "straddle": {field: to_json_grid(values) for field, values in chain["straddle"].items()},
+        "ce_close": to_json_grid(chain["ce_close"]),
+        "pe_close": to_json_grid(chain["pe_close"]),
+        **extra,
+        "tail": _etag_tail(*(candles[symbol] for symbol in sorted(candles)))
+    }
+
+def straddle_iv_task(ce: pa.Buffer, pe: pa.Buffer, spot: pa.Buffer, strike: float, expiry_ts: int,
+                     rate: float) -> Dict[str, Any]:
+    """IV and greeks over the bars where both legs and spot have a candle"""
+    frames = [unpack_frame(buffer) for buffer in (ce, pe, spot)]
+    timestamps = time_axis(frames)
+    ce_close, pe_close, spot_close = align_candles(frames, timestamps)[:, :, FIELDS.index("close")]
+    complete = np.isfinite(ce_close) & np.isfinite(pe_close) & np.isfinite(spot_close)
+    timestamps = timestamps[complete]
+    ce_close, pe_close, spot_close = ce_close[complete], pe_close[complete], spot_close[complete]
+    analytics = straddle_analytics(timestamps, ce_close, pe_close, spot_close, strike, expiry_ts, rate)
+    return {
+        "timestamps": timestamps.tolist(),
+        "dates": format_ist(timestamps).tolist(),
+        "spot": spot_close.tolist(),
+        "straddle": (ce_close + pe_close).tolist(),
+        **{name: to_json_grid(values) for name, values in analytics.items()},
+        "tail": _etag_tail(timestamps, ce_close, pe_close, spot_close)
+    }
+
+def straddle_indicators_task(ce: pa.Buffer, pe: pa.Buffer, config: IndicatorConfig) -> Dict[str, Any]:
+    """Indicator series over the straddle bars of two legs"""
+    timestamps, bars = straddle_bars(unpack_frame(ce), unpack_frame(pe))
+    series = compute_indicators(timestamps, bars["high"], bars["low"], bars["close"], bars["volume"], config)
+    return {
+        "timestamps": timestamps.tolist(),
+        "dates": format_ist(timestamps).tolist(),
+        "close": bars["close"].tolist(),
+        "indicators": {name: to_json_grid(values) for name, values in series.items()}
+    }
@@ -0,0 +1,106 @@
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Fyers DepthUpdate carries five levels a side
+LEVELS = 5
+BID, ASK = 0, 1
+PRICE, QTY, ORDERS = 0, 1, 2
+
+# DepthUpdate key -> (side, field, level) cell of a book
+DEPTH_KEYS = {
+    f"{side_name}_{field_name}{level + 1}": (side, field, level)
+    for side, side_name in ((BID, "bid"), (ASK, "ask"))
+    for field, field_name in ((PRICE, "price"), (QTY, "size"), (ORDERS, "order"))
+    for level in range(LEVELS)
+}
+
+class DepthBook:
+    """Five-level book of one symbol: `levels[side, field, level]`, `meta` = [updated at, updates]"""
+    __slots__ = ("symbol", "levels", "meta")
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.levels = np.zeros((2, 3, LEVELS))
+        self.meta = np.zeros(2)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "symbol": self.symbol,
+            "bids": self.levels[BID].T.tolist(),
+            "asks": self.levels[ASK].T.tolist(),
+            "updated_at": float(self.meta[0]),
+            "updates": int(self.meta[1]),
+        }
+
+class DepthBooks:
+    """
+    Order books of every symbol with a depth subscription.
+
+    Fyers sends the whole book once, then only the cells that changed, so
+    `apply` writes just those into the symbol's preallocated array: no
+    array, dict or list is created per update. Books exist from a
+    symbol's first depth message until it is discarded.
+    """
+
+    def __init__(self):
+        self._books: Dict[str, DepthBook] = {}
+
+    def apply(self, data: Dict[str, Any]) -> Optional[DepthBook]:
+        """Fold a DepthUpdate message into its book, returns the book"""
+        symbol = data.get("symbol")
+        if not symbol:
+            return None
+        book = self._books.get(symbol)
+        if book is None:
+            book = self._books.setdefault(symbol, DepthBook(symbol))
+        levels = book.levels
+        for key, value in data.items():
+            cell = DEPTH_KEYS.get(key)
+            if cell is not None:
+                levels[cell] = value
+        meta = book.meta
+        meta[0] = time.time()
+        meta[1] += 1
+        return book
+
+    def get(self, symbol: str) -> Optional[DepthBook]:
+        return self._books.get(symbol)
+
+    def discard(self, symbols: Iterable[str]):
+        for symbol in symbols:
+            self._books.pop(symbol, None)
+
+    def symbols(self) -> List[str]:
+        return list(self._books)
+
+    def straddle(self, ce_symbol: str, pe_symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        Top of book of buying or selling both legs at once, None until both have a two-sided book.
+
+        Quantities are what fills on both legs at the best prices, i.e. the
+        smaller leg's size.
+        """
+        ce, pe = self._books.get(ce_symbol), self._books.get(pe_symbol)
+        if ce is None or pe is None:
+            return None
+        ce_top, pe_top = ce.levels[:, :, 0], pe.levels[:, :, 0]
+        if not (ce_top[:, PRICE].all() and pe_top[:, PRICE].all()):
+            return None
+        bid = float(ce_top[BID, PRICE] + pe_top[BID, PRICE])
+        ask = float(ce_top[ASK, PRICE] + pe_top[ASK, PRICE])
+        mid = (bid + ask) / 2
+        return {
+            "bid": round(bid, 2),
+            "ask": round(ask, 2),
+            "mid": round(mid, 2),
+            "spread": round(ask - bid, 2),
+            "spread_pct": round((ask - bid) / mid * 100, 3) if mid else None,
+            "bid_qty": int(min(ce_top[BID, QTY], pe_top[BID, QTY])),
+            "ask_qty": int(min(ce_top[ASK, QTY], pe_top[ASK, QTY])),
+            "updated_at": float(max(ce.meta[0], pe.meta[0])),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {"books": len(self._books), "updates": int(sum(book.meta[1] for book in list(self._books.values())))}
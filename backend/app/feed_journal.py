@@ -0,0 +1,305 @@
+"""
+Raw feed journal: record every feed message, replay it later.
+
+A journal is a gzip stream (readable with zcat) of fixed-header records:
+
+    int64 receive time (ns) | uint8 source | uint8 kind | uint32 length | payload
+
+`source` says which callback got the message (see SOURCES) and `kind` whether
+it arrived as a dict (payload is its compact JSON) or as text. The writer
+flushes a sync point about once a second, so a crash loses at most that
+much and a truncated file still reads up to its last complete record.
+
+    python feed_journal.py info data/journal/feed-20250116-091500.fjr.gz
+    python feed_journal.py replay data/journal/*.fjr.gz --speed 10 --target main
+"""
+import argparse
+import json
+import logging
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"FEEDJRN1"
+RECORD = struct.Struct("<qBBI")
+# Callbacks a message can be replayed into
+SOURCES = ("data_ws", "client")
+KIND_TEXT, KIND_JSON, KIND_BYTES = 0, 1, 2
+
+def encode_message(message: Any) -> Tuple[int, bytes]:
+    if isinstance(message, str):
+        return KIND_TEXT, message.encode()
+    if isinstance(message, (bytes, bytearray)):
+        return KIND_BYTES, bytes(message)
+    return KIND_JSON, json.dumps(message, separators=(',', ':'), default=str).encode()
+
+def decode_message(kind: int, payload: bytes) -> Any:
+    if kind == KIND_TEXT:
+        return payload.decode()
+    if kind == KIND_JSON:
+        return json.loads(payload)
+    return payload
+
+class FeedRecorder:
+    """
+    Append-only recorder of raw feed messages.
+
+    `record` only timestamps the message and queues it, so the feed thread
+    never waits on encoding, compression or disk; a writer thread drains
+    the queue every `flush_interval` seconds. Files rotate when they reach
+    `rotate_bytes` of compressed data or the date changes. Each new file
+    prunes older journals beyond `retain_days` of age or `retain_bytes` in
+    total, oldest first; None keeps them.
+    """
+
+    def __init__(self, directory: Path, flush_interval: float = 1.0, rotate_bytes: int = 256 * 1024 * 1024,
+                 retain_days: Optional[float] = 7, retain_bytes: Optional[int] = None):
+        self.directory = Path(directory)
+        self.flush_interval = flush_interval
+        self.rotate_bytes = rotate_bytes
+        self.retain_days = retain_days
+        self.retain_bytes = retain_bytes
+        self.messages = 0
+        self.dropped = 0
+        self._queue: deque = deque()
+        self._file = None
+        self._compressor = None
+        self._day: Optional[str] = None
+        self._written = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.path: Optional[Path] = None
+
+    def record(self, message: Any, source: str = "data_ws"):
+        """Queue a message with its receive time; messages after close() are dropped"""
+        if self._stop.is_set():
+            self.dropped += 1
+            return
+        if self._thread is None:
+            self._start()
+        self._queue.append((time.time_ns(), SOURCES.index(source), message))
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None and not self._stop.is_set():
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._thread = threading.Thread(target=self._run, daemon=True, name="feed-journal")
+                self._thread.start()
+
+    def _open(self, day: str):
+        self._close_file()
+        self.path = self.directory / f"feed-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.fjr.gz"
+        self._file = open(self.path, "ab")
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        self._file.write(self._compressor.compress(MAGIC))
+        self._day = day
+        self._written = 0
+        logger.info(f"Recording feed to {self.path}")
+        self._prune()
+
+    def _prune(self):
+        """Delete the oldest journals past the retention limits, never the one being written"""
+        files = []
+        for path in self.directory.glob("feed-*.fjr.gz"):
+            if path != self.path:
+                stat = path.stat()
+                files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        cutoff = time.time() - self.retain_days * 86400 if self.retain_days is not None else None
+        for mtime, size, path in files:
+            if (cutoff is None or mtime >= cutoff) and (self.retain_bytes is None or total <= self.retain_bytes):
+                break
+            try:
+                path.unlink()
+                total -= size
+                logger.info(f"Removed old feed journal {path}")
+            except OSError as e:
+                logger.error(f"Could not remove feed journal {path}: {str(e)}")
+
+    def _close_file(self):
+        if self._file:
+            self._file.write(self._compressor.flush(zlib.Z_FINISH))
+            self._file.close()
+            self._file = None
+
+    def _drain(self):
+        if not self._queue:
+            return
+        day = datetime.now().strftime('%Y%m%d')
+        if self._file is None or day != self._day or self._written >= self.rotate_bytes:
+            self._open(day)
+        chunks = []
+        while self._queue:
+            received_ns, source, message = self._queue.popleft()
+            try:
+                kind, payload = encode_message(message)
+            except Exception as e:
+                self.dropped += 1
+                logger.error(f"Unrecordable feed message: {str(e)}")
+                continue
+            chunks.append(RECORD.pack(received_ns, source, kind, len(payload)))
+            chunks.append(payload)
+            self.messages += 1
+        data = self._compressor.compress(b"".join(chunks)) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        self._file.write(data)
+        self._file.flush()
+        self._written += len(data)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self._drain()
+            except Exception as e:
+                logger.error(f"Feed journal write failed: {str(e)}")
+        self._drain()
+        self._close_file()
+
+    def close(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": str(self.path) if self.path else None, "messages": self.messages,
+                "queued": len(self._queue), "dropped": self.dropped}
+
+def read_journal(path: Union[str, Path], chunk_size: int = 1 << 20) -> Iterator[Tuple[int, str, Any]]:
+    """Yield (receive time ns, source, message) from a journal, stopping at a truncated tail"""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    buffer = b""
+    header_checked = False
+    with open(path, "rb") as f:
+        while True:
+            raw = f.read(chunk_size)
+            if not raw:
+                break
+            try:
+                buffer += decompressor.decompress(raw)
+            except zlib.error:
+                logger.warning(f"Journal {path} is corrupt past this point, stopping")
+                break
+            # Concatenated gzip members follow each other
+            while decompressor.eof and decompressor.unused_data:
+                rest = decompressor.unused_data
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                buffer += decompressor.decompress(rest)
+            if not header_checked:
+                if len(buffer) < len(MAGIC):
+                    continue
+                if not buffer.startswith(MAGIC):
+                    raise ValueError(f"{path} is not a feed journal")
+                buffer = buffer[len(MAGIC):]
+                header_checked = True
+            offset = 0
+            while len(buffer) - offset >= RECORD.size:
+                # A later gzip member (same file reopened) starts with its own header
+                if buffer.startswith(MAGIC, offset):
+                    offset += len(MAGIC)
+                    continue
+                received_ns, source, kind, length = RECORD.unpack_from(buffer, offset)
+                end = offset + RECORD.size + length
+                if end > len(buffer):
+                    break
+                yield received_ns, SOURCES[source], decode_message(kind, buffer[offset + RECORD.size:end])
+                offset = end
+            buffer = buffer[offset:]
+
+def replay(records: Iterable[Tuple[int, str, Any]], handlers: Dict[str, Callable[[Any], Any]],
+           speed: float = 1.0) -> Dict[str, Any]:
+    """
+    Feed recorded messages back into ingest callbacks.
+
+    `handlers` maps a source name to the callback that should receive its
+    messages; other sources are skipped. `speed` 1 keeps the recorded
+    spacing, N plays N times faster and 0 plays as fast as possible.
+    """
+    first_ns = None
+    start = time.perf_counter()
+    counts: Dict[str, int] = {}
+    behind = 0.0
+    for received_ns, source, message in records:
+        handler = handlers.get(source)
+        if handler is None:
+            continue
+        if first_ns is None:
+            first_ns = received_ns
+        if speed > 0:
+            due = start + (received_ns - first_ns) / 1e9 / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                behind = max(behind, -delay)
+        handler(message)
+        counts[source] = counts.get(source, 0) + 1
+    elapsed = time.perf_counter() - start
+    total = sum(counts.values())
+    return {"messages": counts, "elapsed_sec": round(elapsed, 3),
+            "messages_per_sec": round(total / elapsed, 1) if elapsed else None,
+            "max_behind_sec": round(behind, 3)}
+
+def journal_info(paths: Iterable[Path]) -> Dict[str, Any]:
+    counts: Dict[str, int] = {}
+    symbols = set()
+    first = last = None
+    for path in paths:
+        for received_ns, source, message in read_journal(path):
+            counts[source] = counts.get(source, 0) + 1
+            first = received_ns if first is None else min(first, received_ns)
+            last = received_ns if last is None else max(last, received_ns)
+            if isinstance(message, dict) and message.get("symbol"):
+                symbols.add(message["symbol"])
+    return {
+        "messages": counts,
+        "symbols": len(symbols),
+        "start": datetime.fromtimestamp(first / 1e9).isoformat() if first else None,
+        "end": datetime.fromtimestamp(last / 1e9).isoformat() if last else None,
+        "duration_sec": round((last - first) / 1e9, 3) if first else None,
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Inspect or replay feed journals")
+    commands = parser.add_subparsers(dest="command", required=True)
+    info = commands.add_parser("info")
+    info.add_argument("paths", nargs="+", type=Path)
+    play = commands.add_parser("replay")
+    play.add_argument("paths", nargs="+", type=Path)
+    play.add_argument("--speed", type=float, default=1.0, help="1 = real time, N = N times faster, 0 = max")
+    play.add_argument("--target", choices=("main", "fyers_ws"), default="main",
+                      help="main.on_message or FyersWebsocketClient.on_message")
+    args = parser.parse_args(argv)
+
+    paths = sorted(args.paths)
+    if args.command == "info":
+        print(json.dumps(journal_info(paths), indent=2))
+        return 0
+
+    # Same instrumented, side-effect free pipelines the tick benchmark uses
+    import tempfile
+    from tick_bench import StageTimer, instrumented_pipeline
+    records = (record for path in paths for record in read_journal(path))
+    with tempfile.TemporaryDirectory() as workdir:
+        timer = StageTimer()
+        handler, restore = instrumented_pipeline(args.target, timer, Path(workdir))
+        logging.getLogger().setLevel(logging.WARNING)
+        try:
+            # Whatever the recording source, drive the chosen ingest path
+            result = replay(records, {source: handler for source in SOURCES}, args.speed)
+        finally:
+            restore()
+    print(json.dumps({**result, "stages": timer.summary()}, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
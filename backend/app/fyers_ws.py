@@ -1,15 +1,19 @@
 from fyers_apiv3.FyersWebsocket import data_ws
+import asyncio
 import json
 from config import fyersconfig
+from ingest import IngestPipeline, RedisSink
 from logger import logger
 import time
 
 class FyersWebsocketClient:
-    def __init__(self, access_token, redis_client, socketio):
+    def __init__(self, access_token, redis_client, socketio, loop=None, pipeline=None):
         self.client_id = fyersconfig.BROKER_APID
         self.access_token = access_token
         self.redis_client = redis_client
         self.socketio = socketio
+        # Event loop of an asyncio Socket.IO server, feed callbacks run on other threads
+        self.loop = loop
         self.subscribed_symbols = set()
         self.fyers = None
         self.is_connected = False
@@ -19,10 +23,20 @@ class FyersWebsocketClient:
         self.reconnect_attempts = 0
         self.max_reconnect_attempts = 3
         self.token_expired = False
+        self.token_expired_cb = None
+        self._resubscribe_symbols = set()
+        # Symbols with a DepthUpdate subscription on top of their SymbolUpdate
+        self.depth_symbols = set()
+        self._resubscribe_depth = set()
+        # ingest.IngestPipeline every message goes through; the server passes its shared one
+        self.pipeline = pipeline or self._default_pipeline()
 
     def update_token(self, new_token):
-        """Update access token and reinitialize connection"""
+        """Update access token and reinitialize connection, keeping subscriptions"""
         try:
+            if new_token == self.access_token and self.is_connected:
+                return True
+            logger.info({"message": "Hot-swapping access token", "symbols": len(self.subscribed_symbols)})
             self.access_token = new_token
             self.token_expired = False
             self.reconnect_attempts = 0
@@ -31,12 +45,23 @@ class FyersWebsocketClient:
             logger.error({"error": f"Error updating token: {str(e)}"})
             return False
 
+    def emit(self, event, data):
+        """Emit from a feed thread, scheduling AsyncServer emits on the server loop"""
+        result = self.socketio.emit(event, data)
+        if asyncio.iscoroutine(result):
+            if self.loop and self.loop.is_running():
+                asyncio.run_coroutine_threadsafe(result, self.loop)
+            else:
+                result.close()
+
     def handle_token_expired(self):
         """Handle token expiry by notifying clients"""
         logger.warning({"message": "Token expired, notifying clients"})
         self.token_expired = True
         self.is_connected = False
-        self.socketio.emit('auth_status', {"status": "token_expired"}, to=None)
+        self.emit('auth_status', {"status": "token_expired"})
+        if self.token_expired_cb:
+            self.token_expired_cb()
 
     def on_error(self, error):
         """Handle websocket errors"""
@@ -82,10 +107,16 @@ class FyersWebsocketClient:
 
             if self.fyers:
                 try:
-                    self.fyers.close()
+                    self.fyers.close_connection()
                 except:
                     pass
 
+            # Symbols are re-subscribed on the new socket in on_connect
+            self._resubscribe_symbols |= self.subscribed_symbols
+            self.subscribed_symbols = set()
+            self._resubscribe_depth |= self.depth_symbols
+            self.depth_symbols = set()
+
             # Initialize the websocket with proper access token format
             auth_token = f"{self.client_id}:{self.access_token}"
             logger.info({
@@ -145,10 +176,16 @@ class FyersWebsocketClient:
             # Wait a moment before subscribing
             time.sleep(1)
             
-            # Subscribe to default symbols
-            if self.default_symbols:
-                self.subscribe(self.default_symbols)
-                logger.info({"message": "Subscribed to default symbols", "symbols": self.default_symbols})
+            # Subscribe to default symbols and anything held before a reconnect
+            symbols = list(set(self.default_symbols) | self._resubscribe_symbols)
+            self._resubscribe_symbols = set()
+            if symbols:
+                self.subscribe(symbols)
+                logger.info({"message": "Subscribed to default symbols", "symbols": symbols})
+            depth_symbols = list(self._resubscribe_depth)
+            self._resubscribe_depth = set()
+            if depth_symbols:
+                self.subscribe_depth(depth_symbols)
         except Exception as e:
             logger.error({"error": f"Error in on_connect handler: {str(e)}"})
 
@@ -162,124 +199,30 @@ class FyersWebsocketClient:
             time.sleep(2)  # Wait before reconnecting
             self.connect()
 
-    def set_callbacks(self, market_update_cb=None, order_update_cb=None):
+    def set_callbacks(self, market_update_cb=None, order_update_cb=None, token_expired_cb=None):
         """Set callback functions for different types of messages"""
         self.market_update_cb = market_update_cb
         self.order_update_cb = order_update_cb
+        self.token_expired_cb = token_expired_cb
         logger.info({"message": "Callbacks set successfully"})
 
     def on_message(self, message):
         """Handle incoming market data messages"""
-        try:
-            # Parse incoming message
-            if isinstance(message, str):
-                try:
-                    data = json.loads(message)
-                except json.JSONDecodeError:
-                    logger.error({"error": "Failed to parse message as JSON", "message": str(message)[:200]})
-                    return
-            else:
-                data = message
-
-            logger.debug({"message": "Raw message received", "data": data})
-            
-            # Process market data directly
-            try:
-                symbol = str(data.get('symbol', ''))
-                if not symbol:
-                    return
+        self.pipeline.on_message(message)
 
-                # Create market data dict with all available fields
-                market_update = {
-                    'symbol': symbol,
-                    'timestamp': int(time.time() * 1000),
-                    'ltp': float(data.get('ltp', 0)),
-                    'open': float(data.get('open_price', 0)),
-                    'high': float(data.get('high_price', 0)),
-                    'low': float(data.get('low_price', 0)),
-                    'close': float(data.get('prev_close_price', 0)),
-                    'volume': int(data.get('vol_traded_today', 0)),
-                    'bid': float(data.get('bid_price', 0)),
-                    'ask': float(data.get('ask_price', 0)),
-                    'bid_qty': int(data.get('bid_size', 0)),
-                    'ask_qty': int(data.get('ask_size', 0))
-                }
-
-                # Calculate change and change_percent
-                prev_close = market_update['close'] or market_update['ltp']
-                market_update.update({
-                    'change': round(market_update['ltp'] - prev_close, 2),
-                    'change_percent': round(((market_update['ltp'] - prev_close) / prev_close * 100) if prev_close != 0 else 0, 2)
-                })
-
-                logger.info({
-                    "message": "Market data prepared",
-                    "symbol": symbol,
-                    "ltp": market_update['ltp'],
-                    "timestamp": market_update['timestamp']
-                })
-
-                # Store in Redis using hset
-                redis_key = f"market_update:{symbol}"
-                try:
-                    # Store as a single JSON object instead of individual fields
-                    self.redis_client.set(redis_key, json.dumps(market_update))
-                    self.redis_client.expire(redis_key, 86400)  # 24 hour TTL
-                    
-                    logger.info({
-                        "message": "Market data stored in Redis",
-                        "symbol": symbol,
-                        "key": redis_key
-                    })
-                except Exception as e:
-                    logger.error({
-                        "error": f"Redis storage error: {str(e)}",
-                        "symbol": symbol
-                    })
-
-                # Emit to all clients with market_update event name
-                try:
-                    if self.socketio:
-                        self.socketio.emit('market_update', market_update)
-                        logger.info({
-                            "message": "Market data broadcasted",
-                            "symbol": symbol,
-                            "event": "market_update",
-                            "ltp": market_update['ltp']
-                        })
-                except Exception as e:
-                    logger.error({
-                        "error": f"Socket.IO emission error: {str(e)}",
-                        "symbol": symbol
-                    })
-
-                # Call market data callback if set
-                try:
-                    if self.market_update_cb:
-                        self.market_update_cb(market_update)
-                        logger.info({
-                            "message": "Market data callback executed",
-                            "symbol": symbol
-                        })
-                except Exception as e:
-                    logger.error({
-                        "error": f"Callback error: {str(e)}",
-                        "symbol": symbol
-                    })
-
-            except Exception as e:
-                logger.error({
-                    "error": f"Error processing market data: {str(e)}",
-                    "data": str(data)[:200],
-                    "traceback": str(e.__traceback__)
-                })
+    def _default_pipeline(self):
+        """Redis, Socket.IO and callback sinks for a client used without a shared pipeline"""
+        pipeline = IngestPipeline(source="client")
+        if self.redis_client:
+            pipeline.add_sink("redis", RedisSink(self.redis_client))
+        if self.socketio:
+            pipeline.add_sink("socketio", lambda tick: self.emit('market_update', tick.market_update()))
+        pipeline.add_sink("callback", self._run_market_update_cb)
+        return pipeline
 
-        except Exception as e:
-            logger.error({
-                "error": f"Error in on_message: {str(e)}",
-                "message": str(message)[:200],
-                "traceback": str(e.__traceback__)
-            })
+    def _run_market_update_cb(self, tick):
+        if self.market_update_cb:
+            self.market_update_cb(tick.market_update())
 
     def subscribe(self, symbols):
         """Subscribe to market data with default symbol protection"""
@@ -287,6 +230,11 @@ class FyersWebsocketClient:
             if not isinstance(symbols, list):
                 symbols = [symbols]
                 
+            if not self.is_connected:
+                # Subscribed once the socket (re)connects
+                self._resubscribe_symbols.update(symbols)
+                return
+
             new_symbols = set(symbols) - self.subscribed_symbols
             if new_symbols:
                 self.fyers.subscribe(symbols=list(new_symbols))
@@ -304,6 +252,7 @@ class FyersWebsocketClient:
             
             # Don't unsubscribe from default symbols
             symbols_to_remove = set(symbols) - set(self.default_symbols)
+            self._resubscribe_symbols -= symbols_to_remove
             symbols_to_remove = symbols_to_remove & self.subscribed_symbols
             
             if symbols_to_remove:
@@ -312,4 +261,39 @@ class FyersWebsocketClient:
                 logger.info({"message": "Unsubscribed from symbols", "symbols": list(symbols_to_remove)})
                 
         except Exception as e:
-            logger.error({"error": f"Unsubscribe failed: {str(e)}"})
\ No newline at end of file
+            logger.error({"error": f"Unsubscribe failed: {str(e)}"})
+
+    def subscribe_depth(self, symbols):
+        """Subscribe five-level market depth, on top of the symbol updates"""
+        try:
+            if not isinstance(symbols, list):
+                symbols = [symbols]
+
+            if not self.is_connected:
+                self._resubscribe_depth.update(symbols)
+                return
+
+            new_symbols = set(symbols) - self.depth_symbols
+            if new_symbols:
+                self.fyers.subscribe(symbols=list(new_symbols), data_type="DepthUpdate")
+                self.depth_symbols.update(new_symbols)
+                logger.info({"message": "Subscribed to depth", "symbols": list(new_symbols)})
+
+        except Exception as e:
+            logger.error({"error": f"Depth subscription failed: {str(e)}"})
+
+    def unsubscribe_depth(self, symbols):
+        """Unsubscribe market depth, leaving the symbol updates alone"""
+        try:
+            if not isinstance(symbols, list):
+                symbols = [symbols]
+
+            self._resubscribe_depth -= set(symbols)
+            symbols_to_remove = set(symbols) & self.depth_symbols
+            if symbols_to_remove:
+                self.fyers.unsubscribe(symbols=list(symbols_to_remove), data_type="DepthUpdate")
+                self.depth_symbols -= symbols_to_remove
+                logger.info({"message": "Unsubscribed from depth", "symbols": list(symbols_to_remove)})
+
+        except Exception as e:
+            logger.error({"error": f"Depth unsubscribe failed: {str(e)}"})
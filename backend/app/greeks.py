@@ -0,0 +1,132 @@
+from typing import Dict
+
+import numpy as np
+
+# Annualisation and default risk-free rate for INR options
+SECONDS_PER_YEAR = 365 * 24 * 3600
+DEFAULT_RATE = 0.065
+# Prices under one NSE tick carry no volatility information
+MIN_PRICE = 0.05
+
+SQRT_2PI = np.sqrt(2 * np.pi)
+
+def norm_pdf(x: np.ndarray) -> np.ndarray:
+    return np.exp(-0.5 * x * x) / SQRT_2PI
+
+def norm_cdf(x: np.ndarray) -> np.ndarray:
+    """Standard normal CDF (Abramowitz & Stegun 26.2.17, |error| < 7.5e-8)"""
+    x = np.asarray(x, dtype=np.float64)
+    k = 1.0 / (1.0 + 0.2316419 * np.abs(x))
+    poly = k * (0.319381530 + k * (-0.356563782 + k * (1.781477937 + k * (-1.821255978 + k * 1.330274429))))
+    upper = 1.0 - norm_pdf(x) * poly
+    return np.where(x >= 0, upper, 1.0 - upper)
+
+def _d1_d2(spot, strike, t, rate, sigma):
+    vol_sqrt_t = sigma * np.sqrt(t)
+    d1 = (np.log(spot / strike) + (rate + 0.5 * sigma * sigma) * t) / vol_sqrt_t
+    return d1, d1 - vol_sqrt_t
+
+def straddle_price(spot, strike, t, rate, sigma) -> np.ndarray:
+    """Black-Scholes call + put price"""
+    d1, d2 = _d1_d2(spot, strike, t, rate, sigma)
+    discounted = strike * np.exp(-rate * t)
+    call = spot * norm_cdf(d1) - discounted * norm_cdf(d2)
+    put = discounted * norm_cdf(-d2) - spot * norm_cdf(-d1)
+    return call + put
+
+def option_price(spot, strike, t, rate, sigma, is_call) -> np.ndarray:
+    """Black-Scholes price of a call (is_call True) or put"""
+    d1, d2 = _d1_d2(spot, strike, t, rate, sigma)
+    discounted = strike * np.exp(-rate * t)
+    call = spot * norm_cdf(d1) - discounted * norm_cdf(d2)
+    return np.where(is_call, call, call - spot + discounted)
+
+def implied_vol(price, spot, strike, t, rate=DEFAULT_RATE, kind: str = "straddle",
+                tol: float = 1e-6, max_iter: int = 50, min_price: float = MIN_PRICE) -> np.ndarray:
+    """
+    Solve implied volatility for every element at once.
+
+    `kind` is "call", "put" or "straddle" (call + put at one strike). Each
+    iteration is a Newton step on the whole array, falling back to
+    bisection wherever Newton would leave the [lo, hi] bracket, so all
+    elements converge together without a Python loop over rows. Elements
+    with no solution (price outside no-arbitrage bounds, under `min_price`,
+    expired) are NaN.
+    """
+    price, spot, strike, t = np.broadcast_arrays(*(np.asarray(a, dtype=np.float64) for a in (price, spot, strike, t)))
+    valid = (price >= min_price) & (spot > 0) & (strike > 0) & (t > 0) & np.isfinite(price) & np.isfinite(spot)
+    t_safe = np.where(valid, t, 1.0)
+    spot_safe = np.where(valid, spot, 1.0)
+    strike_safe = np.where(valid, strike, 1.0)
+    multiplier = 2.0 if kind == "straddle" else 1.0
+
+    def model(sigma):
+        if kind == "straddle":
+            return straddle_price(spot_safe, strike_safe, t_safe, rate, sigma)
+        return option_price(spot_safe, strike_safe, t_safe, rate, sigma, kind == "call")
+
+    lo = np.full(price.shape, 1e-4)
+    hi = np.full(price.shape, 5.0)
+    # Brenner-Subrahmanyam starting point
+    sigma = np.clip(np.sqrt(2 * np.pi / t_safe) * price / spot_safe / multiplier, 0.01, 3.0)
+    valid &= (model(lo) <= price) & (price <= model(hi))
+
+    for _ in range(max_iter):
+        diff = model(sigma) - price
+        done = np.abs(diff) < tol
+        if np.all(done | ~valid):
+            break
+        lo = np.where(diff < 0, sigma, lo)
+        hi = np.where(diff > 0, sigma, hi)
+        d1, _ = _d1_d2(spot_safe, strike_safe, t_safe, rate, sigma)
+        vega = multiplier * spot_safe * norm_pdf(d1) * np.sqrt(t_safe)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = sigma - diff / vega
+        bisect = 0.5 * (lo + hi)
+        step = np.where((newton > lo) & (newton < hi) & np.isfinite(newton), newton, bisect)
+        sigma = np.where(done, sigma, step)
+
+    return np.where(valid, sigma, np.nan)
+
+def straddle_greeks(spot, strike, t, sigma, rate=DEFAULT_RATE) -> Dict[str, np.ndarray]:
+    """
+    Straddle greeks per element.
+
+    Vega is per 1 vol point (0.01) and theta per calendar day, the way
+    traders quote them.
+    """
+    spot, strike, t, sigma = np.broadcast_arrays(*(np.asarray(a, dtype=np.float64) for a in (spot, strike, t, sigma)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d1, d2 = _d1_d2(spot, strike, t, rate, sigma)
+        sqrt_t = np.sqrt(t)
+        pdf = norm_pdf(d1)
+        discounted = strike * np.exp(-rate * t)
+        call_delta = norm_cdf(d1)
+        gamma = pdf / (spot * sigma * sqrt_t)
+        vega = spot * pdf * sqrt_t
+        decay = -spot * pdf * sigma / (2 * sqrt_t)
+        call_theta = decay - rate * discounted * norm_cdf(d2)
+        put_theta = decay + rate * discounted * norm_cdf(-d2)
+    return {
+        "delta": 2 * call_delta - 1,
+        "gamma": 2 * gamma,
+        "vega": 2 * vega / 100,
+        "theta": (call_theta + put_theta) / 365,
+    }
+
+def time_to_expiry(timestamps: np.ndarray, expiry_ts: int) -> np.ndarray:
+    """Years from each epoch-second timestamp to expiry"""
+    return (expiry_ts - np.asarray(timestamps, dtype=np.float64)) / SECONDS_PER_YEAR
+
+def straddle_analytics(timestamps: np.ndarray, ce_close: np.ndarray, pe_close: np.ndarray,
+                       spot: np.ndarray, strike, expiry_ts: int, rate: float = DEFAULT_RATE) -> Dict[str, np.ndarray]:
+    """Straddle IV, per-leg IVs and straddle greeks for aligned close series"""
+    t = time_to_expiry(timestamps, expiry_ts)
+    straddle = ce_close + pe_close
+    iv = implied_vol(straddle, spot, strike, t, rate, kind="straddle")
+    return {
+        "iv": iv,
+        "ce_iv": implied_vol(ce_close, spot, strike, t, rate, kind="call"),
+        "pe_iv": implied_vol(pe_close, spot, strike, t, rate, kind="put"),
+        **straddle_greeks(spot, strike, t, iv, rate),
+    }
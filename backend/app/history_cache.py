@@ -0,0 +1,115 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Hashable
+
+from market_hours import is_market_open, next_open, now_ist
+
+logger = logging.getLogger(__name__)
+
+class _Entry:
+    __slots__ = ("value", "expires_at")
+
+    def __init__(self, value: Any, expires_at: float):
+        self.value = value
+        self.expires_at = expires_at
+
+class HistoryCache:
+    """
+    In-memory cache for historical responses.
+
+    - Concurrent requests for the same key share one upstream load (single-flight)
+    - Entries live for `live_ttl` seconds during market hours, `closed_ttl` otherwise,
+      but never past the next open, so history warmed before the session is
+      revalidated as soon as it starts
+    - Expired entries are served for up to `stale_ttl` seconds while a background
+      load revalidates them; past that, callers wait at most `slow_timeout`
+      seconds and fall back to the old value if upstream is slow or failing
+    """
+
+    def __init__(self, live_ttl: float = 30, closed_ttl: float = 3600, stale_ttl: float = 300,
+                 slow_timeout: float = 5, max_entries: int = 512, max_workers: int = 8):
+        self.live_ttl = live_ttl
+        self.closed_ttl = closed_ttl
+        self.stale_ttl = stale_ttl
+        self.slow_timeout = slow_timeout
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._inflight: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="history-cache")
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "coalesced": 0, "loads": 0, "errors": 0}
+
+    def ttl(self) -> float:
+        if is_market_open():
+            return self.live_ttl
+        now = now_ist()
+        return min(self.closed_ttl, (next_open(now) - now).total_seconds())
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for key, loading it at most once per TTL"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now < entry.expires_at:
+                self._stats["hits"] += 1
+                self._entries.move_to_end(key)
+                return entry.value
+
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._executor.submit(self._load, key, loader)
+                self._inflight[key] = future
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if entry is None:
+            return future.result()
+
+        if now < entry.expires_at + self.stale_ttl:
+            with self._lock:
+                self._stats["stale"] += 1
+            return entry.value
+
+        try:
+            return future.result(timeout=self.slow_timeout)
+        except FutureTimeoutError:
+            logger.warning(f"Upstream slow for {key}, serving stale data")
+        except Exception as e:
+            logger.warning(f"Upstream failed for {key}, serving stale data: {str(e)}")
+        with self._lock:
+            self._stats["stale"] += 1
+        return entry.value
+
+    def _load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        try:
+            value = loader()
+            with self._lock:
+                self._stats["loads"] += 1
+                self._entries[key] = _Entry(value, time.monotonic() + self.ttl())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return value
+        except Exception:
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def invalidate(self, key: Hashable = None):
+        """Drop one key, or everything when key is None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries), "inflight": len(self._inflight)}
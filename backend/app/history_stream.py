@@ -0,0 +1,41 @@
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterator, Tuple
+
+import pandas as pd
+
+from candle_store import CandleStore
+
+# Days of candles held in memory per streamed chunk
+STREAM_CHUNK_DAYS = 5
+
+def iter_windows(start: date, end: date, days: int = STREAM_CHUNK_DAYS) -> Iterator[Tuple[date, date]]:
+    """Consecutive inclusive [start, end] windows of at most `days` days"""
+    while start <= end:
+        window_end = min(end, start + timedelta(days=days - 1))
+        yield start, window_end
+        start = window_end + timedelta(days=1)
+
+def load_window(symbol: str, resolution: str, start: date, end: date, store: CandleStore,
+                fetch: Callable[..., pd.DataFrame]) -> pd.DataFrame:
+    """Candles for a window from the local store when complete there, else from upstream"""
+    if store.is_covered(symbol, resolution, start, end):
+        return store.read(symbol, resolution, start, end)
+
+    df = fetch(symbol, start.isoformat(), end.isoformat(), resolution)
+    store.write_range(symbol, resolution, df, start, end)
+    return df
+
+def iter_straddle_chunks(legs: Dict[str, str], resolution: str, start: date, end: date,
+                         store: CandleStore, fetch: Callable[..., pd.DataFrame],
+                         chunk_days: int = STREAM_CHUNK_DAYS) -> Iterator[Dict[str, pd.DataFrame]]:
+    """
+    Yield candles for every leg one window at a time.
+
+    Only one window per leg is held in memory, so peak memory is bounded by
+    `chunk_days` regardless of how long the requested range is.
+    """
+    for window_start, window_end in iter_windows(start, end, chunk_days):
+        yield {
+            name: load_window(symbol, resolution, window_start, window_end, store, fetch)
+            for name, symbol in legs.items()
+        }
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+import anyio.to_thread
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from market_hours import MARKET_OPEN, is_market_open, is_trading_day, now_ist
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Longest max-age handed out for closed-session data
+MAX_CLOSED_AGE = 3600
+# Bodies at least this large are compressed off the event loop
+THREAD_MINIMUM_SIZE = 128 * 1024
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag over the values that determine a response body"""
+    digest = hashlib.sha1(json.dumps(parts, default=str, separators=(',', ':')).encode()).hexdigest()
+    return f'"{digest[:24]}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check If-None-Match against an ETag (weak comparison, as RFC 9110 requires)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in tags
+
+def seconds_until_open(now: Optional[datetime] = None) -> int:
+    """Seconds until the next session opens"""
+    now = now or now_ist()
+    candidate = now.replace(hour=MARKET_OPEN.hour, minute=MARKET_OPEN.minute, second=0, microsecond=0)
+    if candidate <= now:
+        candidate += timedelta(days=1)
+    while not is_trading_day(candidate):
+        candidate += timedelta(days=1)
+    return int((candidate - now).total_seconds())
+
+def cache_control(now: Optional[datetime] = None) -> str:
+    """
+    Cache-Control for market data responses.
+
+    While the session is live, clients must revalidate every time (cheap
+    with ETags). Once it has closed the data cannot change until the next
+    open, or until midnight moves the date window, so it may be reused.
+    """
+    now = now or now_ist()
+    if is_market_open(now):
+        return "no-cache"
+    midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    max_age = min(seconds_until_open(now), int((midnight - now).total_seconds()), MAX_CLOSED_AGE)
+    return f"public, max-age={max_age}"
+
+def conditional_response(request: Request, etag: str, payload: Any) -> Response:
+    """
+    304 when the client already holds this ETag, otherwise the JSON payload.
+
+    `payload` may be a zero-argument callable so the body is only built
+    when it is actually sent.
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control()}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if callable(payload):
+        payload = payload()
+    return JSONResponse(content=jsonable_encoder(payload), headers=headers)
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, None for identity"""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    if brotli and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=5)
+        else:
+            self._gz = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    async def compress_async(self, body: bytes, final: bool) -> bytes:
+        if len(body) >= THREAD_MINIMUM_SIZE:
+            return await anyio.to_thread.run_sync(self.compress, body, final)
+        return self.compress(body, final)
+
+    def compress(self, body: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            data = self._br.process(body)
+            return data + (self._br.finish() if final else self._br.flush())
+        data = self._gz.compress(body)
+        return data + self._gz.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class CompressionMiddleware:
+    """
+    Compress HTTP responses with brotli or gzip, negotiated per request.
+
+    Streaming bodies are flushed chunk by chunk so NDJSON clients still
+    receive each line as soon as it is produced.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if "content-encoding" in headers or message["status"] in (204, 206, 304):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                data = await compressor.compress_async(body, not more_body)
+                headers["Content-Encoding"] = encoding
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(data))
+                await send(start_message)
+                start_message = None
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+                return
+
+            data = await compressor.compress_async(body, not more_body)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,180 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from market_hours import IST_OFFSET
+
+@dataclass(frozen=True)
+class IndicatorConfig:
+    sma_period: int = 20
+    ema_period: int = 20
+    bb_period: int = 20
+    bb_std: float = 2.0
+
+    def key(self) -> str:
+        return f"{self.sma_period}-{self.ema_period}-{self.bb_period}-{self.bb_std:g}"
+
+def sma(values: np.ndarray, period: int) -> np.ndarray:
+    """Simple moving average via a prefix sum, NaN until `period` values are in"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if len(values) >= period:
+        csum = np.cumsum(np.insert(values, 0, 0.0))
+        out[period - 1:] = (csum[period:] - csum[:-period]) / period
+    return out
+
+def rolling_std(values: np.ndarray, period: int) -> np.ndarray:
+    """Population standard deviation over a trailing window"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if len(values) >= period:
+        # Centre first so the sum of squares does not cancel catastrophically
+        centred = values - np.mean(values)
+        mean = sma(centred, period)[period - 1:]
+        mean_sq = sma(centred * centred, period)[period - 1:]
+        out[period - 1:] = np.sqrt(np.maximum(mean_sq - mean * mean, 0.0))
+    return out
+
+def ema(values: np.ndarray, period: int) -> np.ndarray:
+    """Exponential moving average seeded with the first value, as the chart draws it"""
+    return pd.Series(values, dtype=np.float64).ewm(alpha=2 / (period + 1), adjust=False).mean().to_numpy()
+
+def session_vwap(timestamps: np.ndarray, high: np.ndarray, low: np.ndarray,
+                 close: np.ndarray, volume: np.ndarray) -> np.ndarray:
+    """VWAP of the typical price, anchored at the first bar of each IST session"""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    tpv = np.cumsum((np.asarray(high) + np.asarray(low) + np.asarray(close)) / 3 * volume)
+    vol = np.cumsum(np.asarray(volume, dtype=np.float64))
+    day = (timestamps + IST_OFFSET) // 86400
+    starts = np.flatnonzero(np.r_[True, day[1:] != day[:-1]]) if len(day) else np.empty(0, dtype=np.int64)
+    # Index of each bar's session start, then subtract the running totals before it
+    session_start = starts[np.searchsorted(starts, np.arange(len(day)), side="right") - 1]
+    tpv_before = np.r_[0.0, tpv[:-1]][session_start]
+    vol_before = np.r_[0.0, vol[:-1]][session_start]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(vol > vol_before, (tpv - tpv_before) / (vol - vol_before), np.nan)
+
+def compute_indicators(timestamps: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                       volume: np.ndarray, config: IndicatorConfig = IndicatorConfig()) -> Dict[str, np.ndarray]:
+    """Every indicator over a whole bar series in one vectorized pass"""
+    middle = sma(close, config.bb_period)
+    width = config.bb_std * rolling_std(close, config.bb_period)
+    return {
+        "sma": sma(close, config.sma_period),
+        "ema": ema(close, config.ema_period),
+        "bb_upper": middle + width,
+        "bb_middle": middle,
+        "bb_lower": middle - width,
+        "vwap": session_vwap(timestamps, high, low, close, volume),
+    }
+
+class _Window:
+    """Running sum and sum of squares over the last `period - 1` closed values"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.values = deque(maxlen=period - 1)
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def push(self, value: float):
+        if self.values.maxlen == 0:
+            return
+        if len(self.values) == self.values.maxlen:
+            oldest = self.values[0]
+            self.total -= oldest
+            self.total_sq -= oldest * oldest
+        self.values.append(value)
+        self.total += value
+        self.total_sq += value * value
+
+    def stats(self, current: float):
+        """(mean, std) including the forming value, None until the window is full"""
+        if len(self.values) < self.period - 1:
+            return None
+        mean = (self.total + current) / self.period
+        var = (self.total_sq + current * current) / self.period - mean * mean
+        return mean, float(np.sqrt(max(var, 0.0)))
+
+class IndicatorEngine:
+    """
+    Incremental indicators for a live bar series.
+
+    State covers closed bars only; the forming bar is applied on top of it
+    on every update, so repeated updates to the same bar and the roll to a
+    new bar are both O(1). `seed` primes the state from history with the
+    vectorized batch functions.
+    """
+
+    def __init__(self, config: IndicatorConfig = IndicatorConfig()):
+        self.config = config
+        self._reset()
+
+    def _reset(self):
+        config = self.config
+        self._sma = _Window(config.sma_period)
+        self._bb = _Window(config.bb_period)
+        self._ema: Optional[float] = None
+        self._session: Optional[int] = None
+        self._tpv = 0.0
+        self._vol = 0.0
+        self._pending: Optional[Dict[str, float]] = None
+
+    def seed(self, timestamps: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+             volume: np.ndarray) -> Dict[str, np.ndarray]:
+        """Batch indicators over history; the last bar is kept as the forming bar"""
+        series = compute_indicators(timestamps, high, low, close, volume, self.config)
+        n = len(close)
+        if n == 0:
+            return series
+        self._reset()
+        for value in close[max(0, n - self.config.sma_period):n - 1]:
+            self._sma.push(float(value))
+        for value in close[max(0, n - self.config.bb_period):n - 1]:
+            self._bb.push(float(value))
+        if n > 1:
+            self._ema = float(series["ema"][n - 2])
+            session = (np.asarray(timestamps[:n - 1], dtype=np.int64) + IST_OFFSET) // 86400
+            in_session = session == session[-1]
+            typical = (high[:n - 1] + low[:n - 1] + close[:n - 1]) / 3
+            self._session = int(session[-1])
+            self._tpv = float(np.sum(typical[in_session] * volume[:n - 1][in_session]))
+            self._vol = float(np.sum(volume[:n - 1][in_session]))
+        self._pending = {"timestamp": int(timestamps[-1]), "high": float(high[-1]), "low": float(low[-1]),
+                         "close": float(close[-1]), "volume": float(volume[-1])}
+        return series
+
+    def _commit(self, bar: Dict[str, float]):
+        close = bar["close"]
+        self._sma.push(close)
+        self._bb.push(close)
+        self._ema = close if self._ema is None else self._ema + (close - self._ema) * 2 / (self.config.ema_period + 1)
+        session = (bar["timestamp"] + IST_OFFSET) // 86400
+        if session != self._session:
+            self._session, self._tpv, self._vol = session, 0.0, 0.0
+        self._tpv += (bar["high"] + bar["low"] + close) / 3 * bar["volume"]
+        self._vol += bar["volume"]
+
+    def update(self, timestamp: int, high: float, low: float, close: float, volume: float) -> Dict[str, Optional[float]]:
+        """Indicator values for the forming bar; a newer timestamp closes the previous bar"""
+        if self._pending is not None and timestamp > self._pending["timestamp"]:
+            self._commit(self._pending)
+        self._pending = {"timestamp": timestamp, "high": high, "low": low, "close": close, "volume": volume}
+
+        sma_stats = self._sma.stats(close)
+        bb_stats = self._bb.stats(close)
+        ema_value = close if self._ema is None else self._ema + (close - self._ema) * 2 / (self.config.ema_period + 1)
+        same_session = (timestamp + IST_OFFSET) // 86400 == self._session
+        tpv = (self._tpv if same_session else 0.0) + (high + low + close) / 3 * volume
+        vol = (self._vol if same_session else 0.0) + volume
+        return {
+            "sma": sma_stats[0] if sma_stats else None,
+            "ema": ema_value,
+            "bb_upper": bb_stats[0] + self.config.bb_std * bb_stats[1] if bb_stats else None,
+            "bb_middle": bb_stats[0] if bb_stats else None,
+            "bb_lower": bb_stats[0] - self.config.bb_std * bb_stats[1] if bb_stats else None,
+            "vwap": tpv / vol if vol > 0 else None,
+        }
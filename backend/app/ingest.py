@@ -0,0 +1,272 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the stdlib json is always available
+    orjson = None
+
+if orjson:
+    loads, dumps = orjson.loads, orjson.dumps
+else:
+    loads = json.loads
+
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode()
+
+def _bounded_int(text: str) -> int:
+    if len(text) > 100:
+        raise ValueError('Integer is too large')
+    return int(text)
+
+class RawJSON:
+    """JSON that is already encoded, placed into Socket.IO packets as-is by PacketJSON"""
+    __slots__ = ('data',)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+class PacketJSON:
+    """`json` for the Socket.IO server that splices RawJSON event arguments instead of re-encoding them"""
+    @staticmethod
+    def loads(*args, **kwargs) -> Any:
+        # Same guard as engine.io's default json: no huge integers from clients
+        kwargs.setdefault('parse_int', _bounded_int)
+        return json.loads(*args, **kwargs)
+
+    @staticmethod
+    def dumps(obj: Any, **kwargs) -> str:
+        if isinstance(obj, list) and any(isinstance(item, RawJSON) for item in obj):
+            return '[' + ','.join(
+                item.data.decode() if isinstance(item, RawJSON) else json.dumps(item, **kwargs) for item in obj
+            ) + ']'
+        return json.dumps(obj, **kwargs)
+
+@dataclass(slots=True)
+class Tick:
+    """
+    One normalized feed update; prices are floats, times epoch seconds unless noted.
+
+    The payload dicts and their encodings are built on first use and cached
+    on the tick, so every sink shares them; treat them as read-only.
+    """
+    symbol: str
+    timestamp: float        # exchange feed time, receive time if the feed has none
+    received_ms: int
+    ltp: float
+    open: float
+    high: float
+    low: float
+    prev_close: float
+    volume: int             # cumulative for the day
+    bid: float
+    ask: float
+    bid_qty: int
+    ask_qty: int
+    change: float
+    change_percent: float
+    _cache: Optional[Dict[str, Any]] = field(default=None, repr=False, compare=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in TICK_FIELDS}
+
+    def ws_update(self) -> Dict[str, Any]:
+        """Payload of the `/ws` broadcast"""
+        cache = self._cache if self._cache is not None else self._new_cache()
+        payload = cache.get('ws')
+        if payload is None:
+            payload = cache['ws'] = {
+                'symbol': self.symbol, 'timestamp': self.timestamp, 'ltp': self.ltp, 'open': self.open,
+                'high': self.high, 'low': self.low, 'prev_close': self.prev_close, 'change': self.change,
+                'change_percent': self.change_percent, 'volume': self.volume
+            }
+        return payload
+
+    def market_update(self) -> Dict[str, Any]:
+        """Payload of the Socket.IO `market_update` event (receive time in ms, previous close as `close`)"""
+        cache = self._cache if self._cache is not None else self._new_cache()
+        payload = cache.get('market_update')
+        if payload is None:
+            payload = cache['market_update'] = {
+                'symbol': self.symbol, 'timestamp': self.received_ms, 'ltp': self.ltp, 'open': self.open,
+                'high': self.high, 'low': self.low, 'close': self.prev_close, 'volume': self.volume,
+                'bid': self.bid, 'ask': self.ask, 'bid_qty': self.bid_qty, 'ask_qty': self.ask_qty,
+                'change': self.change, 'change_percent': self.change_percent
+            }
+        return payload
+
+    def encoded(self, kind: str) -> bytes:
+        """JSON of the `ws` or `market_update` payload, encoded once per tick"""
+        cache = self._cache if self._cache is not None else self._new_cache()
+        key = kind + '.json'
+        data = cache.get(key)
+        if data is None:
+            data = cache[key] = dumps(self.ws_update() if kind == 'ws' else self.market_update())
+        return data
+
+    def _new_cache(self) -> Dict[str, Any]:
+        self._cache = {}
+        return self._cache
+
+TICK_FIELDS = tuple(name for name in Tick.__dataclass_fields__ if name != '_cache')
+
+# Fyers SymbolUpdate key and type of each Tick field from ltp to ask_qty, in Tick order
+_FIELD_MAP = (
+    ('ltp', float), ('open_price', float), ('high_price', float), ('low_price', float),
+    ('prev_close_price', float), ('vol_traded_today', int), ('bid_price', float), ('ask_price', float),
+    ('bid_size', int), ('ask_size', int),
+)
+
+def normalize(message: Any) -> Optional[Tick]:
+    """Parse a raw Fyers SymbolUpdate (JSON text or dict) into a Tick, None for anything else"""
+    data = loads(message) if isinstance(message, (str, bytes)) else message
+    if type(data) is not dict:
+        return None
+    symbol = data.get('symbol')
+    if not symbol:
+        return None
+    get = data.get
+    values = [cast(get(key) or 0) for key, cast in _FIELD_MAP]
+    now = time.time()
+    ltp, prev_close = values[0], values[4]
+    change, change_percent = get('ch'), get('chp')
+    if change is None:
+        base = prev_close or ltp
+        change = round(ltp - base, 2)
+        change_percent = round((ltp - base) / base * 100, 2) if base else 0.0
+    return Tick(str(symbol), get('exch_feed_time') or int(now), int(now * 1000), *values,
+                float(change), float(change_percent or 0))
+
+class _SinkStats:
+    __slots__ = ("calls", "errors", "total_ns", "samples")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_ns = 0
+        self.samples: Deque[int] = deque(maxlen=1024)
+
+class IngestPipeline:
+    """
+    The single path from the market data socket to everything that uses ticks.
+
+    Each message is recorded raw (if a recorder is set), normalized into a
+    Tick once, and handed to every registered sink in registration order.
+    Sinks are isolated from each other: an exception is counted and logged
+    (the first and then every 1000th) and the next sink still runs. Every
+    sink call is timed, so `stats` shows where the hot path spends its time.
+    Market depth messages are not ticks; they go to `on_depth` as parsed
+    dicts (timed as "depth") and to no sink.
+    """
+
+    def __init__(self, recorder=None, source: str = "data_ws",
+                 on_depth: Optional[Callable[[Dict[str, Any]], Any]] = None):
+        self.recorder = recorder
+        self.source = source
+        self.on_depth = on_depth
+        self.sinks: Dict[str, Callable[[Tick], Any]] = {}
+        self._stats: Dict[str, _SinkStats] = {"depth": _SinkStats()} if on_depth else {}
+        self._counts = {"messages": 0, "ticks": 0, "depth": 0, "skipped": 0, "invalid": 0}
+        self._lock = threading.Lock()
+
+    def add_sink(self, name: str, sink: Callable[[Tick], Any]):
+        with self._lock:
+            self.sinks = {**self.sinks, name: sink}
+            self._stats.setdefault(name, _SinkStats())
+
+    def remove_sink(self, name: str):
+        with self._lock:
+            self.sinks = {key: sink for key, sink in self.sinks.items() if key != name}
+
+    def on_message(self, message: Any):
+        """Feed socket callback"""
+        if self.recorder:
+            self.recorder.record(message, self.source)
+        self._counts["messages"] += 1
+        try:
+            data = loads(message) if isinstance(message, (str, bytes)) else message
+            if type(data) is dict and data.get('type') == 'dp':
+                self._counts["depth"] += 1
+                if self.on_depth:
+                    self._call("depth", self.on_depth, data)
+                return
+            tick = normalize(data)
+        except (ValueError, TypeError) as e:
+            self._counts["invalid"] += 1
+            logger.error(f"Unparseable feed message ({str(e)}): {str(message)[:200]}")
+            return
+        if tick is None:
+            self._counts["skipped"] += 1
+            return
+        self.dispatch(tick)
+
+    def dispatch(self, tick: Tick):
+        """Hand a tick to every sink, timing each and isolating failures"""
+        self._counts["ticks"] += 1
+        for name, sink in self.sinks.items():
+            self._call(name, sink, tick)
+
+    def _call(self, name: str, handler: Callable[[Any], Any], arg: Any):
+        stats = self._stats[name]
+        start = time.perf_counter_ns()
+        try:
+            handler(arg)
+        except Exception as e:
+            stats.errors += 1
+            if stats.errors % 1000 == 1:
+                logger.error(f"Ingest sink {name} failed ({stats.errors} errors so far): {str(e)}")
+        elapsed = time.perf_counter_ns() - start
+        stats.calls += 1
+        stats.total_ns += elapsed
+        stats.samples.append(elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        sinks = {}
+        for name, stats in list(self._stats.items()):
+            samples = np.asarray(stats.samples) / 1000
+            sinks[name] = {
+                "calls": stats.calls,
+                "errors": stats.errors,
+                "avg_us": round(stats.total_ns / stats.calls / 1000, 2) if stats.calls else 0,
+                "p50_us": round(float(np.percentile(samples, 50)), 2) if len(samples) else 0,
+                "p99_us": round(float(np.percentile(samples, 99)), 2) if len(samples) else 0,
+            }
+        return {**self._counts, "sinks": sinks}
+
+class TickRing:
+    """The last `size` ticks of every symbol"""
+
+    def __init__(self, size: int = 512):
+        self.size = size
+        self._ticks: Dict[str, Deque[Tick]] = {}
+
+    def __call__(self, tick: Tick):
+        ring = self._ticks.get(tick.symbol)
+        if ring is None:
+            ring = self._ticks.setdefault(tick.symbol, deque(maxlen=self.size))
+        ring.append(tick)
+
+    def recent(self, symbol: str, limit: Optional[int] = None) -> List[Tick]:
+        ticks = list(self._ticks.get(symbol, ()))
+        return ticks[-limit:] if limit else ticks
+
+class RedisSink:
+    """Latest Socket.IO payload per symbol under `market_update:<symbol>` for other processes"""
+
+    def __init__(self, client, ttl: int = 86400):
+        self.client = client
+        self.ttl = ttl
+
+    def __call__(self, tick: Tick):
+        key = f"market_update:{tick.symbol}"
+        self.client.set(key, tick.encoded("market_update"))
+        self.client.expire(key, self.ttl)
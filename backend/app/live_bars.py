@@ -0,0 +1,104 @@
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from indicators import IndicatorConfig, IndicatorEngine
+from straddle_chain import build_straddle_chain
+
+def resolution_seconds(resolution: str) -> int:
+    """Bar length for a minute resolution in Fyers format ("1", "5", ...)"""
+    if not resolution.isdigit():
+        raise ValueError(f"Live bars need a minute resolution, got {resolution}")
+    return int(resolution) * 60
+
+def straddle_bars(ce_df: pd.DataFrame, pe_df: pd.DataFrame) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Straddle OHLCV arrays (CE + PE) over the bars where both legs traded"""
+    chain = build_straddle_chain([ce_df], [pe_df])
+    bars = {field: values[0] for field, values in chain["straddle"].items()}
+    complete = np.isfinite(bars["close"])
+    return chain["timestamps"][complete], {field: values[complete] for field, values in bars.items()}
+
+class StraddleBarBuilder:
+    """
+    Builds straddle OHLCV bars from CE and PE ticks.
+
+    The straddle price is the sum of the latest LTP of both legs, so no bar
+    is produced until each leg has ticked once. Fyers ticks carry the
+    cumulative day volume, bar volume is the increase across both legs.
+    """
+
+    def __init__(self, ce_symbol: str, pe_symbol: str, interval: int = 60):
+        self.ce_symbol = ce_symbol
+        self.pe_symbol = pe_symbol
+        self.interval = interval
+        self._ltp: Dict[str, float] = {}
+        self._day_volume: Dict[str, int] = {}
+        self.bar: Optional[Dict[str, float]] = None
+
+    def on_tick(self, symbol: str, ltp: float, day_volume: int, timestamp: int) -> Optional[Dict[str, float]]:
+        """Apply a tick (epoch seconds) and return the forming bar"""
+        previous_volume = self._day_volume.get(symbol)
+        self._ltp[symbol] = ltp
+        self._day_volume[symbol] = day_volume
+        if previous_volume is None:
+            traded = 0
+        else:
+            # The counter restarts at zero each session
+            traded = day_volume - previous_volume if day_volume >= previous_volume else day_volume
+        if self.ce_symbol not in self._ltp or self.pe_symbol not in self._ltp:
+            return None
+
+        price = self._ltp[self.ce_symbol] + self._ltp[self.pe_symbol]
+        start = timestamp - timestamp % self.interval
+        if self.bar is None or start > self.bar["timestamp"]:
+            self.bar = {"timestamp": start, "open": price, "high": price, "low": price, "close": price, "volume": 0}
+        elif start < self.bar["timestamp"]:
+            # Late tick for a bar that has already closed
+            return self.bar
+        bar = self.bar
+        bar["high"] = max(bar["high"], price)
+        bar["low"] = min(bar["low"], price)
+        bar["close"] = price
+        bar["volume"] += traded
+        return bar
+
+class LiveStraddle:
+    """Live straddle bars for one strike with indicators updated on every tick"""
+
+    def __init__(self, ce_symbol: str, pe_symbol: str, resolution: str = "1",
+                 config: IndicatorConfig = IndicatorConfig()):
+        self.ce_symbol = ce_symbol
+        self.pe_symbol = pe_symbol
+        self.resolution = resolution
+        self.config = config
+        self.room = f"straddle:{ce_symbol}|{pe_symbol}|{resolution}|{config.key()}"
+        self.builder = StraddleBarBuilder(ce_symbol, pe_symbol, resolution_seconds(resolution))
+        self.engine = IndicatorEngine(config)
+        self.snapshot: Dict[str, Any] = {"timestamps": [], "indicators": {}}
+        self._lock = threading.Lock()
+
+    @property
+    def symbols(self):
+        return (self.ce_symbol, self.pe_symbol)
+
+    def seed(self, ce_df: pd.DataFrame, pe_df: pd.DataFrame) -> Dict[str, Any]:
+        """Prime indicators from historical candles, returns the batch series"""
+        timestamps, bars = straddle_bars(ce_df, pe_df)
+        with self._lock:
+            series = self.engine.seed(timestamps, bars["high"], bars["low"], bars["close"], bars["volume"])
+            if len(timestamps):
+                self.builder.bar = {"timestamp": int(timestamps[-1]),
+                                    **{field: float(values[-1]) for field, values in bars.items()}}
+            self.snapshot = {"timestamps": timestamps.tolist(), "indicators": series}
+        return self.snapshot
+
+    def on_tick(self, symbol: str, ltp: float, day_volume: int, timestamp: int) -> Optional[Dict[str, Any]]:
+        """Bar and indicator update to push, None until both legs have ticked"""
+        with self._lock:
+            bar = self.builder.on_tick(symbol, ltp, day_volume, timestamp)
+            if bar is None:
+                return None
+            values = self.engine.update(bar["timestamp"], bar["high"], bar["low"], bar["close"], bar["volume"])
+            return {"room": self.room, "bar": dict(bar), "indicators": values}
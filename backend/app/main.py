@@ -1,5 +1,6 @@
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import pandas as pd
 from pathlib import Path
 import logging
@@ -7,21 +8,50 @@ import os
 import sys
 import json
 import time
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import pytz
 import numpy as np
-from typing import Dict, Optional, List, Any
+from typing import Dict, Optional, List, Any, Set, Tuple, Union
 import pyarrow.parquet as pq
 from fyers_apiv3 import fyersModel
-from fyers_apiv3.FyersWebsocket import data_ws
-from Fyers_login import ensure_valid_token, CLIENT_ID
+from Fyers_login import (
+    ensure_valid_token, get_fyers_model, add_token_listener,
+    schedule_token_refresh, cancel_token_refresh, refresh_access_token,
+    token_expires_in, token_refresh_running, download_master_instruments, TOKEN_REFRESH_LEAD
+)
 from contextlib import asynccontextmanager
 import asyncio
 from queue import Queue
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from pydantic import BaseModel
 import socketio
 from fyers_ws import FyersWebsocketClient
+from history_cache import HistoryCache
+from upstream import upstream_scheduler, is_throttled, INTERACTIVE, BACKGROUND
+from master_index import MasterIndex
+from straddle_chain import format_candles, to_json_grid
+from greeks import DEFAULT_RATE
+from indicators import IndicatorConfig
+from live_bars import LiveStraddle
+from feed_journal import FeedRecorder
+from ingest import IngestPipeline, PacketJSON, RawJSON, RedisSink, Tick, TickRing
+from candle_store import CandleStore
+from backfill import BackfillManager, chunk_ranges
+from history_stream import iter_straddle_chunks
+from market_hours import format_ist, now_ist, IST, MARKET_CLOSE
+from warmup import WarmupScheduler
+from subscriptions import SubscriptionManager, SubscriptionLimitError
+from atm_tracker import AtmTracker
+from depth import DepthBooks
+from tick_archive import TickArchive
+from analytics import Analytics, QueryError
+from chart_session import ChartSessions
+from compute import (
+    ComputeBusy, ComputeExecutor, pack_frame, straddle_payload_task, straddle_chain_task,
+    straddle_iv_task, straddle_indicators_task
+)
+from http_cache import CompressionMiddleware, conditional_response, etag_matches, make_etag, cache_control
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -45,6 +75,120 @@ INDEX_SYMBOLS = {
     "BANKEX": "BSE:BANKEX-INDEX"
 }
 
+# Shared cache for historical straddle responses
+history_cache = HistoryCache()
+
+# Sorted strike ladders per (underlying, expiry), rebuilt when the master changes
+master_index = MasterIndex(DATA_DIR / "master_file.csv")
+
+# Parallel leg fetches for straddle chains
+MAX_CHAIN_STRIKES = 41
+chain_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="chain-fetch")
+# Chunks of long ranges, kept separate so chunk fetches never wait on chain fetches
+chunk_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="chunk-fetch")
+# Process pool for CPU-heavy stages (straddle synthesis, chains, IV solves, indicators)
+compute = ComputeExecutor(
+    workers=int(os.getenv("COMPUTE_WORKERS", str(min(2, os.cpu_count() or 1)))),
+    max_pending=int(os.getenv("COMPUTE_MAX_PENDING", "32"))
+)
+
+# Local candle store filled by resumable backfill jobs
+candle_store = CandleStore(DATA_DIR / "candles")
+backfill_manager = BackfillManager(candle_store, DATA_DIR / "backfill", lambda *args: fetch_candles(*args))
+
+# Journal of every raw feed message for offline replay (RECORD_FEED=0 disables it);
+# journals older than FEED_JOURNAL_RETAIN_DAYS or past FEED_JOURNAL_RETAIN_MB in total are pruned
+feed_recorder = FeedRecorder(
+    DATA_DIR / "journal",
+    retain_days=float(os.getenv("FEED_JOURNAL_RETAIN_DAYS", "7")),
+    retain_bytes=int(float(os.getenv("FEED_JOURNAL_RETAIN_MB", "10240")) * 1024 * 1024)
+) if os.getenv("RECORD_FEED", "1") != "0" else None
+
+# Strikes on each side of ATM kept subscribed, and preloaded before the open
+ATM_WIDTH = int(os.getenv("ATM_WIDTH", "5"))
+
+def feed_client_call(method: str, symbols: List[str]):
+    """Apply a subscription change to the market data client, if there is one"""
+    ws_client = getattr(app.state, 'ws_client', None)
+    if ws_client:
+        getattr(ws_client, method)(symbols)
+
+# Broker subscriptions held by client interest; index symbols always stay on
+subscription_manager = SubscriptionManager(
+    subscribe=lambda symbols: feed_client_call("subscribe", symbols),
+    unsubscribe=lambda symbols: feed_client_call("unsubscribe", symbols),
+    grace=float(os.getenv("SUBSCRIPTION_GRACE", "120")),
+    pinned=INDEX_SYMBOLS.values()
+)
+
+def preload_legs(index: str, symbols: List[str]):
+    """Warm the history cache for legs that just rolled into the ATM window"""
+    for symbol in symbols:
+        chain_executor.submit(get_cached_candles, symbol, priority=BACKGROUND)
+
+# Five-level books of legs a client asked depth for, held like symbol subscriptions
+depth_books = DepthBooks()
+
+def drop_depth(symbols: List[str]):
+    feed_client_call("unsubscribe_depth", symbols)
+    depth_books.discard(symbols)
+    for symbol in symbols:
+        for room in depth_rooms.pop(symbol, []):
+            depth_last_emit.pop(room, None)
+
+depth_subscriptions = SubscriptionManager(
+    subscribe=lambda symbols: feed_client_call("subscribe_depth", symbols),
+    unsubscribe=drop_depth,
+    max_symbols=int(os.getenv("DEPTH_MAX_SYMBOLS", "200")),
+    grace=float(os.getenv("SUBSCRIPTION_GRACE", "120"))
+)
+
+# Straddle depth rooms by leg, each pushed at most every DEPTH_EMIT_INTERVAL seconds
+DEPTH_EMIT_INTERVAL = float(os.getenv("DEPTH_EMIT_INTERVAL", "0.25"))
+depth_rooms: Dict[str, List[str]] = {}
+depth_last_emit: Dict[str, float] = {}
+
+# Legs of ATM +/- ATM_WIDTH strikes, following each index's live spot
+atm_tracker = AtmTracker(master_index, subscription_manager, INDEX_SYMBOLS, width=ATM_WIDTH, on_change=preload_legs)
+
+# Live straddles with server-side indicators, keyed by Socket.IO room, with the sids in each room
+live_straddles: Dict[str, LiveStraddle] = {}
+live_straddle_members: Dict[str, Set[str]] = {}
+# Symbol -> live straddles on it; replaced, never mutated, as the ingest thread reads it
+live_straddles_by_symbol: Dict[str, Tuple[LiveStraddle, ...]] = {}
+
+def add_live_straddle(live: LiveStraddle) -> LiveStraddle:
+    """Register a seeded live straddle, or return the one already in its room"""
+    global live_straddles_by_symbol
+    if live.room in live_straddles:
+        return live_straddles[live.room]
+    live_straddles[live.room] = live
+    by_symbol = dict(live_straddles_by_symbol)
+    for symbol in live.symbols:
+        by_symbol[symbol] = (*by_symbol.get(symbol, ()), live)
+    live_straddles_by_symbol = by_symbol
+    return live
+
+def leave_live_straddle(sid: str, room: str):
+    """Remove a sid from a live straddle room, dropping the straddle with its last member"""
+    global live_straddles_by_symbol
+    members = live_straddle_members.get(room, set())
+    members.discard(sid)
+    if members:
+        return
+    live_straddle_members.pop(room, None)
+    live = live_straddles.pop(room, None)
+    if live is None:
+        return
+    by_symbol = dict(live_straddles_by_symbol)
+    for symbol in live.symbols:
+        remaining = tuple(other for other in by_symbol.get(symbol, ()) if other is not live)
+        if remaining:
+            by_symbol[symbol] = remaining
+        else:
+            by_symbol.pop(symbol, None)
+    live_straddles_by_symbol = by_symbol
+
 class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
@@ -84,17 +228,19 @@ class ConnectionManager:
         self.active_connections.remove(websocket)
         logger.info(f"Client disconnected. Total connections: {len(self.active_connections)}")
 
-    def broadcast_sync(self, message: dict):
-        """Add message to queue for broadcasting"""
+    def broadcast_sync(self, message: Union[dict, bytes]):
+        """Add message (a dict, or JSON already encoded) to queue for broadcasting"""
         self.message_queue.put(message)
 
-    async def broadcast(self, message: dict):
+    async def broadcast(self, message: Union[dict, bytes]):
         """Asynchronous broadcast to all connected clients"""
+        # Encoded once here rather than once per connection
+        text = message.decode() if isinstance(message, bytes) else json.dumps(message)
         async with self._lock:
             disconnected = []
             for connection in self.active_connections:
                 try:
-                    await connection.send_json(message)
+                    await connection.send_text(text)
                 except Exception as e:
                     logger.error(f"Error broadcasting to client: {e}")
                     disconnected.append(connection)
@@ -108,53 +254,119 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
+def on_token_refreshed(access_token: str):
+    """Hot-swap a refreshed token into the live sockets"""
+    ws_client = getattr(app.state, 'ws_client', None)
+    if ws_client:
+        ws_client.update_token(access_token)
+
+def on_token_expired():
+    """Refresh the token in the background when the feed reports expiry, unless a refresh is running"""
+    if token_refresh_running():
+        logger.info("Token expired during a refresh, not starting another")
+        return
+    threading.Thread(target=refresh_access_token, daemon=True).start()
+
+def on_market_update(tick: Tick):
+    """Fold a tick into every live straddle on that symbol and push bar + indicators"""
+    loop = getattr(app.state, 'loop', None)
+    if not loop:
+        return
+    symbol = tick.symbol
+    try:
+        atm_tracker.on_tick(symbol, tick.ltp)
+    except Exception as e:
+        logger.error(f"Error tracking ATM for {symbol}: {str(e)}")
+    chart_sessions.on_tick(symbol, tick.ltp, tick.volume, tick.received_ms // 1000)
+    for live in live_straddles_by_symbol.get(symbol, ()):
+        payload = live.on_tick(symbol, tick.ltp, tick.volume, tick.received_ms // 1000)
+        if payload:
+            asyncio.run_coroutine_threadsafe(sio.emit('straddle_bar', payload, room=live.room), loop)
+
+add_token_listener(on_token_refreshed)
+
+def start_feed_client(access_token: str) -> FyersWebsocketClient:
+    """Create and connect the market data client, feeding the ingest pipeline"""
+    app.state.ws_client = FyersWebsocketClient(
+        access_token=access_token,
+        redis_client=None,
+        socketio=sio,
+        loop=app.state.loop,
+        pipeline=ingest
+    )
+    app.state.ws_client.set_callbacks(token_expired_cb=on_token_expired)
+    # Queued now, subscribed once connected
+    app.state.ws_client.subscribe(subscription_manager.symbols())
+    app.state.ws_client.subscribe_depth(depth_subscriptions.symbols())
+
+    # Connect WebSocket client
+    connected = app.state.ws_client.connect()
+    if not connected:
+        logger.error("Failed to connect WebSocket client")
+    else:
+        logger.info("WebSocket client connected successfully")
+    return app.state.ws_client
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    app.state.loop = asyncio.get_running_loop()
+    try:
+        await asyncio.to_thread(master_index.refresh_if_changed)
+    except Exception as e:
+        logger.error(f"Error loading master index: {str(e)}")
+    backfill_manager.resume_interrupted()
     try:
         logger.info("Validating Fyers access token")
-        access_token = await ensure_valid_token()
+        access_token = await asyncio.to_thread(ensure_valid_token)
         if access_token:
             logger.info("Token validation successful, initializing WebSocket")
-            # Initialize WebSocket client
-            app.state.ws_client = FyersWebsocketClient(
-                access_token=access_token,
-                redis_client=None,
-                socketio=sio
-            )
-            
-            # Connect WebSocket client
-            connected = app.state.ws_client.connect()
-            if not connected:
-                logger.error("Failed to connect WebSocket client")
-            else:
-                logger.info("WebSocket client connected successfully")
+            start_feed_client(access_token)
+
+            # Refresh the token ahead of its expiry
+            schedule_token_refresh()
         else:
             logger.error("Failed to get valid access token")
     except Exception as e:
         logger.error(f"Error during startup: {str(e)}")
         app.state.ws_client = None
+    subscription_manager.start()
+    depth_subscriptions.start()
+    tick_archive.start()
+    compute.start()
+    if os.getenv("WARMUP", "1") != "0":
+        warmup_scheduler.start()
     
     yield
     
     # Shutdown
+    warmup_scheduler.stop()
+    subscription_manager.stop()
+    depth_subscriptions.stop()
+    cancel_token_refresh()
     if hasattr(app.state, 'ws_client') and app.state.ws_client:
         try:
-            app.state.ws_client.fyers.close()
+            app.state.ws_client.fyers.close_connection()
             logger.info("WebSocket client closed successfully")
         except Exception as e:
             logger.error(f"Error closing WebSocket client: {str(e)}")
     
-    if fyers_socket and fyers_socket.is_connected():
-        fyers_socket.close()
+    tick_archive.stop()
+    compute.stop()
+    if ingest.recorder:
+        ingest.recorder.close()
     # Signal broadcast thread to stop
     manager.message_queue.put(None)
     manager.broadcast_thread.join(timeout=5)
 
 # Initialize Socket.IO
-sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+# PacketJSON lets `market_update` reuse each tick's cached encoding
+sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*', json=PacketJSON)
 socket_app = socketio.ASGIApp(sio)
 
+# Chart sessions: history then sequenced bar updates, per socket
+chart_sessions = ChartSessions(sio.emit, max_queue=int(os.getenv("CHART_MAX_QUEUE", "1000")))
+
 # Initialize FastAPI
 app = FastAPI(title="Trading Data API", lifespan=lifespan)
 
@@ -165,8 +377,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
+# Compress responses with brotli or gzip, negotiated per request
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
 # Mount Socket.IO app
 app.mount("/socket.io", socket_app)
 
@@ -178,165 +394,249 @@ async def connect(sid, environ):
 @sio.event
 async def disconnect(sid):
     logger.info(f"Client disconnected: {sid}")
+    chart_sessions.close_all(sid)
+    for room in [room for room, members in live_straddle_members.items() if sid in members]:
+        leave_live_straddle(sid, room)
+    subscription_manager.release(sid)
+    depth_subscriptions.release(sid)
 
-# Global WebSocket client
-fyers_socket = None
-market_data_cache = {}
+def indicator_config(data: Dict) -> IndicatorConfig:
+    defaults = IndicatorConfig()
+    return IndicatorConfig(
+        sma_period=int(data.get('sma', defaults.sma_period)),
+        ema_period=int(data.get('ema', defaults.ema_period)),
+        bb_period=int(data.get('bb_period', defaults.bb_period)),
+        bb_std=float(data.get('bb_std', defaults.bb_std))
+    )
+
+def seed_live_straddle(live: LiveStraddle, days_back: int) -> Dict[str, Any]:
+    ce_df, pe_df = chain_executor.map(
+        lambda symbol: get_cached_candles(symbol, days_back, live.resolution), live.symbols
+    )
+    return live.seed(ce_df, pe_df)
+
+@sio.on('subscribe_straddle')
+async def subscribe_straddle(sid, data):
+    """
+    Join the live bar feed of a straddle.
 
-def on_message(message):
-    """Callback for WebSocket messages"""
+    Replies with the indicator series over history; afterwards the room
+    receives `straddle_bar` events carrying the forming bar and its
+    indicator values, updated incrementally on every leg tick.
+    """
     try:
-        # Parse incoming message
-        if isinstance(message, str):
-            try:
-                data = json.loads(message)
-            except json.JSONDecodeError:
-                logger.error(f"Failed to parse message as JSON: {message[:200]}")
-                return
+        index, strike = data['index'], str(data['strike'])
+        resolution = str(data.get('resolution', '1'))
+        expiry, ce_symbol, pe_symbol = await asyncio.to_thread(
+            resolve_straddle_legs, index, strike, data.get('expiry')
+        )
+        live = LiveStraddle(ce_symbol, pe_symbol, resolution, indicator_config(data))
+        if live.room in live_straddles:
+            live = live_straddles[live.room]
         else:
-            data = message
-
-        if isinstance(data, dict):
-            symbol = data.get('symbol', '')
-            if symbol:
-                # Create market data dict directly from Fyers data
-                market_update = {
-                    'symbol': symbol,
-                    'timestamp': data.get('exch_feed_time', int(time.time())),
-                    'ltp': float(data.get('ltp', 0)),
-                    'open': float(data.get('open_price', 0)),
-                    'high': float(data.get('high_price', 0)),
-                    'low': float(data.get('low_price', 0)),
-                    'prev_close': float(data.get('prev_close_price', 0)),
-                    'change': float(data.get('ch', 0)),
-                    'change_percent': float(data.get('chp', 0)),
-                    'volume': int(data.get('vol_traded_today', 0))
-                }
-
-                # Update cache and broadcast
-                update_market_data(symbol, market_update)
-                manager.broadcast_sync(market_update)
-                
-                # Log index updates
-                if symbol in INDEX_SYMBOLS.values():
-                    logger.info(f"Index update received: {symbol} - {market_update['ltp']}")
-    except Exception as e:
-        logger.error(f"Error processing WebSocket message: {str(e)}")
-        logger.error(f"Message causing error: {message}")
+            await asyncio.to_thread(seed_live_straddle, live, int(data.get('days_back', 10)))
+            live = add_live_straddle(live)
 
-def on_connect():
-    """Callback for WebSocket connection"""
-    logger.info("Connected to Fyers WebSocket")
-
-def on_error(error):
-    """Callback for WebSocket errors"""
-    logger.error(f"Fyers WebSocket error: {error}")
+        members = live_straddle_members.setdefault(live.room, set())
+        if sid not in members:
+            try:
+                subscription_manager.acquire(sid, live.symbols)
+            except SubscriptionLimitError:
+                leave_live_straddle(sid, live.room)
+                raise
+            members.add(sid)
+            await sio.enter_room(sid, live.room)
+        return {
+            "status": "success",
+            "room": live.room,
+            "expiry": expiry,
+            "timestamps": live.snapshot["timestamps"],
+            "indicators": {name: to_json_grid(values) for name, values in live.snapshot["indicators"].items()}
+        }
+    except HTTPException as he:
+        return {"status": "error", "detail": he.detail}
+    except SubscriptionLimitError as e:
+        return {"status": "error", "detail": str(e)}
+    except Exception as e:
+        logger.error(f"Error subscribing to live straddle: {str(e)}")
+        return {"status": "error", "detail": str(e)}
 
-def on_close():
-    """Callback for WebSocket close"""
-    logger.info("Fyers WebSocket connection closed")
+@sio.on('open_chart')
+async def open_chart(sid, data):
+    """
+    Open a chart session for a straddle.
 
-async def initialize_websocket():
-    """Initialize Fyers WebSocket connection"""
+    `chart` is an id chosen by the client and echoed in every message. The
+    socket first receives `chart_history` with CE, PE and straddle bars up
+    to `seq`, then `chart_update` events with the forming bars of every
+    leg tick numbered seq + 1, seq + 2, ... Opening the same chart id again
+    replaces the session.
+    """
     try:
-        # Ensure valid token
-        access_token = ensure_valid_token()
-        if not access_token:
-            logger.error("No valid access token available")
-            return
-
-        global fyers_socket
-        
-        # Initialize WebSocket with proper access token format
-        auth_token = f"{CLIENT_ID}:{access_token}"
-        
-        # Initialize WebSocket
-        fyers_socket = data_ws.FyersDataSocket(
-            access_token=auth_token,
-            log_path=str(DATA_DIR),
-            litemode=False,
-            write_to_file=False,
-            reconnect=True,
-            on_connect=on_connect,
-            on_close=on_close,
-            on_error=on_error,
-            on_message=on_message
+        chart = str(data['chart'])
+        index, strike = data['index'], str(data['strike'])
+        resolution = str(data.get('resolution', '1'))
+        days_back = int(data.get('days_back', 10))
+        expiry, ce_symbol, pe_symbol = await asyncio.to_thread(
+            resolve_straddle_legs, index, strike, data.get('expiry')
         )
-        
-        # Subscribe to indices
-        symbols = list(INDEX_SYMBOLS.values())
-        logger.info(f"Subscribing to symbols: {symbols}")
-        
-        # Connect first
-        fyers_socket.connect()
-        await asyncio.sleep(2)  # Wait for connection to establish
-        
-        if fyers_socket.is_connected():
-            # Then subscribe
-            fyers_socket.subscribe(symbols=symbols, data_type="SymbolUpdate")
-            logger.info("Successfully subscribed to symbols")
-            
-            # Add debug log to verify subscription
-            logger.info(f"Current subscriptions: {getattr(fyers_socket, 'subscribed_symbols', [])}")
-        else:
-            logger.error("Failed to establish WebSocket connection")
-        
+        close_chart_session(sid, chart)
+        # Subscribed before the history loads so ticks from then on are folded in
+        subscription_manager.acquire(sid, [ce_symbol, pe_symbol])
+        try:
+            feed = await chart_sessions.prepare(ce_symbol, pe_symbol, resolution, days_back, lambda: tuple(
+                chain_executor.map(lambda symbol: get_cached_candles(symbol, days_back, resolution),
+                                   (ce_symbol, pe_symbol))
+            ))
+        except Exception:
+            subscription_manager.release(sid, [ce_symbol, pe_symbol])
+            raise
+        session = chart_sessions.open(sid, chart, feed, index=index, expiry=expiry, resolution=resolution,
+                                      ce_symbol=ce_symbol, pe_symbol=pe_symbol)
+        return {"status": "success", "expiry": expiry, "ce_symbol": ce_symbol, "pe_symbol": pe_symbol, **session}
+    except HTTPException as he:
+        return {"status": "error", "detail": he.detail}
+    except (SubscriptionLimitError, ValueError) as e:
+        return {"status": "error", "detail": str(e)}
     except Exception as e:
-        logger.error(f"Error initializing WebSocket: {e}")
-        logger.exception("Full traceback:")
+        logger.error(f"Error opening chart session: {str(e)}")
+        return {"status": "error", "detail": str(e)}
+
+def close_chart_session(sid: str, chart: str):
+    feed = chart_sessions.close(sid, chart)
+    if feed:
+        subscription_manager.release(sid, feed.symbols)
 
-def update_market_data(symbol: str, data: Dict):
-    """Update market data in memory and optionally save to parquet"""
+@sio.on('close_chart')
+async def close_chart(sid, data):
+    close_chart_session(sid, str(data.get('chart', '')))
+    return {"status": "success"}
+
+@sio.on('unsubscribe_straddle')
+async def unsubscribe_straddle(sid, data):
+    room = data.get('room', '')
+    live = live_straddles.get(room)
+    if live and sid in live_straddle_members.get(room, ()):
+        subscription_manager.release(sid, live.symbols)
+        leave_live_straddle(sid, room)
+    await sio.leave_room(sid, room)
+    return {"status": "success"}
+
+def depth_room(ce_symbol: str, pe_symbol: str) -> str:
+    return f"depth:{ce_symbol}|{pe_symbol}"
+
+@sio.on('subscribe_depth')
+async def subscribe_depth(sid, data):
+    """
+    Join the market depth feed of a straddle.
+
+    The room receives `straddle_depth` events with the combined bid/ask,
+    mid and spread of both legs and each leg's five-level book, at most
+    every DEPTH_EMIT_INTERVAL seconds.
+    """
     try:
-        market_data_cache[symbol] = {
-            "data": data,
-            "timestamp": datetime.fromtimestamp(data.get('timestamp', time.time()), pytz.timezone('Asia/Kolkata'))
-        }
-        
-        # Save to parquet every 5 minutes
-        cache_file = CACHE_DIR / f"{symbol.replace(':', '_')}.parquet"
-        current_time = datetime.now()
-        
-        if not cache_file.exists() or (current_time - datetime.fromtimestamp(cache_file.stat().st_mtime)).total_seconds() > 300:  # 5 minutes
-            df = pd.DataFrame([data])
-            df['timestamp'] = pd.Timestamp.fromtimestamp(data.get('timestamp', time.time()), tz='Asia/Kolkata')
-            if cache_file.exists():
-                existing_df = pd.read_parquet(cache_file)
-                df = pd.concat([existing_df, df]).tail(1000)  # Keep last 1000 records
-            df.to_parquet(cache_file, index=False)
-            
+        expiry, ce_symbol, pe_symbol = await asyncio.to_thread(
+            resolve_straddle_legs, data['index'], str(data['strike']), data.get('expiry')
+        )
+        room = depth_room(ce_symbol, pe_symbol)
+        if room not in sio.rooms(sid):
+            depth_subscriptions.acquire(sid, [ce_symbol, pe_symbol])
+            for symbol in (ce_symbol, pe_symbol):
+                rooms = depth_rooms.setdefault(symbol, [])
+                if room not in rooms:
+                    depth_rooms[symbol] = [*rooms, room]
+            await sio.enter_room(sid, room)
+        return {"status": "success", "room": room, "expiry": expiry,
+                "straddle": depth_books.straddle(ce_symbol, pe_symbol)}
+    except HTTPException as he:
+        return {"status": "error", "detail": he.detail}
+    except SubscriptionLimitError as e:
+        return {"status": "error", "detail": str(e)}
     except Exception as e:
-        logger.error(f"Error updating market data: {str(e)}")
-        logger.error(f"Data causing error: {data}")
+        logger.error(f"Error subscribing to straddle depth: {str(e)}")
+        return {"status": "error", "detail": str(e)}
+
+@sio.on('unsubscribe_depth')
+async def unsubscribe_depth(sid, data):
+    room = data.get('room', '')
+    if not room.startswith('depth:'):
+        return {"status": "error", "detail": f"Not a depth room: {room}"}
+    if room in sio.rooms(sid):
+        depth_subscriptions.release(sid, room.split(':', 1)[1].split('|'))
+    await sio.leave_room(sid, room)
+    return {"status": "success"}
+
+def on_depth_update(data: Dict):
+    """Fold a depth message into its book and push the straddles it belongs to"""
+    book = depth_books.apply(data)
+    if book is None:
+        return
+    rooms = depth_rooms.get(book.symbol)
+    loop = getattr(app.state, 'loop', None)
+    if not rooms or not loop:
+        return
+    now = time.monotonic()
+    for room in rooms:
+        if now - depth_last_emit.get(room, 0) < DEPTH_EMIT_INTERVAL:
+            continue
+        ce_symbol, pe_symbol = room.split(':', 1)[1].split('|')
+        straddle = depth_books.straddle(ce_symbol, pe_symbol)
+        if straddle is None:
+            continue
+        depth_last_emit[room] = now
+        payload = {"room": room, **straddle,
+                   "ce": depth_books.get(ce_symbol).snapshot(), "pe": depth_books.get(pe_symbol).snapshot()}
+        asyncio.run_coroutine_threadsafe(sio.emit('straddle_depth', payload, room=room), loop)
+
+market_data_cache = {}
+
+def cache_tick(tick: Tick):
+    """Latest tick per symbol for price lookups"""
+    market_data_cache[tick.symbol] = {"data": tick.ws_update(), "timestamp": int(tick.timestamp)}
+
+def emit_market_update(tick: Tick):
+    """Socket.IO `market_update` to every client, scheduled on the server loop"""
+    loop = getattr(app.state, 'loop', None)
+    if loop and loop.is_running():
+        asyncio.run_coroutine_threadsafe(sio.emit('market_update', RawJSON(tick.encoded('market_update'))), loop)
+
+# Complete tick history: session segments, compacted per day and underlying after the close
+tick_archive = TickArchive(DATA_DIR / "ticks", aliases={symbol: index for index, symbol in INDEX_SYMBOLS.items()})
+
+# Whitelisted aggregate queries over the local candles and ticks
+analytics = Analytics(candle_store, tick_archive, INDEX_SYMBOLS)
+
+# Every feed message goes through here once: recorded, normalized, then fanned out to the sinks
+ingest = IngestPipeline(recorder=feed_recorder, on_depth=on_depth_update)
+tick_ring = TickRing(int(os.getenv("TICK_RING_SIZE", "512")))
+ingest.add_sink("cache", cache_tick)
+ingest.add_sink("ring", tick_ring)
+ingest.add_sink("archive", tick_archive)
+if os.getenv("REDIS_TICKS", "0") == "1":
+    from config import redis_cli
+    ingest.add_sink("redis", RedisSink(redis_cli))
+ingest.add_sink("ws", lambda tick: manager.broadcast_sync(tick.encoded("ws")))
+ingest.add_sink("socketio", emit_market_update)
+ingest.add_sink("bars", on_market_update)
+on_message = ingest.on_message
 
 def get_market_data(symbol: str) -> Optional[float]:
     """Get latest market data for a symbol"""
     if symbol in market_data_cache:
         return market_data_cache[symbol]["data"].get("ltp")
     
-    # Try to get from parquet if exists
-    cache_file = CACHE_DIR / f"{symbol.replace(':', '_')}.parquet"
-    if cache_file.exists():
-        df = pd.read_parquet(cache_file)
-        if not df.empty:
-            return df.iloc[-1].get("ltp")
-    
-    return None
+    # Last archived tick, e.g. right after a restart
+    try:
+        tick = tick_archive.latest(symbol)
+    except Exception as e:
+        logger.error(f"Error reading archived ticks for {symbol}: {str(e)}")
+        return None
+    return tick["ltp"] if tick else None
 
 def get_current_index_price(index: str) -> float:
     """Get current index price using Fyers API"""
     try:
-        # Read access token
-        token_path = DATA_DIR / "access_token.txt"
-        if not token_path.exists():
-            logger.error("Access token file not found")
-            raise HTTPException(status_code=404, detail="Access token file not found")
-
-        with open(token_path, 'r') as f:
-            access_token = f.read().strip()
-
-        # Initialize Fyers model
-        fyers = fyersModel.FyersModel(client_id=os.getenv("FYERS_CLIENT_ID"), is_async=False, token=access_token)
+        fyers = get_fyers_model()
 
         # Get index symbol
         index_symbol = INDEX_SYMBOLS.get(index)
@@ -346,7 +646,7 @@ def get_current_index_price(index: str) -> float:
 
         # Get current market price
         symbol_data = {"symbols": index_symbol}
-        quote_response = fyers.quotes(data=symbol_data)
+        quote_response = upstream_scheduler.call("quotes", fyers.quotes, data=symbol_data, key=("quotes", index_symbol))
 
         if quote_response.get('s') == 'ok':
             lp = quote_response.get('d', [{}])[0].get('v', {}).get('lp', 0)
@@ -361,22 +661,22 @@ def get_current_index_price(index: str) -> float:
         return 0
 
 @app.get("/index-strikes/{index}")
-async def get_index_strikes(index: str):
+async def get_index_strikes(request: Request, index: str, expiry: Optional[str] = None, width: int = 5):
+    """
+    ATM strike ladder for an index.
+
+    - **expiry**: Expiry date as YYYY-MM-DD (optional, defaults to the nearest expiry)
+    - **width**: Number of strikes on each side of ATM (optional, default is 5)
+    """
     try:
-        # Read the master data file
-        master_df = pd.read_csv(DATA_DIR / "master_file.csv")
-        
-        # Filter options based on exSymbol
-        index_options = master_df[
-            (master_df['exSymbol'] == index) & 
-            (master_df['exSymName'].str.contains('CE|PE'))  # Only get options
-        ]
-        
-        if index_options.empty:
+        if index not in INDEX_SYMBOLS:
+            raise HTTPException(status_code=400, detail=f"Invalid index: {index}")
+
+        expiries = master_index.expiries(index)
+        if not expiries:
             raise HTTPException(status_code=404, detail=f"No options found for index {index}")
-        
-        # Extract strike prices and convert to numeric
-        strikes = pd.to_numeric(index_options['strikePrice'].unique(), errors='coerce')
+        if expiry and expiry not in expiries:
+            raise HTTPException(status_code=404, detail=f"No options found for {index} expiring {expiry}")
         
         # Get current index price from Fyers API
         current_price = get_current_index_price(index)
@@ -384,129 +684,125 @@ async def get_index_strikes(index: str):
         if current_price == 0:
             raise HTTPException(status_code=500, detail="Failed to get current index price")
         
-        # Find the nearest strike price
-        nearest_strike = strikes[abs(strikes - current_price).argmin()]
-        
-        # Get strike index and select surrounding strikes
-        strike_idx = list(strikes).index(nearest_strike)
-        
-        # Get 5 strikes below and 5 strikes above
-        start_idx = max(0, strike_idx - 5)
-        end_idx = min(len(strikes), strike_idx + 6)
-        selected_strikes = strikes[start_idx:end_idx].tolist()
+        expiry, selected_strikes, nearest_strike = master_index.strike_window(index, current_price, expiry, width)
         
-        return {
-            "strikes": selected_strikes,
+        etag = make_etag(master_index.version, index, expiry, width, current_price)
+        return conditional_response(request, etag, {
+            "strikes": selected_strikes.tolist(),
             "default_strike": nearest_strike,
             "current_price": current_price,
-            "index_symbol": INDEX_SYMBOLS.get(index)
-        }
+            "index_symbol": INDEX_SYMBOLS.get(index),
+            "expiry": expiry,
+            "expiries": expiries
+        })
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting strike prices: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-def get_historical_data(symbol, days_back=10):
+def get_history_window(days_back: int = 10):
+    """Date range (from, to) requested from Fyers for a lookback in days"""
+    today = datetime.today()
+    range_from = (today - timedelta(days=days_back)).strftime('%Y-%m-%d')
+    range_to = (today + timedelta(days=1)).strftime('%Y-%m-%d')
+    return range_from, range_to
+
+def fetch_candles(symbol: str, range_from: str, range_to: str, resolution: str = "1",
+                  priority: int = INTERACTIVE) -> pd.DataFrame:
+    """Fetch raw candles from Fyers with epoch-second timestamps"""
+    fyers = get_fyers_model()
+    data = {
+        "symbol": symbol,
+        "resolution": resolution,
+        "date_format": "1",
+        "range_from": range_from,
+        "range_to": range_to,
+        "cont_flag": "1"
+    }
+
+    response = upstream_scheduler.call(
+        "history", fyers.history, data=data,
+        key=("history", symbol, resolution, range_from, range_to), priority=priority
+    )
+    if is_throttled(response):
+        raise HTTPException(status_code=429, detail="Fyers rate limit reached, retry shortly")
+    if response.get("s") not in ("ok", "no_data"):
+        raise HTTPException(status_code=502, detail=f"Fyers history error: {response.get('message', response)}")
+    return pd.DataFrame(response.get("candles", []), 
+                        columns=["timestamp", "open", "high", "low", "close", "volume"])
+
+def fetch_range(symbol: str, range_from: str, range_to: str, resolution: str = "1",
+                priority: int = INTERACTIVE) -> pd.DataFrame:
+    """Fetch candles for any range, split into broker-sized chunks fetched in parallel"""
+    chunks = chunk_ranges(date.fromisoformat(range_from), date.fromisoformat(range_to), resolution)
+    if len(chunks) == 1:
+        return fetch_candles(symbol, range_from, range_to, resolution, priority)
+    frames = chunk_executor.map(
+        lambda chunk: fetch_candles(symbol, chunk[0].isoformat(), chunk[1].isoformat(), resolution, priority),
+        chunks
+    )
+    return pd.concat(frames, ignore_index=True).drop_duplicates("timestamp").sort_values("timestamp", ignore_index=True)
+
+def get_cached_candles(symbol: str, days_back: int = 10, resolution: str = "1",
+                       priority: int = INTERACTIVE) -> pd.DataFrame:
+    """Raw candles for a lookback window through the shared history cache"""
+    window = get_history_window(days_back)
+    return history_cache.get(
+        ("candles", symbol, resolution, window),
+        lambda: fetch_range(symbol, *window, resolution, priority)
+    )
+
+def load_historical_straddle(index: str, ce_symbol: str, pe_symbol: str, days_back: int,
+                             resolution: str) -> Dict[str, pd.DataFrame]:
+    """Epoch-second CE, PE and spot candles, fetched in parallel through the candle cache"""
+    symbols = {"ce_data": ce_symbol, "pe_data": pe_symbol, "spot_data": INDEX_SYMBOLS[index]}
+    frames = chain_executor.map(lambda symbol: get_cached_candles(symbol, days_back, resolution), symbols.values())
+    return dict(zip(symbols, frames))
+
+async def run_compute(fn, *args) -> Any:
+    """Run a CPU-heavy stage on the compute pool, 503 when its queue is full"""
     try:
-        token_path = DATA_DIR / "access_token.txt"
-        with open(token_path, 'r') as f:
-            access_token = f.read().strip()
+        return await compute.run(fn, *args)
+    except ComputeBusy:
+        raise HTTPException(status_code=503, detail="Analytics busy, retry shortly", headers={"Retry-After": "1"})
 
-        fyers = fyersModel.FyersModel(client_id="OGS4N9MW72", is_async=False, token=access_token)
-        
-        today = datetime.today()
-        range_from = (today - timedelta(days=days_back)).strftime('%Y-%m-%d')
-        range_to = (today + timedelta(days=1)).strftime('%Y-%m-%d')
-
-        data = {
-            "symbol": symbol,
-            "resolution": "1",
-            "date_format": "1",
-            "range_from": range_from,
-            "range_to": range_to,
-            "cont_flag": "1"
-        }
+def resolve_straddle_legs(index: str, strikePrice: str, expiry: Optional[str] = None):
+    """(expiry, CE symbol, PE symbol) for a strike, raising 4xx when it is not listed"""
+    if index not in INDEX_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"Invalid index: {index}")
 
-        response = fyers.history(data=data)
-        df = pd.DataFrame(response["candles"], 
-                         columns=["timestamp", "open", "high", "low", "close", "volume"])
-        
-        # Convert UTC timestamp to IST timezone and format as YYYY-MM-DD HH:mm
-        ist = pytz.timezone('Asia/Kolkata')
-        df["date"] = pd.to_datetime(df["timestamp"], unit="s", utc=True).dt.tz_convert(ist).dt.strftime('%Y-%m-%d %H:%M')
-        df = df[["date", "open", "high", "low", "close", "volume"]]
-        
-        output_path = DATA_DIR / f"{symbol.replace(':', '_')}.csv"
-        df.to_csv(output_path, index=False)
-        logger.info(f"Historical data saved to {output_path}")
-        
-        return df
-        
-    except Exception as e:
-        logger.error(f"Error in get_historical_data: {str(e)}")
-        raise
+    try:
+        legs = master_index.legs(index, float(strikePrice), expiry)
+    except FileNotFoundError:
+        logger.error("Master file not found")
+        raise HTTPException(status_code=404, detail="Master file not found")
+    
+    if legs is None:
+        logger.error(f"No data found for index: {index} with strike price: {strikePrice}")
+        raise HTTPException(status_code=404, detail="No data found for given criteria")
+
+    expiry, ce_symbol, pe_symbol = legs
+    logger.info(f"CE Data: {ce_symbol}")
+    logger.info(f"PE Data: {pe_symbol}")
+    return expiry, ce_symbol, pe_symbol
 
-def get_historical_straddle(index: str, strikePrice: str, days_back: int = 10) -> Dict[str, Any]:
-    """Get historical straddle data for a given index and strike price"""
+def get_historical_straddle(index: str, strikePrice: str, days_back: int = 10, resolution: str = "1",
+                            expiry: Optional[str] = None) -> Dict[str, Any]:
+    """Get historical straddle candles (epoch seconds) for a given index and strike price"""
     try:
-        # Load master data
-        csv_path = DATA_DIR / "master_file.csv"
-        if not csv_path.exists():
-            logger.error("Master file not found")
-            raise HTTPException(status_code=404, detail="Master file not found")
-        
-        df = pd.read_csv(csv_path)
-        
-        # Filter for the given index and strike price
-        filtered_df = df[(df['exSymbol'].str.contains(index)) & 
-                        (df['strikePrice'] == float(strikePrice))]
-        
-        if filtered_df.empty:
-            logger.error(f"No data found for index: {index} with strike price: {strikePrice}")
-            raise HTTPException(status_code=404, detail="No data found for given criteria")
-        
-        # Sort by expiry date and get the nearest expiry
-        filtered_df = filtered_df.sort_values('expiryDate')
-        nearest_expiry = filtered_df['expiryDate'].iloc[0] if not filtered_df.empty else None
-        
-        if nearest_expiry is None:
-            logger.error("No expiry date found for the filtered criteria")
-            raise HTTPException(status_code=404, detail="No data found for given criteria")
-            
-        # Get CE and PE symbols
-        ce_filtered = filtered_df[filtered_df['symbol'].str.endswith('CE')]
-        pe_filtered = filtered_df[filtered_df['symbol'].str.endswith('PE')]
-        
-        if ce_filtered.empty or pe_filtered.empty:
-            logger.error("CE or PE data not found for given criteria")
-            raise HTTPException(status_code=404, detail="CE or PE data not found for given criteria")
-
-        ce_data = ce_filtered.iloc[0]
-        pe_data = pe_filtered.iloc[0]
-        logger.info(f"CE Data: {ce_data['symbol']}")
-        logger.info(f"PE Data: {pe_data['symbol']}")
+        expiry, ce_symbol, pe_symbol = resolve_straddle_legs(index, strikePrice, expiry)
         
-        # Get historical data
-        ce_hist = get_historical_data(ce_data['symbol'], days_back)
-        pe_hist = get_historical_data(pe_data['symbol'], days_back)
-        spot_hist = get_historical_data(INDEX_SYMBOLS[index], days_back)
-        
-        # Prepare CE and PE data with symbol names
-        ce_json = {
-            "symbol": ce_data['symbol'],
-            "data": ce_hist[['date', 'open', 'high', 'low', 'close', 'volume']].values.tolist()
-        }
-        pe_json = {
-            "symbol": pe_data['symbol'],
-            "data": pe_hist[['date', 'open', 'high', 'low', 'close', 'volume']].values.tolist()
-        }
+        # Each leg is cached on its own, so chain, IV and indicator requests share it
+        frames = load_historical_straddle(index, ce_symbol, pe_symbol, days_back, resolution)
         
         logger.info(f"Successfully fetched historical straddle data for index: {index}, strike price: {strikePrice}")
         
         return {
-            "ce_data": ce_json,
-            "pe_data": pe_json
+            "frames": frames,
+            "symbols": {"ce_data": ce_symbol, "pe_data": pe_symbol, "spot_data": INDEX_SYMBOLS[index]}
         }
         
     except HTTPException as he:
@@ -525,21 +821,35 @@ class HistoricalStraddleResponse(BaseModel):
     pe_data: HistoricalData
 
 @app.get("/historical_straddle/{index}/{strikePrice}", response_model=HistoricalStraddleResponse)
-def historical_straddle_endpoint(index: str, strikePrice: str):
+async def historical_straddle_endpoint(request: Request, index: str, strikePrice: str, resolution: str = "1",
+                                       expiry: Optional[str] = None, days_back: int = 10, time_format: str = "ist"):
     """
     Endpoint to retrieve historical straddle data (CE and PE) for a given index and strike price.
 
     - **index**: The market index (e.g., NIFTY, BANKNIFTY)
     - **strikePrice**: The strike price as a string (e.g., "23400")
+    - **resolution**: Candle resolution in Fyers format (optional, default is "1")
+    - **expiry**: Expiry date as YYYY-MM-DD (optional, defaults to the nearest expiry listing the strike)
     - **days_back**: Number of days back for historical data (optional, default is 10)
+    - **time_format**: "ist" for 'YYYY-MM-DD HH:MM' dates or "epoch" for epoch seconds (optional, default is "ist")
     """
     try:
         logger.info(f"Received request for historical straddle data: Index={index}, Strike Price={strikePrice}")
-        straddle_data = get_historical_straddle(index, strikePrice)
-        return HistoricalStraddleResponse(
-            ce_data=HistoricalData(**straddle_data["ce_data"]),
-            pe_data=HistoricalData(**straddle_data["pe_data"])
+        straddle = await asyncio.to_thread(get_historical_straddle, index, strikePrice, days_back, resolution, expiry)
+        
+        # The body only changes when a leg gets a new or updated last candle
+        ce_df, pe_df = straddle["frames"]["ce_data"], straddle["frames"]["pe_data"]
+        etag = make_etag(
+            straddle["symbols"]["ce_data"], straddle["symbols"]["pe_data"], resolution, time_format,
+            get_history_window(days_back), len(ce_df), len(pe_df),
+            ce_df.tail(1).values.tolist(), pe_df.tail(1).values.tolist()
         )
+        # Dates are only formatted when the client does not already hold this body
+        payload = None if etag_matches(request, etag) else await run_compute(
+            straddle_payload_task, {name: pack_frame(straddle["frames"][name]) for name in ("ce_data", "pe_data")},
+            straddle["symbols"], time_format
+        )
+        return conditional_response(request, etag, lambda: HistoricalStraddleResponse(**payload))
     except HTTPException as he:
         logger.error(f"HTTPException in endpoint: {he.detail}")
         raise he
@@ -547,13 +857,372 @@ def historical_straddle_endpoint(index: str, strikePrice: str):
         logger.error(f"Unhandled exception in endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+@app.get("/historical_straddle/{index}/{strikePrice}/stream")
+def historical_straddle_stream_endpoint(index: str, strikePrice: str, resolution: str = "1",
+                                        expiry: Optional[str] = None, days_back: int = 10,
+                                        time_format: str = "ist"):
+    """
+    Stream historical straddle data as NDJSON, a few days per line.
+
+    The first line is a `meta` record with the leg symbols, followed by
+    `candles` records carrying `ce_data`/`pe_data` rows in the same format
+    as `/historical_straddle`, and a final `end` record. Closed days are read
+    from the local candle store when available, otherwise from Fyers.
+    """
+    logger.info(f"Received request for streamed straddle data: Index={index}, Strike Price={strikePrice}")
+    expiry, ce_symbol, pe_symbol = resolve_straddle_legs(index, strikePrice, expiry)
+    range_from, range_to = get_history_window(days_back)
+    legs = {"ce_data": ce_symbol, "pe_data": pe_symbol}
+
+    def generate():
+        yield json.dumps({"type": "meta", "expiry": expiry, "resolution": resolution,
+                          "ce_symbol": ce_symbol, "pe_symbol": pe_symbol}) + "\n"
+        try:
+            chunks = iter_straddle_chunks(legs, resolution, date.fromisoformat(range_from),
+                                          date.fromisoformat(range_to), candle_store, fetch_candles)
+            for chunk in chunks:
+                if all(df.empty for df in chunk.values()):
+                    continue
+                record = {name: format_candles(df, time_format).values.tolist() for name, df in chunk.items()}
+                yield json.dumps({"type": "candles", **record}) + "\n"
+            yield json.dumps({"type": "end"}) + "\n"
+        except HTTPException as he:
+            logger.error(f"HTTPException while streaming: {he.detail}")
+            yield json.dumps({"type": "error", "status": he.status_code, "detail": he.detail}) + "\n"
+        except Exception as e:
+            logger.error(f"Error while streaming straddle data: {str(e)}")
+            yield json.dumps({"type": "error", "status": 500, "detail": "Internal Server Error"}) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson",
+                             headers={"Cache-Control": cache_control()})
+
+def load_straddle_chain(index: str, expiry: Optional[str] = None, width: int = 5,
+                        strike_from: Optional[float] = None, strike_to: Optional[float] = None,
+                        days_back: int = 10, resolution: str = "1", with_iv: bool = False) -> Dict[str, Any]:
+    """Strikes, leg symbols and candles of a range of one expiry, ready for the compute pool"""
+    if index not in INDEX_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"Invalid index: {index}")
+    if (strike_from is None) != (strike_to is None):
+        raise HTTPException(status_code=400, detail="strike_from and strike_to must be given together")
+
+    expiry = expiry or master_index.nearest_expiry(index)
+    ladder = master_index.ladder(index, expiry) if expiry else np.empty(0)
+    if not len(ladder):
+        raise HTTPException(status_code=404, detail=f"No options found for {index} expiring {expiry}")
+
+    if strike_from is not None and strike_to is not None:
+        strikes = ladder[np.searchsorted(ladder, strike_from):np.searchsorted(ladder, strike_to, side='right')]
+    else:
+        current_price = get_current_index_price(index)
+        if current_price == 0:
+            raise HTTPException(status_code=500, detail="Failed to get current index price")
+        _, strikes, _ = master_index.strike_window(index, current_price, expiry, width)
+
+    if not len(strikes):
+        raise HTTPException(status_code=404, detail="No strikes in the requested range")
+    if len(strikes) > MAX_CHAIN_STRIKES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_CHAIN_STRIKES} strikes per request")
+
+    ce_symbols, pe_symbols = master_index.chain_legs(index, expiry, strikes)
+
+    # Fetch every distinct leg once, in parallel, through the cache and rate limiter
+    symbols = list(dict.fromkeys([*ce_symbols, *pe_symbols]))
+    if with_iv:
+        symbols.append(INDEX_SYMBOLS[index])
+    frames = dict(zip(symbols, chain_executor.map(
+        lambda symbol: get_cached_candles(symbol, days_back, resolution), symbols
+    )))
+    return {
+        "expiry": expiry,
+        "strikes": strikes,
+        "ce_symbols": ce_symbols,
+        "pe_symbols": pe_symbols,
+        "frames": {symbol: pack_frame(df) for symbol, df in frames.items()},
+        "expiry_ts": master_index.expiry_timestamp(index, expiry) if with_iv else None
+    }
+
+async def get_straddle_chain(index: str, expiry: Optional[str] = None, width: int = 5,
+                             strike_from: Optional[float] = None, strike_to: Optional[float] = None,
+                             days_back: int = 10, resolution: str = "1", with_iv: bool = False,
+                             rate: float = DEFAULT_RATE) -> Dict[str, Any]:
+    """Straddle series for every strike in a range of one expiry"""
+    legs = await asyncio.to_thread(load_straddle_chain, index, expiry, width, strike_from, strike_to,
+                                   days_back, resolution, with_iv)
+    chain = await run_compute(
+        straddle_chain_task, legs["frames"], legs["ce_symbols"].tolist(), legs["pe_symbols"].tolist(),
+        legs["strikes"], INDEX_SYMBOLS[index] if with_iv else None, legs["expiry_ts"], rate
+    )
+    return {
+        "index": index,
+        "expiry": legs["expiry"],
+        "resolution": resolution,
+        "strikes": legs["strikes"].tolist(),
+        "ce_symbols": legs["ce_symbols"].tolist(),
+        "pe_symbols": legs["pe_symbols"].tolist(),
+        **chain
+    }
+
+@app.get("/straddle_chain/{index}")
+async def straddle_chain_endpoint(request: Request, index: str, expiry: Optional[str] = None, width: int = 5,
+                                  strike_from: Optional[float] = None, strike_to: Optional[float] = None,
+                                  days_back: int = 10, resolution: str = "1", iv: bool = False,
+                                  rate: float = DEFAULT_RATE):
+    """
+    Endpoint to retrieve straddle series for a whole strike ladder in one request.
+
+    - **index**: The market index (e.g., NIFTY, BANKNIFTY)
+    - **expiry**: Expiry date as YYYY-MM-DD (optional, defaults to the nearest expiry)
+    - **width**: Strikes on each side of ATM when no explicit range is given (default is 5)
+    - **strike_from** / **strike_to**: Inclusive strike range (optional)
+    - **days_back**: Number of days back for historical data (optional, default is 10)
+    - **resolution**: Candle resolution in Fyers format (optional, default is "1")
+    - **iv**: Also return the spot series and a straddle implied-volatility grid (optional)
+    - **rate**: Risk-free rate used for implied volatility (optional, default is 0.065)
+
+    `straddle` holds (strike x time) grids per OHLCV field aligned to `timestamps`.
+    """
+    try:
+        logger.info(f"Received request for straddle chain: Index={index}, Expiry={expiry}")
+        chain = await get_straddle_chain(index, expiry, width, strike_from, strike_to, days_back, resolution, iv, rate)
+        tail = chain.pop("tail")
+        etag = make_etag(
+            chain["ce_symbols"], chain["pe_symbols"], resolution, get_history_window(days_back), iv, rate, tail
+        )
+        return conditional_response(request, etag, chain)
+    except HTTPException as he:
+        logger.error(f"HTTPException in endpoint: {he.detail}")
+        raise he
+    except Exception as e:
+        logger.error(f"Unhandled exception in straddle chain endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+@app.get("/straddle_iv/{index}/{strikePrice}")
+async def straddle_iv_endpoint(request: Request, index: str, strikePrice: str, expiry: Optional[str] = None,
+                               days_back: int = 10, resolution: str = "1", rate: float = DEFAULT_RATE):
+    """
+    Endpoint to retrieve implied volatility and greeks for a historical straddle.
+
+    Every bar where CE, PE and spot all have a candle is solved at once:
+    straddle IV, per-leg IVs and straddle delta, gamma, vega (per vol
+    point) and theta (per day), using the expiry from the master.
+    """
+    try:
+        expiry, ce_symbol, pe_symbol = await asyncio.to_thread(resolve_straddle_legs, index, strikePrice, expiry)
+        spot_symbol = INDEX_SYMBOLS[index]
+        ce_df, pe_df, spot_df = await asyncio.to_thread(lambda: list(chain_executor.map(
+            lambda symbol: get_cached_candles(symbol, days_back, resolution), [ce_symbol, pe_symbol, spot_symbol]
+        )))
+        analytics = await run_compute(straddle_iv_task, pack_frame(ce_df), pack_frame(pe_df), pack_frame(spot_df),
+                                      float(strikePrice), master_index.expiry_timestamp(index, expiry), rate)
+        tail = analytics.pop("tail")
+        etag = make_etag(ce_symbol, pe_symbol, resolution, get_history_window(days_back), rate, *tail)
+        return conditional_response(request, etag, {
+            "index": index,
+            "expiry": expiry,
+            "strike": float(strikePrice),
+            "ce_symbol": ce_symbol,
+            "pe_symbol": pe_symbol,
+            **analytics
+        })
+    except HTTPException as he:
+        logger.error(f"HTTPException in endpoint: {he.detail}")
+        raise he
+    except Exception as e:
+        logger.error(f"Unhandled exception in straddle IV endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+@app.get("/straddle_indicators/{index}/{strikePrice}")
+async def straddle_indicators_endpoint(request: Request, index: str, strikePrice: str, expiry: Optional[str] = None,
+                                       days_back: int = 10, resolution: str = "1", sma: int = 20, ema: int = 20,
+                                       bb_period: int = 20, bb_std: float = 2.0):
+    """
+    Endpoint to retrieve SMA, EMA, Bollinger Bands and session VWAP for a historical straddle.
+
+    Indicators are computed over the straddle bars (CE + PE) in one
+    vectorized pass; values are null until their window is filled.
+    """
+    try:
+        expiry, ce_symbol, pe_symbol = await asyncio.to_thread(resolve_straddle_legs, index, strikePrice, expiry)
+        config = IndicatorConfig(sma, ema, bb_period, bb_std)
+        ce_df, pe_df = await asyncio.to_thread(lambda: list(chain_executor.map(
+            lambda symbol: get_cached_candles(symbol, days_back, resolution), [ce_symbol, pe_symbol]
+        )))
+        series = await run_compute(straddle_indicators_task, pack_frame(ce_df), pack_frame(pe_df), config)
+        etag = make_etag(ce_symbol, pe_symbol, resolution, get_history_window(days_back), config.key(),
+                         series["timestamps"][-1:], [values[-1:] for values in series["indicators"].values()])
+        return conditional_response(request, etag, {
+            "index": index,
+            "expiry": expiry,
+            "ce_symbol": ce_symbol,
+            "pe_symbol": pe_symbol,
+            **series
+        })
+    except HTTPException as he:
+        logger.error(f"HTTPException in endpoint: {he.detail}")
+        raise he
+    except Exception as e:
+        logger.error(f"Unhandled exception in straddle indicators endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+def warmup_token(context: Dict):
+    """Make sure the token outlives today's session, so it is not swapped mid-session"""
+    now = now_ist()
+    session_left = (IST.localize(datetime.combine(now.date(), MARKET_CLOSE)) - now).total_seconds()
+    if token_expires_in() < session_left + TOKEN_REFRESH_LEAD:
+        refresh_access_token()
+        schedule_token_refresh()
+
+def warmup_master(context: Dict):
+    """Refresh the master (a no-op upstream when it has not changed), then rebuild the index"""
+    download_master_instruments()
+    master_index.refresh_if_changed()
+
+def warmup_history(context: Dict):
+    """Preload the default window of candles for ATM +/- ATM_WIDTH of every underlying"""
+    symbols, spots = [], {}
+    for index, index_symbol in INDEX_SYMBOLS.items():
+        spot = spots[index] = get_current_index_price(index)
+        expiry, strikes, _ = master_index.strike_window(index, spot, None, ATM_WIDTH) if spot else (None, [], None)
+        if not len(strikes):
+            logger.warning(f"Warmup: no strikes for {index} (spot {spot})")
+            symbols.append(index_symbol)
+            continue
+        ce_symbols, pe_symbols = master_index.chain_legs(index, expiry, strikes)
+        symbols += [index_symbol, *ce_symbols, *pe_symbols]
+    context["symbols"], context["spots"] = symbols, spots
+
+    def preload(symbol):
+        try:
+            get_cached_candles(symbol, priority=BACKGROUND)
+            return True
+        except Exception as e:
+            logger.warning(f"Warmup: history for {symbol} failed: {str(e)}")
+            return False
+    loaded = sum(chain_executor.map(preload, symbols))
+    logger.info(f"Warmup: preloaded history for {loaded} of {len(symbols)} symbols")
+
+def warmup_subscriptions(context: Dict):
+    """Centre the ATM tracker on the pre-open spots, connecting the feed if needed"""
+    ws_client = getattr(app.state, 'ws_client', None)
+    if not ws_client or not ws_client.is_connected:
+        start_feed_client(ensure_valid_token())
+    for index, spot in context.get("spots", {}).items():
+        if spot:
+            atm_tracker.update(index, spot)
+
+warmup_scheduler = WarmupScheduler([
+    ("token", warmup_token),
+    ("master", warmup_master),
+    ("history", warmup_history),
+    ("subscriptions", warmup_subscriptions),
+])
+
+@app.get("/warmup")
+def warmup_status():
+    """Next and last session warmup"""
+    return warmup_scheduler.status()
+
+@app.post("/warmup")
+def run_warmup():
+    """Run the session warmup now"""
+    return warmup_scheduler.run_once()
+
+class BackfillRequest(BaseModel):
+    symbols: List[str] = []
+    index: Optional[str] = None
+    strikes: List[float] = []
+    expiry: Optional[str] = None
+    resolution: str = "1"
+    start: Optional[date] = None
+    end: Optional[date] = None
+    days_back: int = 90
+
+@app.post("/backfill")
+def start_backfill(request: BackfillRequest):
+    """
+    Start (or resume) a chunked backfill into the local candle store.
+
+    Give explicit `symbols`, or an `index` with `strikes` (and optional
+    `expiry`) to backfill both legs of each straddle plus the index. The
+    range is `start`..`end`, or the last `days_back` days.
+    """
+    symbols = list(request.symbols)
+    if request.index:
+        if request.index not in INDEX_SYMBOLS:
+            raise HTTPException(status_code=400, detail=f"Invalid index: {request.index}")
+        symbols.append(INDEX_SYMBOLS[request.index])
+        for strike in request.strikes:
+            legs = master_index.legs(request.index, strike, request.expiry)
+            if legs is None:
+                raise HTTPException(status_code=404, detail=f"No options found for {request.index} {strike}")
+            symbols.extend(legs[1:])
+    if not symbols:
+        raise HTTPException(status_code=400, detail="No symbols provided")
+
+    end = request.end or date.today()
+    start = request.start or end - timedelta(days=request.days_back)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    job = backfill_manager.submit(symbols, request.resolution, start, end)
+    return job.status()
+
+@app.get("/backfill/{job_id}")
+def backfill_status(job_id: str):
+    """Progress of a backfill job"""
+    job = backfill_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown backfill job: {job_id}")
+    return job.status()
+
+@app.get("/ticks/{symbol}")
+def recent_ticks(symbol: str, limit: int = 100):
+    """Most recent ticks of a symbol from the in-memory ring, oldest first"""
+    return {"symbol": symbol, "ticks": [tick.to_dict() for tick in tick_ring.recent(symbol, limit)]}
+
+@app.post("/ticks/compact")
+async def compact_ticks(day: Optional[str] = None):
+    """Compact archived tick segments now: one day, or every day that is due"""
+    if day:
+        try:
+            day = date.fromisoformat(day).isoformat()
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid day: {day}")
+        return [await asyncio.to_thread(tick_archive.compact, day)]
+    return await asyncio.to_thread(tick_archive.compact_due)
+
+@app.get("/analytics")
+def analytics_queries():
+    """Available analytics queries and their parameters"""
+    return analytics.describe()
+
+@app.get("/analytics/{name}")
+async def run_analytics(name: str, request: Request):
+    """
+    Run a whitelisted aggregate query over locally stored candles and ticks.
+
+    Parameters are the query string; the result is columnar (`columns`
+    plus one list per column in `data`). Nothing is fetched from the broker.
+    """
+    if name not in analytics.queries:
+        raise HTTPException(status_code=404, detail=f"Unknown query: {name}")
+    try:
+        return await asyncio.to_thread(analytics.run, name, dict(request.query_params))
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/depth/{symbol}")
+def market_depth(symbol: str):
+    """Five-level book of a symbol with a depth subscription"""
+    book = depth_books.get(symbol)
+    if book is None:
+        raise HTTPException(status_code=404, detail=f"No depth for {symbol}; subscribe_depth its straddle first")
+    return book.snapshot()
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
     try:
-        if not fyers_socket or not fyers_socket.is_connected():
-            await initialize_websocket()
-            
         while True:
             # Keep connection alive and wait for messages
             data = await websocket.receive_text()
@@ -565,39 +1234,73 @@ async def websocket_endpoint(websocket: WebSocket):
         logger.error(f"WebSocket error: {str(e)}")
         manager.disconnect(websocket)
 
+@app.get("/stats")
+async def get_stats():
+    """Cache and upstream statistics"""
+    return {
+        "history_cache": history_cache.stats(),
+        "upstream": upstream_scheduler.stats(),
+        "feed_journal": ingest.recorder.stats() if ingest.recorder else None,
+        "ingest": ingest.stats(),
+        "warmup": warmup_scheduler.status(),
+        "subscriptions": subscription_manager.stats(),
+        "atm": atm_tracker.status(),
+        "depth": {**depth_books.stats(), "subscriptions": depth_subscriptions.stats()},
+        "tick_archive": tick_archive.stats(),
+        "compute": compute.stats(),
+        "charts": chart_sessions.stats()
+    }
+
 @app.get("/")
 async def root():
     """Root endpoint to check API status"""
     return {
         "status": "active",
         "timestamp": datetime.now(pytz.timezone('Asia/Kolkata')).isoformat(),
-        "websocket_connected": bool(fyers_socket and fyers_socket.is_connected())
+        "websocket_connected": bool(getattr(app.state, 'ws_client', None) and app.state.ws_client.is_connected)
     }
 
 @app.post("/subscribe")
 async def subscribe_symbols(request: Request):
+    """
+    Subscribe symbols on the market data socket.
+
+    - **client_id**: Socket.IO sid of the client that wants the ticks; its
+      symbols are released when it disconnects. Without one the symbols are
+      only held for the subscription grace period.
+    """
     try:
         data = await request.json()
         symbols = data.get('symbols', [])
+        client_id = data.get('client_id')
         
         if not symbols:
             raise HTTPException(status_code=400, detail="No symbols provided")
+        if client_id and not sio.manager.is_connected(client_id, '/'):
+            raise HTTPException(status_code=400, detail=f"Unknown client_id: {client_id}")
             
         logger.info({
             "message": "Subscribing to symbols",
-            "symbols": symbols
+            "symbols": symbols,
+            "client_id": client_id
         })
         
         # Get the WebSocket client from the app state
-        ws_client = app.state.ws_client
+        ws_client = getattr(app.state, 'ws_client', None)
         if not ws_client or not ws_client.is_connected:
             raise HTTPException(status_code=503, detail="WebSocket connection not available")
             
         # Subscribe to the symbols
-        ws_client.subscribe(symbols)
+        subscription_manager.acquire(client_id or "api", symbols)
+        if not client_id:
+            subscription_manager.release("api", symbols)
         
         return {"status": "success", "message": "Subscribed to symbols", "symbols": symbols}
         
+    except HTTPException:
+        raise
+    except SubscriptionLimitError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error({
             "error": f"Error subscribing to symbols: {str(e)}",
@@ -605,6 +1308,16 @@ async def subscribe_symbols(request: Request):
         })
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/unsubscribe")
+async def unsubscribe_symbols(request: Request):
+    """Release a client's interest in some symbols (all of them when none are given)"""
+    data = await request.json()
+    client_id = data.get('client_id')
+    if not client_id:
+        raise HTTPException(status_code=400, detail="No client_id provided")
+    subscription_manager.release(client_id, data.get('symbols'))
+    return {"status": "success"}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
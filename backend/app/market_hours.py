@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta, time as dtime
+import numpy as np
+import pytz
+
+IST = pytz.timezone('Asia/Kolkata')
+# IST has no DST, so epoch seconds shift to IST wall time by a constant
+IST_OFFSET = 19800
+
+# NSE/BSE F&O cash session
+MARKET_OPEN = dtime(9, 15)
+MARKET_CLOSE = dtime(15, 30)
+
+def now_ist() -> datetime:
+    """Current time in IST"""
+    return datetime.now(IST)
+
+def is_trading_day(when: datetime = None) -> bool:
+    """Weekday check (exchange holidays are not tracked)"""
+    when = when or now_ist()
+    return when.weekday() < 5
+
+def is_market_open(when: datetime = None) -> bool:
+    """Check if the F&O session is live at the given time"""
+    when = when.astimezone(IST) if when else now_ist()
+    return is_trading_day(when) and MARKET_OPEN <= when.time() <= MARKET_CLOSE
+
+def next_open(when: datetime = None) -> datetime:
+    """Start of the first session at or after the given time"""
+    when = when.astimezone(IST) if when else now_ist()
+    day = when.date()
+    while True:
+        start = IST.localize(datetime.combine(day, MARKET_OPEN))
+        if start >= when and is_trading_day(start):
+            return start
+        day += timedelta(days=1)
+
+def format_ist(timestamps, unit: str = 'm') -> np.ndarray:
+    """
+    Format epoch seconds as IST wall time strings in one vectorized call.
+
+    `unit` 'm' gives 'YYYY-MM-DD HH:MM', 'D' gives 'YYYY-MM-DD'. Many times
+    faster than pandas tz_convert + strftime on large candle arrays.
+    """
+    local = (np.asarray(timestamps, dtype=np.int64) + IST_OFFSET).astype('datetime64[s]')
+    if local.size == 0:
+        return np.empty(local.shape, dtype=str)
+    return np.char.replace(np.datetime_as_string(local, unit=unit), 'T', ' ')
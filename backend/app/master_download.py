@@ -0,0 +1,157 @@
+import codecs
+import json
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import requests
+
+logger = logging.getLogger(__name__)
+
+MASTER_URLS = {
+    "NSE_FO": "https://public.fyers.in/sym_details/NSE_FO_sym_master.json",
+    "BSE_FO": "https://public.fyers.in/sym_details/BSE_FO_sym_master.json"
+}
+UNDERLYINGS = ('NIFTY', 'BANKNIFTY', 'MIDCPNIFTY', 'FINNIFTY', 'SENSEX', 'BANKEX')
+COLUMNS = ['symbol', 'exSymbol', 'segment', 'exchange', 'expiryDate', 'strikePrice', 'exSymName']
+
+_WHITESPACE = re.compile(r'\s*')
+_decoder = json.JSONDecoder()
+
+def iter_master_entries(chunks: Iterable[bytes]) -> Iterator[Tuple[str, Any]]:
+    """
+    Yield (symbol, details) from a symbol-master document as it streams in.
+
+    The master is one large JSON object keyed by symbol. Each member is
+    decoded on its own once its bytes have arrived, so memory stays at one
+    network chunk plus one entry however big the document is.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer, pos, started, done = "", 0, False, False
+
+    def fill() -> bool:
+        nonlocal buffer, pos
+        for chunk in chunks:
+            if chunk:
+                buffer = buffer[pos:] + decoder.decode(chunk)
+                pos = 0
+                return True
+        buffer = buffer[pos:] + decoder.decode(b"", final=True)
+        pos = 0
+        return False
+
+    more = fill()
+    while True:
+        pos = _WHITESPACE.match(buffer, pos).end()
+        if pos == len(buffer):
+            if not more:
+                break
+            more = fill()
+            continue
+        if done:
+            raise ValueError(f"Unexpected data after the master document at {buffer[pos:pos + 20]!r}")
+        char = buffer[pos]
+        if not started:
+            if char != "{":
+                raise ValueError("Symbol master is not a JSON object")
+            started = True
+            pos += 1
+            continue
+        if char == ",":
+            pos += 1
+            continue
+        if char == "}":
+            done = True
+            pos += 1
+            continue
+        # "symbol": {...}, retried with more data when a member is cut by the chunk boundary
+        try:
+            key, end = _decoder.raw_decode(buffer, pos)
+            end = _WHITESPACE.match(buffer, end).end()
+            if end == len(buffer):
+                raise json.JSONDecodeError("Member cut by chunk boundary", buffer, end)
+            if buffer[end] != ":":
+                raise ValueError(f"Expected ':' after {key!r} in symbol master")
+            end = _WHITESPACE.match(buffer, end + 1).end()
+            value, end = _decoder.raw_decode(buffer, end)
+            if end == len(buffer) and more:
+                # A bare number could continue in the next chunk
+                raise json.JSONDecodeError("Member cut by chunk boundary", buffer, end)
+        except json.JSONDecodeError:
+            if not more:
+                raise ValueError("Symbol master ended mid-document")
+            more = fill()
+            continue
+        pos = end
+        yield key, value
+    if not done:
+        raise ValueError("Symbol master ended mid-document")
+
+def filter_master(entries: Iterable[Tuple[str, Any]], underlyings: Iterable[str] = UNDERLYINGS) -> List[tuple]:
+    """Rows of COLUMNS for the wanted underlyings, keeping nothing else"""
+    wanted = set(underlyings)
+    return [
+        (symbol, *(details.get(column) for column in COLUMNS[1:]))
+        for symbol, details in entries
+        if details.get('exSymbol') in wanted
+    ]
+
+def fetch_master(url: str, validators: Optional[Dict[str, str]] = None, session: Optional[requests.Session] = None,
+                 underlyings: Iterable[str] = UNDERLYINGS, timeout: float = 60) -> Tuple[Optional[List[tuple]], Dict[str, str]]:
+    """
+    Stream and filter one master file.
+
+    `validators` are the ETag / Last-Modified of the copy we hold; returns
+    (None, validators) when the server says it has not changed.
+    """
+    headers = {}
+    if validators and validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators and validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    with (session or requests).get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 304:
+            return None, validators
+        response.raise_for_status()
+        rows = filter_master(iter_master_entries(response.iter_content(chunk_size=1 << 16)), underlyings)
+        return rows, {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+
+def download_master(output_path: Path, urls: Dict[str, str] = MASTER_URLS,
+                    underlyings: Iterable[str] = UNDERLYINGS, force: bool = False) -> bool:
+    """
+    Refresh the filtered master CSV, returns False when upstream has not changed.
+
+    Every exchange is fetched concurrently. Validators are kept next to the
+    CSV; if any exchange changed, the others are fetched in full as well,
+    since the CSV holds them all. The CSV is replaced atomically, so the
+    master index never reads a half-written file.
+    """
+    output_path = Path(output_path)
+    state_path = output_path.with_suffix(".validators.json")
+    state = {} if force or not output_path.exists() or not state_path.exists() else json.loads(state_path.read_text())
+
+    with requests.Session() as session, ThreadPoolExecutor(max_workers=len(urls)) as pool:
+        def fetch(item, conditional=True):
+            exchange, url = item
+            return exchange, fetch_master(url, state.get(exchange) if conditional else None, session, underlyings)
+
+        results = dict(pool.map(fetch, urls.items()))
+        if all(rows is None for rows, _ in results.values()):
+            logger.info("Master instruments unchanged upstream, keeping the local copy")
+            return False
+        unchanged = [(exchange, urls[exchange]) for exchange, (rows, _) in results.items() if rows is None]
+        results.update(pool.map(lambda item: fetch(item, conditional=False), unchanged))
+
+    df = pd.DataFrame([row for exchange in urls for row in results[exchange][0]], columns=COLUMNS)
+    df['expiryDate'] = pd.to_datetime(pd.to_numeric(df['expiryDate']), unit='s')
+    tmp_path = output_path.with_suffix(".tmp")
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, output_path)
+    state_path.write_text(json.dumps({exchange: validators for exchange, (_, validators) in results.items()}))
+    logger.info(f"Master instruments data saved to {output_path}: {len(df)} rows")
+    return True
@@ -0,0 +1,136 @@
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+class MasterIndex:
+    """
+    In-memory index over the option master file.
+
+    For every (underlying, expiry) it keeps the strikes as a sorted float
+    array with the CE/PE symbols aligned to it, so ATM resolution is a
+    `searchsorted` and a strike ladder is a contiguous slice. The index is
+    rebuilt whenever the master file changes on disk.
+    """
+
+    def __init__(self, csv_path: Path):
+        self.csv_path = Path(csv_path)
+        self.version: Optional[str] = None
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self._strikes: Dict[Tuple[str, str], np.ndarray] = {}
+        self._ce: Dict[Tuple[str, str], np.ndarray] = {}
+        self._pe: Dict[Tuple[str, str], np.ndarray] = {}
+        self._expiries: Dict[str, List[str]] = {}
+        self._expiry_ts: Dict[Tuple[str, str], int] = {}
+
+    def load(self):
+        """Read the master file and rebuild every strike ladder"""
+        mtime = self.csv_path.stat().st_mtime
+        df = pd.read_csv(self.csv_path, usecols=['symbol', 'exSymbol', 'expiryDate', 'strikePrice'])
+
+        # Options only, futures carry a strike of -1
+        option_type = df['symbol'].str[-2:]
+        df = df[option_type.isin(['CE', 'PE'])].assign(option_type=option_type)
+        df['expiry'] = df['expiryDate'].str[:10]
+        df['expiry_ts'] = (pd.to_datetime(df['expiryDate'], utc=True) - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+
+        strikes, ce, pe, expiry_ts = {}, {}, {}, {}
+        expiries: Dict[str, List[str]] = {}
+        for (underlying, expiry), group in df.groupby(['exSymbol', 'expiry'], sort=True):
+            legs = group.pivot_table(index='strikePrice', columns='option_type', values='symbol', aggfunc='first')
+            legs = legs.dropna(subset=[c for c in ('CE', 'PE') if c in legs.columns]).sort_index()
+            if legs.empty or 'CE' not in legs.columns or 'PE' not in legs.columns:
+                continue
+            key = (underlying, expiry)
+            strikes[key] = legs.index.to_numpy(dtype=np.float64)
+            ce[key] = legs['CE'].to_numpy(dtype=object)
+            pe[key] = legs['PE'].to_numpy(dtype=object)
+            expiry_ts[key] = int(group['expiry_ts'].iloc[0])
+            expiries.setdefault(underlying, []).append(expiry)
+
+        with self._lock:
+            self._strikes, self._ce, self._pe = strikes, ce, pe
+            self._expiries, self._expiry_ts = expiries, expiry_ts
+            self._mtime = mtime
+            self.version = f"{int(mtime)}-{len(df)}"
+        logger.info(f"Master index built: {len(strikes)} ladders from {len(df)} options")
+
+    def refresh_if_changed(self):
+        """Reload when the master file was replaced since the last load"""
+        if not self.csv_path.exists():
+            raise FileNotFoundError(f"Master file not found: {self.csv_path}")
+        if self._mtime != self.csv_path.stat().st_mtime:
+            self.load()
+
+    def expiries(self, underlying: str) -> List[str]:
+        self.refresh_if_changed()
+        return list(self._expiries.get(underlying, []))
+
+    def nearest_expiry(self, underlying: str, today: Optional[str] = None) -> Optional[str]:
+        """First expiry on or after today, or the latest one if all have passed"""
+        expiries = self.expiries(underlying)
+        if not expiries:
+            return None
+        today = today or datetime.now().strftime('%Y-%m-%d')
+        upcoming = [expiry for expiry in expiries if expiry >= today]
+        return upcoming[0] if upcoming else expiries[-1]
+
+    def expiry_timestamp(self, underlying: str, expiry: str) -> Optional[int]:
+        """Expiry as epoch seconds (UTC)"""
+        self.refresh_if_changed()
+        return self._expiry_ts.get((underlying, expiry))
+
+    def ladder(self, underlying: str, expiry: str) -> np.ndarray:
+        """Sorted strikes for an expiry"""
+        self.refresh_if_changed()
+        return self._strikes.get((underlying, expiry), np.empty(0))
+
+    def atm_index(self, strikes: np.ndarray, spot: float) -> int:
+        """Position of the strike nearest to spot in a sorted ladder"""
+        idx = int(np.searchsorted(strikes, spot))
+        if idx == len(strikes):
+            return idx - 1
+        if idx > 0 and spot - strikes[idx - 1] <= strikes[idx] - spot:
+            return idx - 1
+        return idx
+
+    def strike_window(self, underlying: str, spot: float, expiry: Optional[str] = None,
+                      width: int = 5) -> Tuple[Optional[str], np.ndarray, Optional[float]]:
+        """ATM strike and up to `width` strikes on each side of it"""
+        expiry = expiry or self.nearest_expiry(underlying)
+        strikes = self.ladder(underlying, expiry) if expiry else np.empty(0)
+        if not len(strikes):
+            return expiry, strikes, None
+        atm = self.atm_index(strikes, spot)
+        window = strikes[max(0, atm - width):atm + width + 1]
+        return expiry, window, float(strikes[atm])
+
+    def legs(self, underlying: str, strike: float, expiry: Optional[str] = None) -> Optional[Tuple[str, str, str]]:
+        """(expiry, CE symbol, PE symbol) for a strike, nearest expiry listing it by default"""
+        if expiry:
+            candidates = [expiry]
+        else:
+            nearest = self.nearest_expiry(underlying)
+            expiries = self.expiries(underlying)
+            candidates = [e for e in expiries if nearest and e >= nearest] + [e for e in expiries if not nearest or e < nearest]
+        for candidate in candidates:
+            strikes = self.ladder(underlying, candidate)
+            idx = int(np.searchsorted(strikes, strike))
+            if idx < len(strikes) and strikes[idx] == strike:
+                key = (underlying, candidate)
+                return candidate, self._ce[key][idx], self._pe[key][idx]
+        return None
+
+    def chain_legs(self, underlying: str, expiry: str, strikes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """CE and PE symbols aligned to a slice of the ladder"""
+        ladder = self.ladder(underlying, expiry)
+        idx = np.searchsorted(ladder, strikes)
+        key = (underlying, expiry)
+        return self._ce[key][idx], self._pe[key][idx]
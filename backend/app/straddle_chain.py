@@ -0,0 +1,57 @@
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from market_hours import format_ist
+
+FIELDS = ["open", "high", "low", "close", "volume"]
+
+def time_axis(frames: Sequence[pd.DataFrame]) -> np.ndarray:
+    """Sorted union of candle timestamps across frames"""
+    stamps = [df["timestamp"].to_numpy(dtype=np.int64) for df in frames if not df.empty]
+    if not stamps:
+        return np.empty(0, dtype=np.int64)
+    return np.unique(np.concatenate(stamps))
+
+def align_candles(frames: Sequence[pd.DataFrame], timestamps: np.ndarray) -> np.ndarray:
+    """Scatter candle frames onto a shared time axis as a (frame, time, field) array, NaN where missing"""
+    out = np.full((len(frames), len(timestamps), len(FIELDS)), np.nan)
+    for i, df in enumerate(frames):
+        if df.empty:
+            continue
+        pos = np.searchsorted(timestamps, df["timestamp"].to_numpy(dtype=np.int64))
+        out[i, pos] = df[FIELDS].to_numpy(dtype=np.float64)
+    return out
+
+def build_straddle_chain(ce_frames: Sequence[pd.DataFrame], pe_frames: Sequence[pd.DataFrame]) -> Dict[str, Any]:
+    """
+    Combine CE and PE candles for a whole strike ladder in one pass.
+
+    Returns the shared time axis and (strike x time) arrays per field where
+    straddle OHLCV is CE + PE, matching how the chart builds a single
+    straddle. Bars where either leg has no candle are NaN.
+    """
+    timestamps = time_axis(list(ce_frames) + list(pe_frames))
+    ce = align_candles(ce_frames, timestamps)
+    pe = align_candles(pe_frames, timestamps)
+    straddle = ce + pe
+    return {
+        "timestamps": timestamps,
+        "straddle": {field: straddle[:, :, i] for i, field in enumerate(FIELDS)},
+        "ce_close": ce[:, :, FIELDS.index("close")],
+        "pe_close": pe[:, :, FIELDS.index("close")],
+    }
+
+def to_json_grid(values: np.ndarray) -> List[List[Any]]:
+    """2-D float array as nested lists with NaN replaced by None"""
+    grid = values.astype(object)
+    grid[np.isnan(values)] = None
+    return grid.tolist()
+
+def format_candles(df: pd.DataFrame, time_format: str = "ist") -> pd.DataFrame:
+    """Candles with a leading `date` column, IST 'YYYY-MM-DD HH:MM' or raw epoch seconds"""
+    timestamps = df["timestamp"].to_numpy(dtype=np.int64)
+    dates = timestamps if time_format == "epoch" else format_ist(timestamps)
+    # Object dates keep epoch seconds as ints when rows are turned into lists
+    return df.assign(date=dates).astype({"date": object})[["date", "open", "high", "low", "close", "volume"]]
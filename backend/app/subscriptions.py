@@ -0,0 +1,172 @@
+import itertools
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Fyers data socket limit on symbols per connection
+MAX_SYMBOLS = 5000
+
+class SubscriptionLimitError(RuntimeError):
+    """More symbols requested than the broker connection can carry"""
+
+class SubscriptionManager:
+    """
+    Broker subscriptions reference-counted by client interest.
+
+    A holder (a Socket.IO sid, a live straddle room, the warmup) acquires
+    symbols and releases them, or all of its symbols at once when it goes
+    away. A symbol nobody holds stays subscribed for `grace` seconds, so
+    flipping between strikes does not churn the feed, then is dropped by
+    `sweep`. Once the subscribed set passes `headroom` of `max_symbols`,
+    new symbols first evict the least recently released idle ones; the
+    cap itself is never exceeded. Pinned symbols are never dropped.
+
+    Broker calls are queued under the lock and made after it is released,
+    in the order the changes happened, so a slow broker never blocks
+    bookkeeping on other threads.
+    """
+
+    def __init__(self, subscribe: Callable[[List[str]], Any], unsubscribe: Callable[[List[str]], Any],
+                 max_symbols: int = MAX_SYMBOLS, headroom: float = 0.9, grace: float = 120,
+                 pinned: Iterable[str] = ()):
+        self._subscribe = subscribe
+        self._unsubscribe = unsubscribe
+        self.max_symbols = max_symbols
+        self.headroom = headroom
+        self.grace = grace
+        self.pinned = set(pinned)
+        self._holders: Dict[str, Counter] = {}
+        self._by_holder: Dict[Hashable, Counter] = {}
+        # Subscribed symbols nobody holds, oldest release first
+        self._idle: "OrderedDict[str, float]" = OrderedDict()
+        self._subscribed: Set[str] = set()
+        self._lock = threading.RLock()
+        # (broker call, symbols) in the order the set changed, drained by _flush
+        self._calls: deque = deque()
+        self._broker_lock = threading.Lock()
+        self._stats = {"subscribed": 0, "released": 0, "evicted": 0, "rejected": 0}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def symbols(self) -> List[str]:
+        """Everything that should be subscribed on the broker socket"""
+        with self._lock:
+            return sorted(self._subscribed | self.pinned)
+
+    def acquire(self, holder: Hashable, symbols: Iterable[str]) -> List[str]:
+        """Register interest, subscribing symbols that are not yet live; returns the new ones"""
+        symbols = list(dict.fromkeys(symbols))
+        with self._lock:
+            new = [s for s in symbols if s not in self._subscribed and s not in self.pinned]
+            self._make_room(len(new))
+            counts = self._by_holder.setdefault(holder, Counter())
+            for symbol in symbols:
+                counts[symbol] += 1
+                self._holders.setdefault(symbol, Counter())[holder] += 1
+                self._idle.pop(symbol, None)
+            if new:
+                self._subscribed.update(new)
+                self._stats["subscribed"] += len(new)
+                self._calls.append((self._subscribe, new))
+        self._flush()
+        return new
+
+    def _make_room(self, needed: int):
+        if not needed:
+            return
+        in_use = len(self._subscribed) + len(self.pinned)
+        excess = in_use + needed - int(self.max_symbols * self.headroom)
+        evict = list(itertools.islice(self._idle, max(excess, 0)))
+        if in_use - len(evict) + needed > self.max_symbols:
+            self._stats["rejected"] += needed
+            raise SubscriptionLimitError(
+                f"Cannot subscribe {needed} more symbols: {in_use} of {self.max_symbols} in use"
+            )
+        if evict:
+            for symbol in evict:
+                del self._idle[symbol]
+            self._drop(evict)
+            self._stats["evicted"] += len(evict)
+            logger.info(f"Evicted {len(evict)} idle symbols near the subscription cap")
+
+    def release(self, holder: Hashable, symbols: Optional[Iterable[str]] = None):
+        """Drop one reference per symbol, or every reference the holder has when symbols is None"""
+        with self._lock:
+            counts = self._by_holder.get(holder)
+            if not counts:
+                return
+            released = Counter(counts) if symbols is None else Counter(s for s in symbols if counts[s])
+            now = time.monotonic()
+            for symbol, n in released.items():
+                counts[symbol] -= n
+                if counts[symbol] <= 0:
+                    del counts[symbol]
+                holders = self._holders[symbol]
+                holders[holder] -= n
+                if holders[holder] <= 0:
+                    del holders[holder]
+                if not holders:
+                    del self._holders[symbol]
+                    if symbol in self._subscribed:
+                        self._idle[symbol] = now
+            if not counts:
+                del self._by_holder[holder]
+
+    def sweep(self, now: Optional[float] = None) -> List[str]:
+        """Unsubscribe symbols idle for longer than the grace period"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            expired = []
+            for symbol, since in self._idle.items():
+                if now - since < self.grace:
+                    break
+                expired.append(symbol)
+            for symbol in expired:
+                del self._idle[symbol]
+            if expired:
+                self._drop(expired)
+                self._stats["released"] += len(expired)
+        self._flush()
+        return expired
+
+    def _drop(self, symbols: List[str]):
+        self._subscribed.difference_update(symbols)
+        self._calls.append((self._unsubscribe, symbols))
+
+    def _flush(self):
+        """Make the queued broker calls, outside the bookkeeping lock"""
+        with self._broker_lock:
+            while self._calls:
+                call, symbols = self._calls.popleft()
+                try:
+                    call(symbols)
+                except Exception as e:
+                    logger.error(f"Broker subscription update for {len(symbols)} symbols failed: {str(e)}")
+
+    def _run(self):
+        while not self._stop.wait(max(self.grace / 4, 1)):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Subscription sweep failed: {str(e)}")
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name="subscription-sweep")
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "live": len(self._subscribed), "idle": len(self._idle),
+                    "holders": len(self._by_holder), "max_symbols": self.max_symbols}
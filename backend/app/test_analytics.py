@@ -0,0 +1,94 @@
+import sys
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+from analytics import Analytics, QueryError, parse_option
+from candle_store import CandleStore
+from ingest import normalize
+from tick_archive import TickArchive
+
+INDEX = {"NIFTY": "NSE:NIFTY50-INDEX"}
+# 09:15 IST on 2025-01-15 and 2025-01-16
+OPENS = {"2025-01-15": 1736912700, "2025-01-16": 1736999100}
+
+
+def minutes(day, closes, volume=10):
+    start = OPENS[day]
+    return pd.DataFrame({
+        "timestamp": [start + 60 * i for i in range(len(closes))],
+        "open": closes, "high": closes, "low": closes, "close": closes,
+        "volume": [volume] * len(closes),
+    })
+
+
+@pytest.fixture
+def engine(tmp_path):
+    store = CandleStore(tmp_path / "candles")
+    store.write("NSE:NIFTY50-INDEX", "1", minutes("2025-01-15", [23010, 23100, 23200]))
+    store.write("NSE:NIFTY50-INDEX", "1", minutes("2025-01-16", [23160, 23150, 23140]))
+    for strike, ce, pe in ((23000, [120, 110, 100], [90, 80, 70]), (23200, [40, 35, 30], [200, 190, 180])):
+        for day in OPENS:
+            store.write(f"NSE:NIFTY25116{strike}CE", "1", minutes(day, ce))
+            store.write(f"NSE:NIFTY25116{strike}PE", "1", minutes(day, pe))
+    return Analytics(store, TickArchive(tmp_path / "ticks"), INDEX)
+
+
+def test_parse_option_symbols():
+    assert parse_option("NSE:NIFTY2511623000CE") == ("NIFTY", date(2025, 1, 16), (2025, 1), 23000.0, "CE")
+    assert parse_option("NSE:BANKNIFTY25JAN50000PE") == ("BANKNIFTY", None, (2025, 1), 50000.0, "PE")
+    assert parse_option("NSE:NIFTY25D0424000CE")[1] == date(2025, 12, 4)
+    assert parse_option("NSE:NIFTY50-INDEX") is None
+
+
+def test_straddle_decay_picks_the_atm_leg_of_each_day(engine):
+    result = engine.run("straddle_decay", {"index": "NIFTY", "start": "2025-01-15", "end": "2025-01-16"})
+    data = result["data"]
+    assert data["day"] == ["2025-01-15", "2025-01-16"]
+    assert data["strike"] == [23000.0, 23200.0]
+    assert data["start_premium"] == [210, 240] and data["decay"] == [-40, -30]
+    assert result["summary"]["days"] == 2 and result["summary"]["mean_decay"] == -35
+
+    expiry_only = engine.run("straddle_decay", {"index": "NIFTY", "start": "2025-01-15", "end": "2025-01-16",
+                                                "expiry_days_only": "true"})
+    assert expiry_only["data"]["day"] == ["2025-01-16"]
+
+    # Window ends at 09:16, one minute in
+    early = engine.run("straddle_decay", {"index": "NIFTY", "start": "2025-01-15", "end": "2025-01-15",
+                                          "to_time": "09:16"})
+    assert early["data"]["end_premium"] == [190]
+
+
+def test_candle_summary_and_validation(engine):
+    result = engine.run("candle_summary", {"symbols": "NSE:NIFTY50-INDEX", "start": "2025-01-15",
+                                           "end": "2025-01-16", "from_time": "09:16"})
+    assert result["columns"] == ["symbol", "day", "open", "high", "low", "close", "volume", "candles"]
+    assert result["data"]["symbol"] == ["NSE:NIFTY50-INDEX"] * 2
+    assert result["data"]["open"] == [23100, 23150] and result["data"]["candles"] == [2, 2]
+
+    with pytest.raises(QueryError):
+        engine.run("candle_summary", {"symbols": "../etc"})
+    with pytest.raises(QueryError):
+        engine.run("candle_summary", {"symbols": "NSE:X", "limit": "5"})
+    with pytest.raises(QueryError):
+        engine.run("straddle_decay", {})
+
+
+def test_tick_summary_reads_compacted_and_fresh_ticks(engine):
+    archive = engine.tick_archive
+    for i, (ltp, volume, bid, ask) in enumerate(((100, 1000, 99.5, 100.5), (104, 1600, 103.5, 104.5), (98, 1900, 0, 0))):
+        archive(normalize({"symbol": "NSE:NIFTY2511623000CE", "ltp": ltp, "vol_traded_today": volume,
+                           "bid_price": bid, "ask_price": ask, "exch_feed_time": OPENS["2025-01-16"] + 60 * i}))
+        if i == 1:
+            archive.flush()
+            archive.compact("2025-01-16")
+    archive.flush()
+
+    result = engine.run("tick_summary", {"underlying": "NIFTY", "start": "2025-01-16", "end": "2025-01-16"})
+    data = result["data"]
+    assert data["ticks"] == [3] and (data["first"], data["high"], data["low"], data["last"]) == ([100], [104], [98], [98])
+    assert data["volume"] == [900] and data["avg_spread"] == [1.0]
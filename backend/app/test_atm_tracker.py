@@ -0,0 +1,69 @@
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+from atm_tracker import AtmTracker
+from master_index import MasterIndex
+from subscriptions import SubscriptionManager
+from test_master_index import write_master
+
+
+def test_legs_follow_spot_with_hysteresis(tmp_path):
+    write_master(tmp_path / "master_file.csv")
+    live, rolled = set(), []
+    subscriptions = SubscriptionManager(live.update, live.difference_update, grace=0)
+    tracker = AtmTracker(MasterIndex(tmp_path / "master_file.csv"), subscriptions, {"NIFTY": "NSE:NIFTY50-INDEX"},
+                         width=1, hysteresis=0.2, on_change=lambda index, legs: rolled.append(legs))
+
+    assert not tracker.on_tick("NSE:NIFTYBANK-INDEX", 50000)
+    assert tracker.on_tick("NSE:NIFTY50-INDEX", 23340)
+    assert live == {f"NSE:NIFTY250123{strike}{kind}" for strike in (23200, 23300, 23400) for kind in ("CE", "PE")}
+
+    # Past the midpoint but inside the hysteresis band: nothing moves
+    assert not tracker.on_tick("NSE:NIFTY50-INDEX", 23365)
+    assert tracker.on_tick("NSE:NIFTY50-INDEX", 23375)
+    assert tracker.status()["NIFTY"]["atm"] == 23400
+    assert rolled[-1] == ["NSE:NIFTY25012323500CE", "NSE:NIFTY25012323500PE"]
+    assert not tracker.on_tick("NSE:NIFTY50-INDEX", 23335)
+
+    # The dropped strike is released to the subscription manager, not held
+    subscriptions.sweep()
+    assert live == {f"NSE:NIFTY250123{strike}{kind}" for strike in (23300, 23400, 23500) for kind in ("CE", "PE")}
+
+
+def test_refused_window_backs_off(tmp_path):
+    write_master(tmp_path / "master_file.csv")
+    live = set()
+    subscriptions = SubscriptionManager(live.update, live.difference_update, max_symbols=4)
+    master = MasterIndex(tmp_path / "master_file.csv")
+    resolves = []
+    nearest_expiry = master.nearest_expiry
+    master.nearest_expiry = lambda *args: resolves.append(1) or nearest_expiry(*args)
+    tracker = AtmTracker(master, subscriptions, {"NIFTY": "NSE:NIFTY50-INDEX"}, width=1, retry_after=60)
+
+    for spot in (23340, 23345, 23600):
+        assert not tracker.on_tick("NSE:NIFTY50-INDEX", spot)
+    assert len(resolves) == 1 and live == set() and tracker.status() == {}
+
+    tracker._retry_at["NIFTY"] = 0
+    subscriptions.max_symbols = 10
+    assert tracker.on_tick("NSE:NIFTY50-INDEX", 23340)
+    assert len(live) == 6 and tracker._retry_at == {}
+
+
+def test_subscription_calls_run_outside_the_tracker_lock(tmp_path):
+    write_master(tmp_path / "master_file.csv")
+    live, inside = set(), []
+
+    def subscribe(symbols):
+        # A tick arriving mid-update leaves the window to the update in flight
+        inside.append((tracker._lock.locked(), tracker.update("NIFTY", 23600)))
+        live.update(symbols)
+
+    subscriptions = SubscriptionManager(subscribe, live.difference_update)
+    tracker = AtmTracker(MasterIndex(tmp_path / "master_file.csv"), subscriptions, {"NIFTY": "NSE:NIFTY50-INDEX"},
+                         width=1)
+    assert tracker.on_tick("NSE:NIFTY50-INDEX", 23340)
+    assert inside == [(False, False)]
+    assert tracker.status()["NIFTY"]["atm"] == 23300 and len(live) == 6
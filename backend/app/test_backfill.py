@@ -0,0 +1,88 @@
+import sys
+import threading
+from datetime import date, datetime
+from pathlib import Path
+
+import pandas as pd
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+import candle_store
+from backfill import BackfillJob, BackfillManager, chunk_ranges
+from candle_store import CandleStore
+from market_hours import IST
+
+# 09:15 IST on 2025-01-16
+OPEN = 1736999100
+
+
+def candles(start):
+    return pd.DataFrame({
+        "timestamp": [start, start + 60],
+        "open": [100.0, 101.0], "high": [102.0, 103.0], "low": [99.0, 100.0], "close": [101.0, 102.0],
+        "volume": [10, 20],
+    })
+
+
+def test_chunk_ranges_split_at_broker_limits():
+    intraday = chunk_ranges(date(2024, 1, 1), date(2024, 4, 10), "1")
+    assert intraday == [(date(2024, 1, 1), date(2024, 4, 9)), (date(2024, 4, 10), date(2024, 4, 10))]
+    assert chunk_ranges(date(2024, 1, 1), date(2024, 4, 9), "5") == [(date(2024, 1, 1), date(2024, 4, 9))]
+
+    daily = chunk_ranges(date(2023, 1, 1), date(2024, 1, 2), "D")
+    assert daily == [(date(2023, 1, 1), date(2024, 1, 1)), (date(2024, 1, 2), date(2024, 1, 2))]
+    assert chunk_ranges(date(2024, 1, 2), date(2024, 1, 1), "1D") == []
+
+
+def test_interrupted_job_fetches_only_missing_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(candle_store, "now_ist", lambda: datetime(2025, 6, 1, 10, tzinfo=IST))
+    store = CandleStore(tmp_path / "candles")
+    calls = []
+
+    def fetch(symbol, range_from, range_to, resolution, priority):
+        calls.append((symbol, range_from))
+        if symbol == "B" and range_from == "2025-03-11":
+            raise RuntimeError("connection reset")
+        return candles(OPEN)
+
+    job = BackfillJob(["A", "B"], "1", date(2024, 12, 1), date(2025, 3, 15), store, tmp_path / "jobs", workers=2)
+    job.run(fetch)
+    assert job.state == "failed" and len(job.done) == 3 and len(calls) == 4
+
+    calls.clear()
+    resumed = BackfillJob.from_checkpoint(job.checkpoint_path, store)
+    assert resumed.job_id == job.job_id and len(resumed.done) == 3
+    resumed.run(lambda *args: calls.append(args[:2]) or candles(OPEN))
+    assert calls == [("B", "2025-03-11")]
+    assert resumed.state == "completed" and resumed.status()["progress"] == 1.0
+
+
+def test_chunk_reaching_today_is_fetched_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(candle_store, "now_ist", lambda: datetime(2025, 1, 16, 11, tzinfo=IST))
+    store = CandleStore(tmp_path / "candles")
+    calls = []
+
+    def fetch(symbol, range_from, range_to, resolution, priority):
+        calls.append(range_to)
+        return candles(OPEN)
+
+    for _ in range(2):
+        job = BackfillJob(["A"], "1", date(2025, 1, 10), date(2025, 1, 16), store, tmp_path / "jobs")
+        job.run(fetch)
+        assert job.state == "completed" and job.done == set()
+    assert calls == ["2025-01-16", "2025-01-16"]
+    assert store.coverage("A", "1") == [["2025-01-10", "2025-01-15"]]
+
+
+def test_submit_returns_the_job_already_started(tmp_path):
+    release = threading.Event()
+
+    def fetch(*args):
+        release.wait(5)
+        return candles(OPEN)
+
+    manager = BackfillManager(CandleStore(tmp_path / "candles"), tmp_path / "jobs", fetch)
+    first = manager.submit(["A"], "D", date(2024, 1, 1), date(2024, 1, 2))
+    assert first.state == "running"
+    assert manager.submit(["A"], "D", date(2024, 1, 1), date(2024, 1, 2)) is first
+    release.set()
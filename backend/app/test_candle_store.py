@@ -0,0 +1,71 @@
+import sys
+from datetime import date, datetime
+from pathlib import Path
+
+import pandas as pd
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+import candle_store
+from candle_store import CandleStore
+from market_hours import IST
+
+# 09:15 IST on 2025-01-16
+OPEN = 1736999100
+
+
+def candles(timestamps, closes):
+    return pd.DataFrame({
+        "timestamp": timestamps,
+        "open": closes, "high": closes, "low": closes, "close": closes,
+        "volume": [10] * len(closes),
+    })
+
+
+def test_write_merges_and_dedups_per_day(tmp_path):
+    store = CandleStore(tmp_path)
+    # 2025-01-15 09:15 and 2025-01-16 09:15, 09:16
+    assert store.write("NSE:A-EQ", "1", candles([OPEN - 86400, OPEN, OPEN + 60], [1.0, 2.0, 3.0])) == 2
+    # Overlaps one stored bar and arrives out of order
+    assert store.write("NSE:A-EQ", "1", candles([OPEN + 120, OPEN + 60], [5.0, 4.0])) == 1
+
+    assert store.days("NSE:A-EQ", "1") == ["2025-01-15", "2025-01-16"]
+    day = store.read("NSE:A-EQ", "1")
+    assert day["timestamp"].tolist() == [OPEN - 86400, OPEN, OPEN + 60, OPEN + 120]
+    # The later write wins
+    assert day["close"].tolist() == [1.0, 2.0, 4.0, 5.0]
+    assert store.write("NSE:A-EQ", "1", candles([], [])) == 0
+
+
+def test_coverage_merges_adjacent_ranges(tmp_path):
+    store = CandleStore(tmp_path)
+    store.mark_covered("A", "1", date(2025, 1, 1), date(2025, 1, 5))
+    store.mark_covered("A", "1", date(2025, 1, 10), date(2025, 1, 12))
+    store.mark_covered("A", "1", date(2025, 1, 6), date(2025, 1, 7))
+    # An empty range records nothing
+    store.mark_covered("A", "1", date(2025, 1, 9), date(2025, 1, 8))
+    assert store.coverage("A", "1") == [["2025-01-01", "2025-01-07"], ["2025-01-10", "2025-01-12"]]
+
+    assert store.is_covered("A", "1", date(2025, 1, 2), date(2025, 1, 7))
+    assert not store.is_covered("A", "1", date(2025, 1, 6), date(2025, 1, 10))
+    assert not store.is_covered("A", "5", date(2025, 1, 2), date(2025, 1, 3))
+
+
+def test_volume_reads_back_as_integers(tmp_path):
+    store = CandleStore(tmp_path)
+    df = candles([OPEN], [1.0])
+    df["volume"] = [123456789012]
+    store.write("A", "1", df)
+    volume = store.read("A", "1")["volume"]
+    assert volume.dtype == "int64" and volume.tolist() == [123456789012]
+
+
+def test_write_range_covers_closed_days_only(tmp_path, monkeypatch):
+    # 2025-01-16 11:00 IST, the session is open
+    monkeypatch.setattr(candle_store, "now_ist", lambda: datetime(2025, 1, 16, 11, tzinfo=IST))
+    store = CandleStore(tmp_path)
+    assert not store.write_range("A", "1", candles([OPEN], [1.0]), date(2025, 1, 13), date(2025, 1, 16))
+    assert store.coverage("A", "1") == [["2025-01-13", "2025-01-15"]]
+    assert store.days("A", "1") == ["2025-01-16"]
+    assert store.write_range("A", "1", candles([], []), date(2025, 1, 6), date(2025, 1, 10))
+    assert store.coverage("A", "1") == [["2025-01-06", "2025-01-10"], ["2025-01-13", "2025-01-15"]]
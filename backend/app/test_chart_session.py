@@ -0,0 +1,74 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+from chart_session import ChartFeed, ChartSessions
+
+# 09:15 IST on 2025-01-16
+OPEN = 1736999100
+
+
+def candles(closes):
+    return pd.DataFrame({
+        "timestamp": [OPEN + 60 * i for i in range(len(closes))],
+        "open": closes, "high": closes, "low": closes, "close": closes,
+        "volume": [10] * len(closes),
+    })
+
+
+def test_feed_continues_history_and_keeps_early_ticks():
+    feed = ChartFeed("CE", "PE")
+    # Arrives while the history is loading
+    assert feed.on_tick("CE", 112.0, 500, OPEN + 130) is None
+    feed.seed(candles([120.0, 110.0]), candles([90.0, 80.0]))
+
+    snapshot = feed.snapshot()
+    assert snapshot["seq"] == 1
+    assert snapshot["ce"][-1] == ["2025-01-16 09:17", 112.0, 112.0, 112.0, 112.0, 0]
+    assert snapshot["straddle"][-1][0] == "2025-01-16 09:17" and snapshot["straddle"][-1][4] == 192.0
+
+    update = feed.on_tick("PE", 85.0, 300, OPEN + 150)
+    assert update["seq"] == 2 and update["pe"][0] == "2025-01-16 09:17"
+    assert update["straddle"][1:5] == [192.0, 197.0, 192.0, 197.0]
+    # A tick for a closed bar changes nothing
+    assert feed.on_tick("CE", 100.0, 600, OPEN + 10) is None and feed.seq == 2
+
+
+def test_sessions_send_history_then_every_later_update():
+    sent = []
+
+    async def emit(event, payload, to):
+        sent.append((to, event, payload))
+
+    async def scenario():
+        sessions = ChartSessions(emit, max_queue=3)
+        feed = await sessions.prepare("CE", "PE", "1", 10, lambda: (candles([120.0]), candles([90.0])))
+        assert sessions.open("a", "1", feed, expiry="2025-01-16") == {"chart": "1", "seq": 0}
+        sessions.on_tick("CE", 121.0, 100, OPEN + 5)
+        await asyncio.sleep(0.01)
+        sessions.open("b", "x", feed)
+        sessions.on_tick("PE", 91.0, 100, OPEN + 6)
+        await asyncio.sleep(0.01)
+
+        events = [(to, event, payload["seq"]) for to, event, payload in sent]
+        assert events == [("a", "chart_history", 0), ("a", "chart_update", 1), ("b", "chart_history", 1),
+                          ("a", "chart_update", 2), ("b", "chart_update", 2)]
+        assert sent[0][2]["expiry"] == "2025-01-16" and sent[2][2]["straddle"][-1][4] == 211.0
+
+        # A client that falls too far behind gets a fresh history
+        sent.clear()
+        for i in range(5):
+            sessions.on_tick("CE", 122.0 + i, 100, OPEN + 7)
+        await asyncio.sleep(0.01)
+        assert [(event, payload["seq"]) for to, event, payload in sent if to == "a"] == [("chart_history", 7)]
+        assert sessions.stats()["resyncs"] == 2
+
+        sessions.close_all("a")
+        assert sessions.close("b", "x") is feed
+        assert sessions.stats()["feeds"] == 0 and sessions._by_symbol == {}
+
+    asyncio.run(scenario())
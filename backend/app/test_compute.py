@@ -0,0 +1,78 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+from compute import (
+    ComputeBusy, ComputeExecutor, pack_frame, straddle_chain_task, straddle_iv_task, unpack_frame
+)
+
+# 09:15 IST on 2025-01-16
+OPEN = 1736999100
+
+
+def candles(closes, start=OPEN):
+    return pd.DataFrame({
+        "timestamp": [start + 60 * i for i in range(len(closes))],
+        "open": closes, "high": closes, "low": closes, "close": closes,
+        "volume": [10] * len(closes),
+    })
+
+
+def test_frames_round_trip_through_arrow():
+    df = candles([100.5, 101.0, 99.75])
+    restored = unpack_frame(pack_frame(df))
+    pd.testing.assert_frame_equal(restored, df)
+    assert unpack_frame(pack_frame(df.iloc[:0])).empty
+
+
+def test_process_pool_runs_chain_and_iv_tasks():
+    compute = ComputeExecutor(workers=1)
+    try:
+        frames = {"CE": pack_frame(candles([120, 110, 100])), "PE": pack_frame(candles([90, 80], OPEN + 60)),
+                  "SPOT": pack_frame(candles([23010, 23100, 23200]))}
+        chain = compute.submit(straddle_chain_task, frames, ["CE"], ["PE"], np.array([23000.0]),
+                               "SPOT", OPEN + 7 * 86400, 0.065).result(timeout=60)
+        assert chain["timestamps"] == [OPEN, OPEN + 60, OPEN + 120]
+        assert chain["straddle"]["close"] == [[None, 200.0, 180.0]]
+        assert chain["iv"][0][0] is None and chain["iv"][0][1] > 0
+
+        iv = compute.submit(straddle_iv_task, frames["CE"], frames["PE"], frames["SPOT"], 23000.0,
+                            OPEN + 7 * 86400, 0.065).result(timeout=60)
+        assert iv["straddle"] == [200.0, 180.0] and iv["tail"][0] == [OPEN + 120]
+
+        stats = compute.stats()
+        assert (stats["mode"], stats["completed"], stats["pending"]) == ("process", 2, 0)
+        assert stats["tasks"]["straddle_iv_task"]["calls"] == 1
+    finally:
+        compute.stop()
+
+
+def test_full_queue_is_rejected_and_loop_stays_free():
+    compute = ComputeExecutor(workers=0, max_pending=1)
+
+    async def scenario():
+        task = asyncio.ensure_future(compute.run(time.sleep, 0.3))
+        await asyncio.sleep(0)
+        with pytest.raises(ComputeBusy):
+            compute.submit(time.sleep, 0)
+        # The event loop keeps serving while the task runs
+        ticks = 0
+        while not task.done():
+            ticks += 1
+            await asyncio.sleep(0.01)
+        return ticks
+
+    try:
+        assert asyncio.run(scenario()) > 5
+        stats = compute.stats()
+        assert (stats["rejected"], stats["completed"], stats["queued"]) == (1, 1, 0)
+        assert stats["tasks"]["sleep"]["run_p50_ms"] >= 250
+    finally:
+        compute.stop()
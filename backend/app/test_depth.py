@@ -0,0 +1,74 @@
+import sys
+import tracemalloc
+from pathlib import Path
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+from depth import ASK, BID, PRICE, QTY, DepthBooks
+from ingest import IngestPipeline
+
+
+def full_book(symbol, best_bid, best_ask, size=50):
+    message = {"type": "dp", "symbol": symbol}
+    for level in range(1, 6):
+        message.update({
+            f"bid_price{level}": best_bid - (level - 1) * 0.05, f"ask_price{level}": best_ask + (level - 1) * 0.05,
+            f"bid_size{level}": size * level, f"ask_size{level}": size * level,
+            f"bid_order{level}": level, f"ask_order{level}": level,
+        })
+    return message
+
+
+def test_partial_updates_change_only_their_cells():
+    books = DepthBooks()
+    book = books.apply(full_book("CE", 100.0, 100.5))
+    levels = book.levels
+    books.apply({"type": "dp", "symbol": "CE", "bid_price1": 100.1, "ask_size3": 7})
+
+    assert books.get("CE").levels is levels
+    assert levels[BID, PRICE, 0] == 100.1 and levels[ASK, QTY, 2] == 7
+    assert levels[BID, PRICE, 1] == 99.95
+    snapshot = book.snapshot()
+    assert snapshot["bids"][0] == [100.1, 50, 1] and snapshot["updates"] == 2
+
+
+def test_straddle_top_of_book():
+    books = DepthBooks()
+    books.apply(full_book("CE", 100.0, 100.5, size=50))
+    assert books.straddle("CE", "PE") is None
+    books.apply(full_book("PE", 80.0, 80.3, size=75))
+
+    straddle = books.straddle("CE", "PE")
+    assert (straddle["bid"], straddle["ask"], straddle["mid"], straddle["spread"]) == (180.0, 180.8, 180.4, 0.8)
+    assert straddle["bid_qty"] == 50
+
+    books.discard(["PE"])
+    assert books.straddle("CE", "PE") is None
+
+
+def test_updates_do_not_allocate():
+    books = DepthBooks()
+    books.apply(full_book("CE", 100.0, 100.5))
+    updates = [{"type": "dp", "symbol": "CE", "bid_price1": 100 + i / 100, "bid_size1": i} for i in range(2000)]
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        for update in updates:
+            books.apply(update)
+        grown = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    assert grown < 1024
+
+
+def test_pipeline_routes_depth_away_from_tick_sinks():
+    depth, ticks = [], []
+    pipeline = IngestPipeline(on_depth=depth.append)
+    pipeline.add_sink("ticks", ticks.append)
+    pipeline.on_message(full_book("CE", 100.0, 100.5))
+    pipeline.on_message({"symbol": "CE", "ltp": 100.2})
+
+    assert len(depth) == 1 and [tick.symbol for tick in ticks] == ["CE"]
+    stats = pipeline.stats()
+    assert (stats["depth"], stats["ticks"]) == (1, 1)
+    assert stats["sinks"]["depth"]["calls"] == 1
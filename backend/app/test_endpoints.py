@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 from fastapi.testclient import TestClient
 import pandas as pd
@@ -7,6 +8,8 @@ import sys
 
 # Add parent directory to Python path for imports
 sys.path.append(str(Path(__file__).parent))
+import main
+from live_bars import LiveStraddle
 from main import app
 
 # Create test client
@@ -72,6 +75,10 @@ def test_historical_straddle_invalid_symbol():
     response = client.get("/historical-straddle/INVALID_SYMBOL")
     assert response.status_code == 500
 
+def test_subscribe_rejects_unknown_client_id():
+    response = client.post("/subscribe", json={"symbols": ["NSE:NIFTY50-INDEX"], "client_id": "not-a-sid"})
+    assert response.status_code == 400
+
 def test_data_files_exist():
     """Test if necessary data files are created"""
     data_dir = Path(__file__).parent.parent / "data"
@@ -79,5 +86,29 @@ def test_data_files_exist():
     assert (data_dir / "access_token.txt").exists(), "Access token file not found"
     assert (data_dir / "master_file.csv").exists(), "Master file not found"
 
+def test_live_straddle_dropped_with_its_last_member():
+    live = main.add_live_straddle(LiveStraddle("NSE:TEST25JAN100CE", "NSE:TEST25JAN100PE"))
+    assert main.add_live_straddle(LiveStraddle("NSE:TEST25JAN100CE", "NSE:TEST25JAN100PE")) is live
+    main.live_straddle_members[live.room] = {"sid-a", "sid-b"}
+    assert main.live_straddles_by_symbol["NSE:TEST25JAN100CE"] == (live,)
+
+    main.leave_live_straddle("sid-a", live.room)
+    assert main.live_straddles[live.room] is live
+    asyncio.run(main.disconnect("sid-b"))
+    assert live.room not in main.live_straddles and live.room not in main.live_straddle_members
+    assert "NSE:TEST25JAN100PE" not in main.live_straddles_by_symbol
+
+def test_unsubscribe_depth_ignores_other_rooms(monkeypatch):
+    # Every sid is in a room named after itself
+    monkeypatch.setattr(main.sio, "rooms", lambda sid: [sid])
+    left = []
+
+    async def leave_room(sid, room):
+        left.append(room)
+
+    monkeypatch.setattr(main.sio, "leave_room", leave_room)
+    reply = asyncio.run(main.unsubscribe_depth("sid-a", {"room": "sid-a"}))
+    assert reply["status"] == "error" and left == []
+
 if __name__ == "__main__":
     pytest.main(["-v", __file__])
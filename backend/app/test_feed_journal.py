@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+from feed_journal import FeedRecorder, journal_info, read_journal, replay
+
+
+def record(tmp_path, messages, **kwargs):
+    recorder = FeedRecorder(tmp_path, **kwargs)
+    for message, source in messages:
+        recorder.record(message, source)
+    recorder.close()
+    return recorder
+
+
+def test_round_trip_keeps_messages_sources_and_order(tmp_path):
+    messages = [({"symbol": "NSE:NIFTY25116230000CE", "ltp": 101.5}, "data_ws"),
+                ('{"type": "sf"}', "client"), (b"\x00\x01", "data_ws")]
+    recorder = record(tmp_path, messages)
+    assert recorder.stats()["messages"] == 3
+
+    records = list(read_journal(recorder.path))
+    assert [(source, message) for _, source, message in records] == [(s, m) for m, s in messages]
+    assert [t for t, _, _ in records] == sorted(t for t, _, _ in records)
+    assert journal_info([recorder.path])["symbols"] == 1
+
+
+def test_truncated_journal_reads_up_to_last_complete_record(tmp_path):
+    recorder = record(tmp_path, [({"ltp": i}, "data_ws") for i in range(500)])
+    data = recorder.path.read_bytes()
+    recorder.path.write_bytes(data[:len(data) * 2 // 3])
+
+    recovered = [message["ltp"] for _, _, message in read_journal(recorder.path)]
+    assert 0 < len(recovered) < 500
+    assert recovered == list(range(len(recovered)))
+
+
+def test_replay_routes_by_source_and_keeps_spacing():
+    start = time.time_ns()
+    records = [(start + i * 20_000_000, "data_ws" if i % 2 else "client", i) for i in range(10)]
+    seen = []
+    result = replay(records, {"data_ws": seen.append}, speed=0)
+    assert seen == [1, 3, 5, 7, 9]
+    assert result["messages"] == {"data_ws": 5}
+
+    # 180 ms of recorded gaps at 2x speed
+    result = replay(records, {"data_ws": seen.append, "client": seen.append}, speed=2)
+    assert 0.07 <= result["elapsed_sec"] < 0.5
+
+
+def test_messages_after_close_are_dropped(tmp_path):
+    recorder = record(tmp_path, [({"ltp": 1.0}, "data_ws")])
+    recorder.record({"ltp": 2.0})
+    assert recorder.stats() == {"path": str(recorder.path), "messages": 1, "queued": 0, "dropped": 1}
+    assert len(list(read_journal(recorder.path))) == 1
+
+
+def test_new_journal_prunes_old_ones(tmp_path):
+    now = time.time()
+    for n, age_days in enumerate((10, 3, 2, 1)):
+        path = tmp_path / f"feed-2025011{n}-091500-1.fjr.gz"
+        path.write_bytes(b"x" * 1000)
+        os.utime(path, (now - age_days * 86400, now - age_days * 86400))
+    (tmp_path / "notes.txt").write_text("kept")
+
+    recorder = record(tmp_path, [({"ltp": 1.0}, "data_ws")], retain_days=7, retain_bytes=2500)
+    kept = sorted(path.name for path in tmp_path.iterdir())
+    assert kept == ["feed-20250112-091500-1.fjr.gz", "feed-20250113-091500-1.fjr.gz", recorder.path.name, "notes.txt"]
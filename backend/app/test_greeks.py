@@ -0,0 +1,41 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+from greeks import implied_vol, option_price, straddle_greeks, straddle_price
+
+
+def test_implied_vol_round_trip_on_a_grid():
+    strikes = np.arange(23000, 24050, 100, dtype=float)[:, None]
+    spot = 23400 + 50 * np.sin(np.arange(375) / 30)[None, :]
+    t = np.linspace(7, 1, 375)[None, :] / 365
+    sigma = 0.10 + (strikes - 23000) / 20000
+
+    iv = implied_vol(straddle_price(spot, strikes, t, 0.065, sigma), spot, strikes, t)
+    assert iv.shape == (11, 375)
+    assert np.nanmax(np.abs(iv - sigma)) < 1e-6
+
+    call = option_price(spot, strikes, t, 0.065, sigma, True)
+    put = option_price(spot, strikes, t, 0.065, sigma, False)
+    # Legs worth less than a tick are left unsolved
+    assert np.nanmax(np.abs(implied_vol(call, spot, strikes, t, kind="call") - sigma)) < 1e-5
+    assert np.nanmax(np.abs(implied_vol(put, spot, strikes, t, kind="put") - sigma)) < 1e-5
+
+
+def test_unsolvable_prices_are_nan():
+    # Below intrinsic, zero price and expired
+    iv = implied_vol([100.0, 0.0, 300.0], 23400, 23000, [0.01, 0.01, 0.0], kind="call")
+    assert np.isnan(iv).all()
+
+
+def test_straddle_delta_matches_finite_difference():
+    spot, strike, t, sigma = 23450.0, 23400.0, 5 / 365, 0.14
+    greeks = straddle_greeks(spot, strike, t, sigma)
+    bump = 0.5
+    numeric = (straddle_price(spot + bump, strike, t, 0.065, sigma)
+               - straddle_price(spot - bump, strike, t, 0.065, sigma)) / (2 * bump)
+    assert abs(greeks["delta"] - numeric) < 1e-4
+    assert greeks["gamma"] > 0 and greeks["vega"] > 0 and greeks["theta"] < 0
@@ -0,0 +1,58 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+from history_cache import HistoryCache
+
+
+def test_concurrent_requests_share_one_load():
+    cache = HistoryCache(live_ttl=60, closed_ttl=60)
+    calls = []
+    release = threading.Event()
+
+    def loader():
+        calls.append(1)
+        release.wait(2)
+        return {"candles": [1, 2, 3]}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("key", loader))) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(results) == 20
+    assert cache.stats()["coalesced"] == 19
+    assert cache.get("key", loader) == {"candles": [1, 2, 3]}
+    assert len(calls) == 1
+
+
+def test_stale_value_served_while_revalidating():
+    cache = HistoryCache(live_ttl=0, closed_ttl=0, stale_ttl=60)
+    values = iter(["first", "second"])
+    cache.get("key", lambda: next(values))
+
+    assert cache.get("key", lambda: next(values)) == "first"
+    time.sleep(0.1)
+    assert cache.stats()["loads"] == 2
+
+
+def test_stale_value_served_when_upstream_fails():
+    cache = HistoryCache(live_ttl=0, closed_ttl=0, stale_ttl=0, slow_timeout=1)
+    cache.get("key", lambda: "cached")
+
+    def failing():
+        raise RuntimeError("rate limited")
+
+    assert cache.get("key", failing) == "cached"
+    with pytest.raises(RuntimeError):
+        cache.get("other", failing)
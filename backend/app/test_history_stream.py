@@ -0,0 +1,72 @@
+import json
+import sys
+from datetime import date, datetime
+from pathlib import Path
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+import candle_store
+import main
+from candle_store import CandleStore
+from history_stream import iter_straddle_chunks, iter_windows
+from market_hours import IST
+
+# 09:15 IST on 2025-01-01
+OPEN = 1735703100
+
+
+def day_candles(day, close):
+    start = OPEN + 86400 * (day - 1)
+    return pd.DataFrame({"timestamp": [start], "open": [close], "high": [close], "low": [close],
+                         "close": [close], "volume": [10]})
+
+
+def fetch_days(calls):
+    def fetch(symbol, range_from, range_to, resolution):
+        calls.append((symbol, range_from, range_to))
+        first, last = date.fromisoformat(range_from).day, date.fromisoformat(range_to).day
+        return pd.concat([day_candles(day, 100.0 + day) for day in range(first, last + 1)], ignore_index=True)
+    return fetch
+
+
+def test_windows_cover_range_without_overlap():
+    windows = list(iter_windows(date(2025, 1, 1), date(2025, 1, 12), 5))
+    assert windows == [(date(2025, 1, 1), date(2025, 1, 5)), (date(2025, 1, 6), date(2025, 1, 10)),
+                       (date(2025, 1, 11), date(2025, 1, 12))]
+    assert list(iter_windows(date(2025, 1, 2), date(2025, 1, 1))) == []
+
+
+def test_closed_windows_are_read_back_from_the_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(candle_store, "now_ist", lambda: datetime(2025, 1, 8, 11, tzinfo=IST))
+    store = CandleStore(tmp_path)
+    calls = []
+    legs = {"ce_data": "CE", "pe_data": "PE"}
+
+    chunks = list(iter_straddle_chunks(legs, "1", date(2025, 1, 1), date(2025, 1, 8), store, fetch_days(calls), 4))
+    assert [len(chunk["ce_data"]) for chunk in chunks] == [4, 4]
+    assert len(calls) == 4
+
+    calls.clear()
+    chunks = list(iter_straddle_chunks(legs, "1", date(2025, 1, 1), date(2025, 1, 8), store, fetch_days(calls), 4))
+    # Only the window holding today goes upstream again
+    assert calls == [("CE", "2025-01-05", "2025-01-08"), ("PE", "2025-01-05", "2025-01-08")]
+    assert chunks[0]["pe_data"]["close"].tolist() == [101.0, 102.0, 103.0, 104.0]
+
+
+def test_stream_endpoint_yields_meta_candles_end(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "resolve_straddle_legs", lambda index, strike, expiry: ("2025-01-30", "CE", "PE"))
+    monkeypatch.setattr(main, "get_history_window", lambda days_back: ("2025-01-01", "2025-01-07"))
+    monkeypatch.setattr(main, "candle_store", CandleStore(tmp_path))
+    monkeypatch.setattr(main, "fetch_candles", fetch_days([]))
+
+    response = TestClient(main.app).get("/historical_straddle/NIFTY/23000/stream")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["type"] for line in lines] == ["meta", "candles", "candles", "end"]
+    assert lines[0]["ce_symbol"] == "CE"
+    assert [len(line["ce_data"]) for line in lines[1:3]] == [5, 2]
+    assert lines[1]["pe_data"][0] == ["2025-01-01 09:15", 101.0, 101.0, 101.0, 101.0, 10]
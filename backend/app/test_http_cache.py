@@ -0,0 +1,78 @@
+import gzip
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+from http_cache import CompressionMiddleware, conditional_response, make_etag
+
+ROWS = [["2025-01-16 09:15", 100.5, 101.0, 99.75, 100.0, 1200]] * 200
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+
+@app.get("/rows")
+def rows(request: Request):
+    return conditional_response(request, make_etag("rows", ROWS[-1]), {"data": ROWS})
+
+
+@app.get("/small")
+def small(request: Request):
+    return conditional_response(request, make_etag("small"), {"ok": True})
+
+
+@app.get("/stream")
+def stream():
+    return StreamingResponse((f'{{"line": {i}}}\n' for i in range(50)), media_type="application/x-ndjson")
+
+
+client = TestClient(app)
+
+
+def test_matching_etag_gets_304_without_body():
+    first = client.get("/rows")
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and etag.startswith('"')
+
+    cached = client.get("/rows", headers={"If-None-Match": f'"other", W/{etag}', "Accept-Encoding": "gzip"})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag and "content-encoding" not in cached.headers
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+def test_body_is_compressed_as_negotiated(encoding):
+    response = client.get("/rows", headers={"Accept-Encoding": f"{encoding}, identity;q=0.5"})
+    assert response.headers["content-encoding"] == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    # httpx decodes the body; Content-Length is the compressed size
+    assert response.json() == {"data": ROWS}
+    assert int(response.headers["content-length"]) < len(response.content)
+
+
+def test_gzip_when_br_is_refused():
+    response = client.get("/rows", headers={"Accept-Encoding": "br;q=0, gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert client.get("/rows", headers={"Accept-Encoding": "identity"}).headers.get("content-encoding") is None
+
+
+def test_small_body_passes_through():
+    response = client.get("/small", headers={"Accept-Encoding": "gzip, br"})
+    assert response.json() == {"ok": True}
+    assert "content-encoding" not in response.headers
+    assert response.headers["content-length"] == str(len(response.content))
+
+
+def test_streaming_body_drops_content_length():
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        raw = b"".join(response.iter_raw())
+    lines = gzip.decompress(raw).decode().splitlines()
+    assert lines[0] == '{"line": 0}' and len(lines) == 50
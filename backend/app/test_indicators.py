@@ -0,0 +1,59 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+from indicators import IndicatorConfig, IndicatorEngine, compute_indicators, ema, rolling_std, sma
+from live_bars import StraddleBarBuilder
+
+
+def bars(n=120, start=1736999100):
+    rng = np.random.default_rng(7)
+    close = 300 + np.cumsum(rng.normal(0, 1, n))
+    # Second half of the bars fall on the next IST session
+    timestamps = start + 60 * np.arange(n) + np.where(np.arange(n) >= n // 2, 86400, 0)
+    return timestamps, close + 1, close - 1, close, rng.integers(100, 1000, n).astype(float)
+
+
+def test_batch_matches_naive_windows():
+    _, _, _, close, _ = bars()
+    naive_sma = [close[i - 19:i + 1].mean() for i in range(19, len(close))]
+    naive_std = [close[i - 19:i + 1].std() for i in range(19, len(close))]
+    assert np.isnan(sma(close, 20)[:19]).all()
+    assert np.allclose(sma(close, 20)[19:], naive_sma)
+    assert np.allclose(rolling_std(close, 20)[19:], naive_std)
+
+    expected = [close[0]]
+    for value in close[1:]:
+        expected.append(expected[-1] + (value - expected[-1]) * 2 / 21)
+    assert np.allclose(ema(close, 20), expected)
+
+
+def test_incremental_updates_match_batch():
+    timestamps, high, low, close, volume = bars()
+    config = IndicatorConfig(sma_period=10, ema_period=5, bb_period=20, bb_std=2.0)
+    batch = compute_indicators(timestamps, high, low, close, volume, config)
+
+    engine = IndicatorEngine(config)
+    engine.seed(timestamps[:30], high[:30], low[:30], close[:30], volume[:30])
+    for i in range(30, len(close)):
+        # A forming bar revised a few times before the final values arrive
+        engine.update(int(timestamps[i]), high[i] - 0.5, low[i] + 0.5, close[i] - 0.3, volume[i] / 2)
+        live = engine.update(int(timestamps[i]), high[i], low[i], close[i], volume[i])
+        for name, values in batch.items():
+            assert np.isclose(live[name], values[i]), (name, i)
+
+
+def test_bar_builder_sums_legs_and_volume_deltas():
+    builder = StraddleBarBuilder("CE", "PE", interval=60)
+    assert builder.on_tick("CE", 100.0, 5000, 1737000000) is None
+    bar = builder.on_tick("PE", 90.0, 7000, 1737000010)
+    assert (bar["timestamp"], bar["open"], bar["volume"]) == (1737000000, 190.0, 0)
+
+    bar = builder.on_tick("CE", 104.0, 5300, 1737000030)
+    assert (bar["high"], bar["close"], bar["volume"]) == (194.0, 194.0, 300)
+
+    bar = builder.on_tick("PE", 85.0, 7100, 1737000065)
+    assert (bar["timestamp"], bar["open"], bar["volume"]) == (1737000060, 189.0, 100)
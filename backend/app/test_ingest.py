@@ -0,0 +1,98 @@
+import json
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+from ingest import TICK_FIELDS, IngestPipeline, PacketJSON, RawJSON, TickRing, normalize
+from tick_bench import MemoryRedis, SyntheticFeed
+
+
+def test_normalize_keeps_both_payload_shapes():
+    message = SyntheticFeed(symbols=4, seed=3).tick(as_json=False)
+    tick = normalize(json.dumps(message))
+    assert tick.symbol == message["symbol"] and tick.ltp == message["ltp"]
+    assert tick.ws_update()["timestamp"] == message["exch_feed_time"]
+    assert tick.ws_update()["change"] == message["ch"]
+    update = tick.market_update()
+    assert update["close"] == message["prev_close_price"] and update["bid_qty"] == message["bid_size"]
+    assert abs(update["timestamp"] / 1000 - message["exch_feed_time"]) < 5
+
+    # Each payload is built and encoded once, whichever sink asks first
+    assert tick.market_update() is update
+    assert tick.encoded("ws") is tick.encoded("ws")
+    assert json.loads(tick.encoded("ws")) == tick.ws_update()
+    assert set(tick.to_dict()) == set(TICK_FIELDS)
+
+    # Without ch/chp the change is worked out from the previous close
+    tick = normalize({"symbol": "NSE:X", "ltp": 110, "prev_close_price": 100})
+    assert (tick.change, tick.change_percent) == (10, 10)
+    assert normalize({"type": "cn"}) is None
+
+
+class Recorder:
+    def __init__(self):
+        self.messages = []
+
+    def record(self, message, source):
+        self.messages.append((message, source))
+
+
+def test_sinks_run_in_order_and_failures_are_isolated():
+    recorder, seen = Recorder(), []
+    pipeline = IngestPipeline(recorder=recorder)
+    pipeline.add_sink("first", lambda tick: seen.append(("first", tick.symbol)))
+    pipeline.add_sink("broken", lambda tick: 1 / 0)
+    pipeline.add_sink("last", lambda tick: seen.append(("last", tick.symbol)))
+
+    pipeline.on_message({"symbol": "NSE:X", "ltp": 1})
+    pipeline.on_message("not json")
+    pipeline.on_message({"type": "cn"})
+
+    assert seen == [("first", "NSE:X"), ("last", "NSE:X")]
+    assert len(recorder.messages) == 3
+    stats = pipeline.stats()
+    assert (stats["messages"], stats["ticks"], stats["invalid"], stats["skipped"]) == (3, 1, 1, 1)
+    assert stats["sinks"]["broken"]["errors"] == 1 and stats["sinks"]["last"]["calls"] == 1
+
+    pipeline.remove_sink("broken")
+    pipeline.on_message({"symbol": "NSE:Y", "ltp": 2})
+    assert pipeline.stats()["sinks"]["broken"]["calls"] == 1
+
+
+def test_ring_keeps_the_latest_ticks_per_symbol():
+    ring = TickRing(size=3)
+    for ltp in range(5):
+        ring(normalize({"symbol": "NSE:X", "ltp": ltp}))
+    assert [tick.ltp for tick in ring.recent("NSE:X")] == [2, 3, 4]
+    assert [tick.ltp for tick in ring.recent("NSE:X", 1)] == [4]
+    assert ring.recent("NSE:Y") == []
+
+
+def test_feed_client_without_a_pipeline_keeps_its_sinks():
+    from fyers_ws import FyersWebsocketClient
+
+    redis_client, updates = MemoryRedis(), []
+    client = FyersWebsocketClient(access_token="test", redis_client=redis_client, socketio=None)
+    client.set_callbacks(market_update_cb=updates.append)
+    client.on_message(json.dumps({"symbol": "NSE:X", "ltp": 5, "prev_close_price": 4}))
+    assert updates[0]["symbol"] == "NSE:X" and updates[0]["change"] == 1
+    assert json.loads(redis_client.data["market_update:NSE:X"])["ltp"] == 5
+
+    shared = IngestPipeline()
+    assert FyersWebsocketClient(access_token="test", redis_client=None, socketio=None,
+                                pipeline=shared).pipeline is shared
+
+
+def test_socketio_packets_reuse_the_cached_encoding():
+    from socketio import packet
+
+    tick = normalize(SyntheticFeed(4).tick(as_json=False))
+    event = packet.Packet(packet.EVENT, data=["market_update", RawJSON(tick.encoded("market_update"))])
+    event.json = PacketJSON
+    plain = packet.Packet(packet.EVENT, data=["market_update", tick.market_update()])
+
+    encoded = event.encode()
+    assert json.loads(encoded[1:]) == json.loads(plain.encode()[1:])
+    assert tick.encoded("market_update").decode() in encoded
+    assert PacketJSON.dumps({"a": 1}, separators=(',', ':')) == '{"a":1}'
@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+from market_hours import IST, format_ist, next_open
+
+
+def test_format_ist_matches_pandas():
+    # Spans an IST midnight, which falls at 18:30 UTC
+    timestamps = np.arange(1737048000, 1737048000 + 7200, 60)
+    expected = pd.to_datetime(timestamps, unit="s", utc=True).tz_convert("Asia/Kolkata")
+    assert format_ist(timestamps).tolist() == expected.strftime('%Y-%m-%d %H:%M').tolist()
+    assert format_ist(timestamps, unit='D').tolist() == expected.strftime('%Y-%m-%d').tolist()
+    assert format_ist([]).tolist() == []
+
+
+def test_next_open_skips_the_session_and_weekends():
+    friday_morning = IST.localize(datetime(2025, 1, 17, 8, 0))
+    assert next_open(friday_morning) == IST.localize(datetime(2025, 1, 17, 9, 15))
+    assert next_open(IST.localize(datetime(2025, 1, 17, 9, 15))) == IST.localize(datetime(2025, 1, 17, 9, 15))
+    assert next_open(IST.localize(datetime(2025, 1, 17, 10, 0))) == IST.localize(datetime(2025, 1, 20, 9, 15))
@@ -0,0 +1,74 @@
+import json
+import os
+import sys
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+from master_download import download_master, iter_master_entries
+
+
+def entry(ex_symbol, strike, expiry=1737021600):
+    return {"exSymbol": ex_symbol, "segment": 11, "exchange": 10, "expiryDate": str(expiry),
+            "strikePrice": strike, "exSymName": ex_symbol, "lotSize": 75, "symTicker": "x"}
+
+
+NSE = {
+    "NSE:NIFTY2511623000CE": entry("NIFTY", 23000.0),
+    "NSE:NIFTY2511623000PE": entry("NIFTY", 23000.0),
+    "NSE:RELIANCE25JAN1300CE": entry("RELIANCE", 1300.0),
+}
+BSE = {"BSE:SENSEX2511780000CE": entry("SENSEX", 80000.0), "BSE:TCS25JAN4000PE": entry("TCS", 4000.0)}
+
+
+@pytest.fixture
+def master_server(tmp_path):
+    root = tmp_path / "www"
+    root.mkdir()
+    (root / "NSE_FO.json").write_text(json.dumps(NSE, indent=1))
+    (root / "BSE_FO.json").write_text(json.dumps(BSE))
+    handler = partial(SimpleHTTPRequestHandler, directory=str(root))
+    handler.func.log_message = lambda *args: None
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    yield root, {"NSE_FO": f"{base}/NSE_FO.json", "BSE_FO": f"{base}/BSE_FO.json"}
+    server.shutdown()
+
+
+def test_parses_members_split_across_any_chunk_boundary():
+    document = json.dumps({**NSE, "NSE:NIFTY€": {"n": 12345}}, indent=2).encode()
+    for size in (1, 7, 64, len(document)):
+        chunks = (document[i:i + size] for i in range(0, len(document), size))
+        assert dict(iter_master_entries(chunks)) == json.loads(document)
+
+    with pytest.raises(ValueError):
+        list(iter_master_entries([document[:-40]]))
+
+
+def test_download_filters_and_skips_unchanged_upstream(master_server, tmp_path):
+    root, urls = master_server
+    output = tmp_path / "master_file.csv"
+
+    assert download_master(output, urls)
+    df = pd.read_csv(output)
+    assert df["symbol"].tolist() == ["NSE:NIFTY2511623000CE", "NSE:NIFTY2511623000PE", "BSE:SENSEX2511780000CE"]
+    assert df["expiryDate"].iloc[0] == "2025-01-16 10:00:00"
+
+    # Both exchanges answer 304
+    mtime = output.stat().st_mtime
+    assert not download_master(output, urls)
+    assert output.stat().st_mtime == mtime
+
+    # One exchange changed: the CSV is rebuilt with both
+    (root / "BSE_FO.json").write_text(json.dumps({**BSE, "BSE:BANKEX2511760000PE": entry("BANKEX", 60000.0)}))
+    later = (root / "BSE_FO.json").stat().st_mtime + 10
+    os.utime(root / "BSE_FO.json", (later, later))
+    assert download_master(output, urls)
+    assert len(pd.read_csv(output)) == 4
@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+from master_index import MasterIndex
+
+
+def write_master(path):
+    rows = []
+    # Strikes deliberately out of order, with a second expiry and a future row
+    for expiry in ("2025-01-16 10:00:00", "2025-01-23 10:00:00"):
+        for strike in (23500, 23300, 23400, 23200, 23600, 23100):
+            code = expiry[2:10].replace("-", "")
+            for option_type in ("CE", "PE"):
+                symbol = f"NSE:NIFTY{code}{strike}{option_type}"
+                rows.append([symbol, "NIFTY", 11, 10, expiry, float(strike), symbol[4:]])
+    rows.append(["NSE:NIFTY25JANFUT", "NIFTY", 11, 10, "2025-01-30 10:00:00", -1.0, "NIFTY25JANFUT"])
+    pd.DataFrame(rows, columns=["symbol", "exSymbol", "segment", "exchange", "expiryDate",
+                                "strikePrice", "exSymName"]).to_csv(path, index=False)
+
+
+def test_sorted_ladder_and_atm_window(tmp_path):
+    write_master(tmp_path / "master_file.csv")
+    index = MasterIndex(tmp_path / "master_file.csv")
+
+    assert index.expiries("NIFTY") == ["2025-01-16", "2025-01-23"]
+    # 2025-01-16 10:00:00 UTC in epoch seconds
+    assert index.expiry_timestamp("NIFTY", "2025-01-16") == 1737021600
+    assert index.ladder("NIFTY", "2025-01-16").tolist() == [23100, 23200, 23300, 23400, 23500, 23600]
+
+    expiry, window, atm = index.strike_window("NIFTY", 23340, "2025-01-16", width=1)
+    assert (expiry, window.tolist(), atm) == ("2025-01-16", [23200, 23300, 23400], 23300)
+
+    # Spot outside the ladder clamps to the edge
+    _, window, atm = index.strike_window("NIFTY", 30000, "2025-01-16", width=2)
+    assert (window.tolist(), atm) == ([23400, 23500, 23600], 23600)
+
+
+def test_legs_resolution(tmp_path):
+    write_master(tmp_path / "master_file.csv")
+    index = MasterIndex(tmp_path / "master_file.csv")
+
+    assert index.legs("NIFTY", 23400, "2025-01-23") == (
+        "2025-01-23", "NSE:NIFTY25012323400CE", "NSE:NIFTY25012323400PE"
+    )
+    assert index.legs("NIFTY", 23450) is None
+    assert index.legs("BANKNIFTY", 23400) is None
@@ -0,0 +1,102 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+import main
+from compute import ComputeExecutor
+from straddle_chain import FIELDS, align_candles, build_straddle_chain, time_axis, to_json_grid
+
+# 09:15 IST on 2025-01-16
+OPEN = 1736999100
+
+
+def candles(closes, start=OPEN):
+    return pd.DataFrame({
+        "timestamp": [start + 60 * i for i in range(len(closes))],
+        "open": closes, "high": closes, "low": closes, "close": closes,
+        "volume": [10] * len(closes),
+    })
+
+
+def test_time_axis_is_sorted_union():
+    axis = time_axis([candles([1, 2], OPEN + 60), candles([3, 4]), candles([])])
+    assert axis.tolist() == [OPEN, OPEN + 60, OPEN + 120]
+    assert axis.dtype == np.int64
+    assert time_axis([candles([])]).tolist() == []
+
+
+def test_align_candles_leaves_nan_where_missing():
+    axis = np.array([OPEN, OPEN + 60, OPEN + 120])
+    aligned = align_candles([candles([5.0], OPEN + 60), candles([])], axis)
+    assert aligned.shape == (2, 3, len(FIELDS))
+    close = aligned[:, :, FIELDS.index("close")]
+    assert np.isnan(close[0, [0, 2]]).all() and close[0, 1] == 5.0
+    assert np.isnan(close[1]).all()
+
+
+def test_chain_sums_legs_on_misaligned_timestamps():
+    ce = [candles([120.0, 110.0, 100.0]), candles([60.0, 55.0])]
+    pe = [candles([90.0, 80.0], OPEN + 60), candles([130.0, 140.0])]
+    chain = build_straddle_chain(ce, pe)
+    assert chain["timestamps"].tolist() == [OPEN, OPEN + 60, OPEN + 120]
+    assert chain["straddle"]["close"].shape == (2, 3)
+
+    grid = to_json_grid(chain["straddle"]["close"])
+    assert grid == [[None, 200.0, 180.0], [190.0, 195.0, None]]
+    assert to_json_grid(chain["ce_close"]) == [[120.0, 110.0, 100.0], [60.0, 55.0, None]]
+    assert to_json_grid(chain["straddle"]["volume"])[0] == [None, 20.0, 20.0]
+
+
+@pytest.fixture
+def chain_client(monkeypatch):
+    strikes = np.array([23000.0, 23050.0, 23100.0])
+    legs = {f"NSE:NIFTY{int(strike)}{kind}": frame for strike, kind, frame in [
+        (23000, "CE", candles([120.0, 110.0, 100.0])), (23000, "PE", candles([90.0, 80.0], OPEN + 60)),
+        (23050, "CE", candles([100.0, 95.0, 90.0])), (23050, "PE", candles([100.0, 105.0, 110.0])),
+    ]}
+    monkeypatch.setattr(main.master_index, "nearest_expiry", lambda index: "2025-01-23")
+    monkeypatch.setattr(main.master_index, "ladder", lambda index, expiry: strikes)
+    monkeypatch.setattr(main.master_index, "chain_legs", lambda index, expiry, chosen: (
+        np.array([f"NSE:NIFTY{int(s)}CE" for s in chosen]), np.array([f"NSE:NIFTY{int(s)}PE" for s in chosen])
+    ))
+    monkeypatch.setattr(main, "get_cached_candles", lambda symbol, days_back, resolution: legs[symbol])
+    monkeypatch.setattr(main, "compute", ComputeExecutor(workers=0))
+    return TestClient(main.app)
+
+
+def test_chain_endpoint_returns_ce_plus_pe_grid(chain_client):
+    response = chain_client.get("/straddle_chain/NIFTY", params={"strike_from": 23000, "strike_to": 23050})
+    assert response.status_code == 200
+    chain = response.json()
+    assert chain["strikes"] == [23000.0, 23050.0]
+    assert chain["timestamps"] == [OPEN, OPEN + 60, OPEN + 120]
+    assert chain["dates"][0] == "2025-01-16 09:15"
+    assert chain["straddle"]["close"] == [[None, 200.0, 180.0], [200.0, 200.0, 200.0]]
+    assert all(len(row) == 3 for field in chain["straddle"].values() for row in field)
+    assert chain["pe_close"][0] == [None, 90.0, 80.0]
+
+
+def test_chain_endpoint_needs_both_range_bounds(chain_client):
+    for params in ({"strike_from": 23000}, {"strike_to": 23050}):
+        response = chain_client.get("/straddle_chain/NIFTY", params=params)
+        assert response.status_code == 400
+    assert chain_client.get("/straddle_chain/NIFTY",
+                            params={"strike_from": 24000, "strike_to": 24100}).status_code == 404
+
+
+def test_chain_etag_follows_the_whole_last_bar(chain_client):
+    params = {"strike_from": 23000, "strike_to": 23000}
+    first = chain_client.get("/straddle_chain/NIFTY", params=params)
+    assert chain_client.get("/straddle_chain/NIFTY", params=params,
+                            headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+
+    # Same close, more volume on the forming bar of one leg
+    main.get_cached_candles("NSE:NIFTY23000PE", 10, "1").loc[1, "volume"] = 500
+    second = chain_client.get("/straddle_chain/NIFTY", params=params, headers={"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 200 and second.headers["etag"] != first.headers["etag"]
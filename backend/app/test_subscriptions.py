@@ -0,0 +1,89 @@
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+from subscriptions import SubscriptionLimitError, SubscriptionManager
+
+
+class FakeFeed:
+    def __init__(self):
+        self.live = set()
+
+    def subscribe(self, symbols):
+        self.live.update(symbols)
+
+    def unsubscribe(self, symbols):
+        self.live.difference_update(symbols)
+
+
+def manager(**kwargs):
+    feed = FakeFeed()
+    return feed, SubscriptionManager(feed.subscribe, feed.unsubscribe, **kwargs)
+
+
+def test_symbols_are_released_after_the_last_holder_and_grace():
+    feed, subs = manager(grace=60, pinned=["NSE:NIFTY50-INDEX"])
+    assert subs.acquire("a", ["CE1", "PE1", "NSE:NIFTY50-INDEX"]) == ["CE1", "PE1"]
+    assert subs.acquire("b", ["CE1"]) == []
+
+    subs.release("a")
+    assert subs.sweep(now=1e12) == ["PE1"]
+    assert feed.live == {"CE1"}
+
+    subs.release("b", ["CE1"])
+    # Still inside the grace period: coming back costs nothing
+    assert subs.sweep() == []
+    assert subs.acquire("c", ["CE1"]) == []
+    subs.release("c")
+    assert subs.sweep(now=1e12) == ["CE1"]
+    assert feed.live == set()
+    assert subs.symbols() == ["NSE:NIFTY50-INDEX"]
+
+
+def test_idle_symbols_are_evicted_oldest_first_near_the_cap():
+    feed, subs = manager(max_symbols=10, headroom=0.8, grace=3600)
+    subs.acquire("a", ["A1", "A2", "A3"])
+    subs.acquire("b", ["B1", "B2", "B3"])
+    subs.release("a")
+    subs.release("b", ["B1"])
+
+    # 6 live + 3 new crosses the soft limit of 8: the oldest idle symbol goes
+    subs.acquire("c", ["C1", "C2", "C3"])
+    assert feed.live == {"A2", "A3", "B1", "B2", "B3", "C1", "C2", "C3"}
+    assert subs.stats()["evicted"] == 1
+
+    # Held symbols are never evicted, the hard cap refuses the request whole
+    subs.acquire("d", ["A2", "A3", "B1"])
+    with pytest.raises(SubscriptionLimitError):
+        subs.acquire("e", ["E1", "E2", "E3"])
+    assert "E1" not in feed.live
+
+
+def test_broker_calls_run_outside_the_lock_in_order():
+    calls = []
+    entered, release = threading.Event(), threading.Event()
+
+    def slow_subscribe(symbols):
+        entered.set()
+        release.wait(2)
+        calls.append(("sub", symbols))
+
+    subs = SubscriptionManager(slow_subscribe, lambda symbols: calls.append(("unsub", symbols)), grace=0)
+    worker = threading.Thread(target=subs.acquire, args=("a", ["CE1"]))
+    worker.start()
+    entered.wait(2)
+    # Bookkeeping goes on while the broker call is in flight
+    subs.release("a")
+    assert subs.stats()["idle"] == 1
+    # Dropped while the subscribe is in flight: the unsubscribe still goes second
+    sweeper = threading.Thread(target=subs.sweep, args=(1e12,))
+    sweeper.start()
+    release.set()
+    worker.join()
+    sweeper.join()
+    assert subs.symbols() == []
+    assert calls == [("sub", ["CE1"]), ("unsub", ["CE1"])]
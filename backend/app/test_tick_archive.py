@@ -0,0 +1,77 @@
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+from ingest import normalize
+from market_hours import IST
+from tick_archive import TickArchive, underlying_of
+
+# 2025-01-16 10:00 IST
+T0 = 1737001800
+
+
+def tick(symbol, ltp, timestamp):
+    return normalize({"symbol": symbol, "ltp": ltp, "exch_feed_time": timestamp})
+
+
+def test_underlying_prefers_aliases_and_longest_prefix():
+    assert underlying_of("NSE:BANKNIFTY25JAN50000CE") == "BANKNIFTY"
+    assert underlying_of("NSE:NIFTY2511623000PE") == "NIFTY"
+    assert underlying_of("NSE:NIFTYBANK-INDEX", {"NSE:NIFTYBANK-INDEX": "BANKNIFTY"}) == "BANKNIFTY"
+    assert underlying_of("NSE:RELIANCE-EQ") == "OTHER"
+
+
+def test_segments_compact_into_sorted_partitions(tmp_path):
+    archive = TickArchive(tmp_path, workers=2, symbols_per_part=1, row_group_rows=2)
+    for i in range(3):
+        archive(tick("NSE:NIFTY2511623000CE", 100 + i, T0 + 10 - i))
+        archive(tick("NSE:BANKNIFTY25JAN50000PE", 200 + i, T0 + i))
+    assert archive.flush() == 6
+    # A later segment, and a tick of the next day
+    archive(tick("NSE:NIFTY2511623000PE", 50, T0 + 5))
+    archive(tick("NSE:NIFTY2511623000CE", 99, T0 + 86400))
+    archive.flush()
+    assert archive.segment_days() == ["2025-01-16", "2025-01-17"]
+
+    # Readable before compaction
+    assert archive.read("NSE:NIFTY2511623000CE", "2025-01-16")["ltp"].to_pylist() == [102, 101, 100]
+
+    assert archive.due_days(IST.localize(datetime(2025, 1, 16, 15, 40))) == []
+    assert archive.due_days(IST.localize(datetime(2025, 1, 17, 9, 0))) == ["2025-01-16"]
+    result = archive.compact("2025-01-16")
+    assert (result["rows"], result["parts"]) == (7, 3)
+    assert archive.days() == ["2025-01-16"] and archive.segment_days() == ["2025-01-17"]
+
+    nifty = sorted((tmp_path / "date=2025-01-16" / "underlying=NIFTY").glob("*.parquet"))
+    assert len(nifty) == 2
+    metadata = pq.ParquetFile(nifty[0]).metadata
+    assert metadata.num_row_groups == 2 and metadata.row_group(0).column(0).statistics.has_min_max
+    assert "underlying" not in pq.read_schema(nifty[0]).names
+
+    # Late ticks merge into the compacted day
+    archive(tick("NSE:NIFTY2511623000CE", 98, T0 + 20))
+    archive.flush()
+    archive.compact("2025-01-16")
+    ticks = archive.read("NSE:NIFTY2511623000CE", "2025-01-16")
+    assert ticks["timestamp"].to_pylist() == [T0 + 8, T0 + 9, T0 + 10, T0 + 20]
+    assert archive.latest("NSE:NIFTY2511623000CE")["ltp"] == 99
+
+
+def test_latest_after_restart_reads_only_the_newest_day(tmp_path):
+    archive = TickArchive(tmp_path)
+    archive(tick("NSE:NIFTY2511623000PE", 40, T0))
+    archive(tick("NSE:NIFTY2511623000CE", 97, T0 + 86400))
+    archive(tick("NSE:NIFTY2511623000CE", 99, T0 + 86460))
+    archive.flush()
+    assert archive.latest("NSE:NIFTY2511623000PE")["ltp"] == 40
+
+    restarted = TickArchive(tmp_path)
+    assert restarted.latest("NSE:NIFTY2511623000CE")["ltp"] == 99
+    assert restarted.latest("NSE:NIFTY2511623000PE") is None
+    restarted(tick("NSE:NIFTY2511623000PE", 41, T0 + 86500))
+    restarted.flush()
+    assert restarted.latest("NSE:NIFTY2511623000PE")["ltp"] == 41
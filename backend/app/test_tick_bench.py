@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+from tick_bench import SyntheticFeed, compare_to_baseline, run_target
+
+
+def test_feed_is_fyers_shaped_and_deterministic():
+    ticks = SyntheticFeed(symbols=10, seed=1).ticks(50, as_json=False)
+    assert ticks == SyntheticFeed(symbols=10, seed=1).ticks(50, as_json=False)
+    assert {tick["symbol"] for tick in ticks} <= set(SyntheticFeed(symbols=10).symbols)
+    assert {"ltp", "vol_traded_today", "prev_close_price", "bid_price"} <= set(ticks[0])
+
+
+def test_run_reports_stages_and_flags_regressions():
+    result = run_target("fyers_ws", symbols=10, ticks=200, alloc_ticks=20)
+    assert result["ticks_per_sec"] > 0
+    assert {"total", "redis_set", "emit", "callback"} <= set(result["stages"])
+    assert result["alloc_bytes_per_tick"]["mean"] > 0
+
+    assert compare_to_baseline(result, result) == []
+    faster = {**result, "capacity_ticks_per_sec": result["capacity_ticks_per_sec"] * 2,
+              "stages": {"total": {"p50_us": result["stages"]["total"]["p50_us"] / 10}}}
+    regressions = compare_to_baseline(result, faster)
+    assert any(r.startswith("capacity") for r in regressions)
+    assert any(r.startswith("total p50_us") for r in regressions)
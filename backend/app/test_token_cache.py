@@ -0,0 +1,97 @@
+import base64
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+import Fyers_login
+
+
+def make_token(exp):
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).decode().rstrip("=")
+    return f"header.{payload}.signature"
+
+
+def test_decode_token_expiry():
+    assert Fyers_login.decode_token_expiry(make_token(1737160223)) == 1737160223
+    assert Fyers_login.decode_token_expiry("not-a-jwt") is None
+
+
+def test_is_token_valid_without_network(monkeypatch):
+    def no_network(*args, **kwargs):
+        raise AssertionError("token validation should not hit the network")
+
+    monkeypatch.setattr(Fyers_login.fyersModel, "FyersModel", no_network)
+
+    Fyers_login._set_cached_token(make_token(int(time.time()) + 3600))
+    assert Fyers_login.is_token_valid()
+    assert 3500 < Fyers_login.token_expires_in() <= 3600
+
+    Fyers_login._set_cached_token(make_token(int(time.time()) - 10))
+    assert not Fyers_login.is_token_valid()
+    assert Fyers_login.token_expires_in() == 0
+
+
+def test_refresh_notifies_listeners(monkeypatch):
+    new_token = make_token(int(time.time()) + 7200)
+    received = []
+
+    def fake_get_access_token():
+        Fyers_login._set_cached_token(new_token)
+        return new_token
+
+    monkeypatch.setattr(Fyers_login, "get_access_token", fake_get_access_token)
+    monkeypatch.setattr(Fyers_login, "_token_listeners", [received.append])
+
+    assert Fyers_login.refresh_access_token() == new_token
+    assert received == [new_token]
+    assert Fyers_login.is_token_valid()
+
+
+def test_undecodable_token_refreshes_on_fixed_interval(monkeypatch):
+    delays = []
+
+    class FakeTimer:
+        def __init__(self, delay, fn):
+            delays.append(delay)
+
+        def start(self):
+            pass
+
+        def cancel(self):
+            pass
+
+    monkeypatch.setattr(Fyers_login.threading, "Timer", FakeTimer)
+    Fyers_login._set_cached_token("not-a-jwt")
+    Fyers_login.schedule_token_refresh()
+    Fyers_login._set_cached_token(make_token(int(time.time()) + 3600))
+    Fyers_login.schedule_token_refresh()
+    Fyers_login.cancel_token_refresh()
+
+    assert delays[0] == Fyers_login.TOKEN_REFRESH_FALLBACK
+    assert 3600 - Fyers_login.TOKEN_REFRESH_LEAD - 5 < delays[1] <= 3600 - Fyers_login.TOKEN_REFRESH_LEAD
+
+
+def test_concurrent_refreshes_log_in_once(monkeypatch):
+    release = threading.Event()
+    logins = []
+
+    def slow_get_access_token():
+        logins.append(1)
+        release.wait(2)
+        return make_token(int(time.time()) + 7200)
+
+    monkeypatch.setattr(Fyers_login, "get_access_token", slow_get_access_token)
+    monkeypatch.setattr(Fyers_login, "_token_listeners", [])
+
+    first = threading.Thread(target=Fyers_login.refresh_access_token)
+    first.start()
+    time.sleep(0.05)
+    assert Fyers_login.token_refresh_running()
+    assert Fyers_login.refresh_access_token() is None
+    release.set()
+    first.join()
+    assert len(logins) == 1 and not Fyers_login.token_refresh_running()
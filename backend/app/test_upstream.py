@@ -0,0 +1,95 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+from upstream import UpstreamScheduler, INTERACTIVE, BACKGROUND, is_throttled
+
+
+def test_rate_limit_and_priority_order():
+    scheduler = UpstreamScheduler({"history": (20.0, 1)})
+    order = []
+
+    # Drain the single burst token so every following call has to queue
+    scheduler.call("history", lambda: None)
+
+    def run(name, priority):
+        scheduler.call("history", order.append, name, priority=priority)
+
+    threads = [threading.Thread(target=run, args=(f"bg{i}", BACKGROUND)) for i in range(3)]
+    threads += [threading.Thread(target=run, args=(f"ui{i}", INTERACTIVE)) for i in range(3)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+        time.sleep(0.005)
+    for thread in threads:
+        thread.join()
+
+    assert time.monotonic() - start >= 5 / 20
+    assert order[-2:] == ["bg1", "bg2"]
+    assert scheduler.stats()["history"]["requests"] == 7
+
+
+def test_identical_calls_are_coalesced():
+    scheduler = UpstreamScheduler({"quotes": (100.0, 10)})
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"s": "ok"}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(scheduler.call("quotes", fetch, key="NIFTY")))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{"s": "ok"}] * 5
+    assert scheduler.stats()["quotes"]["coalesced"] == 4
+
+
+def test_throttled_response_is_retried():
+    scheduler = UpstreamScheduler({"history": (100.0, 10)}, throttle_pause=0.01)
+    responses = iter([{"s": "error", "code": 429, "message": "request limit reached"}, {"s": "ok"}])
+
+    assert scheduler.call("history", lambda: next(responses)) == {"s": "ok"}
+    assert scheduler.stats()["history"]["throttled"] == 1
+
+
+def test_lane_rate_caps_background_only():
+    scheduler = UpstreamScheduler({"history": (1000.0, 100)})
+    scheduler.set_lane_rate(BACKGROUND, 20.0)
+
+    start = time.monotonic()
+    for _ in range(4):
+        scheduler.call("history", lambda: None, priority=BACKGROUND)
+    assert time.monotonic() - start >= 3 / 20
+
+    start = time.monotonic()
+    for _ in range(4):
+        scheduler.call("history", lambda: None)
+    assert time.monotonic() - start < 0.05
+
+    scheduler.set_lane_rate(BACKGROUND, None)
+    start = time.monotonic()
+    for _ in range(4):
+        scheduler.call("history", lambda: None, priority=BACKGROUND)
+    assert time.monotonic() - start < 0.05
+
+
+def test_only_rate_limit_errors_count_as_throttled():
+    assert is_throttled({"s": "error", "code": 429, "message": ""})
+    assert is_throttled({"s": "error", "code": -429, "message": "Request Limit Reached"})
+    assert is_throttled({"s": "error", "code": -1, "message": "Too many requests, try later"})
+    # Other errors that happen to mention a limit are not retried
+    assert not is_throttled({"s": "error", "code": -300, "message": "Invalid limit price"})
+    assert not is_throttled({"s": "error", "code": -50, "message": "Date range exceeds the allowed limit"})
+    assert not is_throttled({"s": "ok", "code": 200, "message": "rate limit exceeded"})
@@ -0,0 +1,64 @@
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+from market_hours import IST
+from upstream import BACKGROUND, UpstreamScheduler
+from warmup import WarmupScheduler
+
+
+class RecordingScheduler(UpstreamScheduler):
+    def __init__(self):
+        super().__init__({})
+        self.lane_rates = []
+
+    def set_lane_rate(self, priority, rate):
+        self.lane_rates.append((priority, rate))
+
+
+def at(day, hour, minute=0):
+    return IST.localize(datetime(2025, 1, day, hour, minute))
+
+
+def test_runs_once_per_trading_day_from_the_lead():
+    ran = []
+    warmup = WarmupScheduler([("a", lambda context: ran.append("a"))], lead=20 * 60,
+                             scheduler=RecordingScheduler())
+
+    assert not warmup.tick(at(17, 8, 50))
+    assert warmup.next_run(at(17, 8, 50)) == at(17, 8, 55)
+    assert warmup.tick(at(17, 8, 55))
+    assert not warmup.tick(at(17, 11))
+    # Friday's session is done, the next warmup is Monday's
+    assert warmup.next_run(at(17, 11)) == at(20, 8, 55)
+    assert not warmup.tick(at(18, 9))
+    # Started late: warms up straight away
+    assert warmup.tick(at(20, 14))
+    assert ran == ["a", "a"]
+
+
+def test_failing_step_does_not_stop_the_rest():
+    def context_user(context):
+        assert context["symbols"] == ["NSE:NIFTY50-INDEX"]
+
+    def broken(context):
+        raise RuntimeError("master download failed")
+
+    warmup = WarmupScheduler([("symbols", lambda context: context.update(symbols=["NSE:NIFTY50-INDEX"])),
+                              ("master", broken), ("use", context_user)], scheduler=RecordingScheduler())
+    result = warmup.run_once(at(17, 9))
+    assert [step["ok"] for step in result["steps"].values()] == [True, False, True]
+    assert result["steps"]["master"]["error"] == "master download failed"
+    assert result["symbols"] == 1
+
+
+def test_background_is_capped_off_hours_only():
+    scheduler = RecordingScheduler()
+    warmup = WarmupScheduler([], offhours_rate=0.5, scheduler=scheduler)
+    warmup.tick(at(17, 7))
+    warmup.tick(at(17, 7, 30))
+    warmup.tick(at(17, 9))
+    warmup.tick(at(17, 16))
+    assert scheduler.lane_rates == [(BACKGROUND, 0.5), (BACKGROUND, None), (BACKGROUND, 0.5)]
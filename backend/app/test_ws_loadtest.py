@@ -0,0 +1,62 @@
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to Python path for imports
+sys.path.append(str(Path(__file__).parent))
+from tick_bench import SyntheticFeed
+from ws_loadtest import ClientStats, client_symbols, parse_mix, summarize
+
+
+def client(transport, latencies, connected=True, profile="ladder", symbols=None, ignored=0):
+    stats = ClientStats(transport, late_ms=250, profile=profile, symbols=symbols)
+    for latency in latencies:
+        stats.record(latency)
+    return {"transport": transport, "profile": profile, "symbols": symbols, "received": stats.received,
+            "ignored": ignored, "late": stats.late, "connected": connected,
+            "error": None if connected else "refused", "histogram": stats.histogram.tolist()}
+
+
+def test_summary_counts_drops_late_and_percentiles():
+    clients = [client("ws", [1.0] * 98 + [400.0, 900.0]), client("ws", [2.0] * 90),
+               client("socketio", [5.0] * 100), client("socketio", [], connected=False)]
+    report = summarize(clients, {"A": 60, "B": 40})
+
+    assert report["ws"]["expected_messages"] == 200
+    assert report["ws"]["dropped"] == 10
+    assert report["ws"]["late"] == 2
+    assert 1.0 <= report["ws"]["latency_ms"]["p50"] < 2.5
+    assert report["ws"]["latency_ms"]["p99.9"] >= 400
+
+    # Clients that never connected are reported, not counted as drops
+    assert report["socketio"]["connected"] == 1
+    assert report["socketio"]["dropped"] == 0
+    assert report["socketio"]["connect_errors"] == ["refused"]
+
+
+def test_profiles_expect_only_their_own_symbols():
+    clients = [client("ws", [1.0] * 60, profile="index", symbols=["A"], ignored=40),
+               client("ws", [1.0] * 95, profile="ladder", symbols=["A", "B"])]
+    report = summarize(clients, {"A": 60, "B": 40})
+    assert report["ws"]["profiles"]["index"]["expected_messages"] == 60
+    assert report["ws"]["profiles"]["index"]["ignored_messages"] == 40
+    assert report["ws"]["profiles"]["ladder"]["dropped"] == 5
+    assert report["ws"]["dropped"] == 5
+
+
+def test_profile_symbol_sets_and_mix():
+    symbols = SyntheticFeed(12).symbols
+    rng = random.Random(0)
+    assert client_symbols("index", symbols, rng) == ["NSE:NIFTY50-INDEX", "NSE:NIFTYBANK-INDEX"]
+    ce, pe = client_symbols("atm", symbols, rng)
+    assert ce.endswith("CE") and pe == ce[:-2] + "PE"
+    assert len(client_symbols("ladder", symbols, rng)) == 10
+
+    stats = ClientStats("ws", 250, "atm", [ce, pe])
+    assert stats.wants(ce) and not stats.wants("NSE:NIFTY50-INDEX") and stats.ignored == 1
+
+    assert parse_mix("index=0.5, atm=0.5") == {"index": 0.5, "atm": 0.5}
+    with pytest.raises(ValueError):
+        parse_mix("everything=1")
@@ -0,0 +1,299 @@
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from compute import spawn_pool
+from ingest import Tick
+from market_hours import IST, MARKET_CLOSE, format_ist, now_ist
+from master_download import UNDERLYINGS
+
+logger = logging.getLogger(__name__)
+
+TICK_SCHEMA = pa.schema([
+    ("symbol", pa.string()),
+    ("underlying", pa.string()),
+    ("timestamp", pa.int64()),
+    ("received_ms", pa.int64()),
+    ("ltp", pa.float64()),
+    ("open", pa.float64()),
+    ("high", pa.float64()),
+    ("low", pa.float64()),
+    ("prev_close", pa.float64()),
+    ("volume", pa.int64()),
+    ("bid", pa.float64()),
+    ("ask", pa.float64()),
+    ("bid_qty", pa.int64()),
+    ("ask_qty", pa.int64()),
+    ("change", pa.float64()),
+    ("change_percent", pa.float64()),
+])
+# Tick attribute of every column but the derived underlying
+_TICK_COLUMNS = [name for name in TICK_SCHEMA.names if name != "underlying"]
+SORT_KEYS = [("symbol", "ascending"), ("timestamp", "ascending"), ("received_ms", "ascending")]
+# Underlying is the hive partition key in compacted days, not a column
+PARTITIONING = ds.partitioning(pa.schema([("underlying", pa.string())]), flavor="hive")
+
+def underlying_of(symbol: str, aliases: Optional[Dict[str, str]] = None) -> str:
+    """Underlying of a Fyers symbol: the alias if given, else its longest known name prefix"""
+    if aliases and symbol in aliases:
+        return aliases[symbol]
+    name = symbol.split(':', 1)[-1]
+    for underlying in sorted(UNDERLYINGS, key=len, reverse=True):
+        if name.startswith(underlying):
+            return underlying
+    return "OTHER"
+
+def _compact_part(files: List[str], day_dir: Optional[str], underlying: str, symbols: List[str],
+                  output: str, row_group_rows: int) -> int:
+    """Process pool task: one sorted part file of a day's underlying partition"""
+    sources = [ds.dataset(files, schema=TICK_SCHEMA, format="parquet")]
+    if day_dir:
+        sources.append(ds.dataset(day_dir, schema=TICK_SCHEMA, format="parquet", partitioning=PARTITIONING))
+    table = ds.dataset(sources).to_table(
+        filter=(pc.field("underlying") == underlying) & pc.field("symbol").isin(symbols)
+    )
+    table = table.drop_columns(["underlying"]).sort_by(SORT_KEYS)
+    Path(output).parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(table, output, row_group_size=row_group_rows, compression="zstd", write_statistics=True)
+    return table.num_rows
+
+class TickArchive:
+    """
+    Append-only Parquet archive of every tick.
+
+    During the session ticks are buffered in memory and a writer thread
+    flushes them every `flush_interval` seconds as a small single row
+    group segment under `root/_segments/date=<day>/`, so nothing is ever
+    rewritten. After the close the day's segments are compacted into
+    `root/date=<day>/underlying=<name>/part-<n>.parquet`, sorted by
+    symbol and time, with column statistics so readers can skip row
+    groups. Compaction is spread over a process pool by symbol chunks and
+    only replaces the day once every part is written.
+    """
+
+    def __init__(self, root: Path, flush_interval: float = 5, max_pending: int = 500_000,
+                 aliases: Optional[Dict[str, str]] = None, workers: Optional[int] = None,
+                 symbols_per_part: int = 64, row_group_rows: int = 64_000, compact_after: float = 15 * 60):
+        self.root = Path(root)
+        self.flush_interval = flush_interval
+        self.aliases = dict(aliases or {})
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.symbols_per_part = symbols_per_part
+        self.row_group_rows = row_group_rows
+        # Seconds after the close before the day is compacted
+        self.compact_after = compact_after
+        self._pending: Deque[Tick] = deque(maxlen=max_pending)
+        self._stats = {"archived": 0, "dropped": 0, "segments": 0, "compacted_days": 0}
+        self._last_compaction: Dict[str, Any] = {}
+        self._seq = 0
+        # Last archived tick of each symbol, seeded from the newest day on first lookup
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        self._latest_loaded = False
+        self._write_lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __call__(self, tick: Tick):
+        """Ingest sink: buffer a tick for the next segment"""
+        pending = self._pending
+        if len(pending) == pending.maxlen:
+            self._stats["dropped"] += 1
+        pending.append(tick)
+
+    def segment_dir(self, day: str) -> Path:
+        return self.root / "_segments" / f"date={day}"
+
+    def day_dir(self, day: str) -> Path:
+        return self.root / f"date={day}"
+
+    def flush(self) -> int:
+        """Write everything buffered as one segment per IST day, returns the rows written"""
+        with self._write_lock:
+            pending = self._pending
+            batch = [pending.popleft() for _ in range(len(pending))]
+            if not batch:
+                return 0
+            columns = {name: [getattr(tick, name) for tick in batch] for name in _TICK_COLUMNS}
+            columns["timestamp"] = np.asarray(columns["timestamp"], dtype=np.int64)
+            underlyings: Dict[str, str] = {}
+            columns["underlying"] = [
+                underlyings.get(symbol) or underlyings.setdefault(symbol, underlying_of(symbol, self.aliases))
+                for symbol in columns["symbol"]
+            ]
+            table = pa.table({name: columns[name] for name in TICK_SCHEMA.names}, schema=TICK_SCHEMA)
+            last = {symbol: i for i, symbol in enumerate(columns["symbol"])}
+            for row in table.take(list(last.values())).to_pylist():
+                # Late ticks of an earlier day do not replace a newer one
+                cached = self._latest.get(row["symbol"])
+                if cached is None or cached["timestamp"] <= row["timestamp"]:
+                    self._latest[row["symbol"]] = row
+            days = format_ist(columns["timestamp"], unit='D')
+            for day in np.unique(days):
+                part = table if len(days) == 1 or (days == day).all() else table.filter(pa.array(days == day))
+                directory = self.segment_dir(str(day))
+                directory.mkdir(parents=True, exist_ok=True)
+                self._seq += 1
+                path = directory / f"{time.time_ns()}-{self._seq}.parquet"
+                tmp_path = path.with_suffix(".tmp")
+                pq.write_table(part, tmp_path, compression="zstd")
+                os.replace(tmp_path, path)
+                self._stats["segments"] += 1
+            self._stats["archived"] += len(batch)
+            return len(batch)
+
+    def segment_days(self) -> List[str]:
+        """Days with segments not compacted yet"""
+        base = self.root / "_segments"
+        if not base.exists():
+            return []
+        return sorted(path.name.split("=", 1)[1] for path in base.glob("date=*") if any(path.glob("*.parquet")))
+
+    def days(self) -> List[str]:
+        """Compacted days"""
+        return sorted(path.name.split("=", 1)[1] for path in self.root.glob("date=*")
+                      if path.is_dir() and "." not in path.name)
+
+    def compact(self, day: str) -> Dict[str, Any]:
+        """Merge a day's segments (and anything compacted before) into its partitioned files"""
+        with self._compact_lock:
+            started = time.monotonic()
+            files = sorted(str(path) for path in self.segment_dir(day).glob("*.parquet"))
+            if not files:
+                return {"day": day, "rows": 0, "parts": 0}
+            day_dir = self.day_dir(day)
+            previous = str(day_dir) if day_dir.exists() else None
+            sources = [ds.dataset(files, schema=TICK_SCHEMA, format="parquet")]
+            if previous:
+                sources.append(ds.dataset(previous, schema=TICK_SCHEMA, format="parquet", partitioning=PARTITIONING))
+            keys = ds.dataset(sources).to_table(columns=["underlying", "symbol"]).group_by(
+                ["underlying", "symbol"]).aggregate([])
+
+            tmp_dir = self.root / f"date={day}.compacting"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            tasks = []
+            for underlying in sorted(set(keys["underlying"].to_pylist())):
+                symbols = sorted(keys.filter(pc.field("underlying") == underlying)["symbol"].to_pylist())
+                for n, start in enumerate(range(0, len(symbols), self.symbols_per_part)):
+                    output = tmp_dir / f"underlying={underlying}" / f"part-{n}.parquet"
+                    tasks.append((files, previous, underlying, symbols[start:start + self.symbols_per_part],
+                                  str(output), self.row_group_rows))
+
+            with spawn_pool(min(self.workers, len(tasks))) as pool:
+                rows = sum(pool.map(_compact_part, *zip(*tasks)))
+
+            # Swap the day in, then drop the inputs; segments flushed meanwhile stay for next time
+            if previous:
+                old_dir = self.root / f"date={day}.old"
+                shutil.rmtree(old_dir, ignore_errors=True)
+                os.replace(day_dir, old_dir)
+                os.replace(tmp_dir, day_dir)
+                shutil.rmtree(old_dir, ignore_errors=True)
+            else:
+                os.replace(tmp_dir, day_dir)
+            for path in files:
+                os.remove(path)
+            self._stats["compacted_days"] += 1
+            self._last_compaction = {"day": day, "rows": rows, "parts": len(tasks),
+                                     "seconds": round(time.monotonic() - started, 3)}
+            logger.info(f"Compacted ticks of {day}: {self._last_compaction}")
+            return self._last_compaction
+
+    def due_days(self, when: Optional[datetime] = None) -> List[str]:
+        """Segment days ready for compaction: earlier days, and today once the session is over"""
+        when = (when or now_ist()).astimezone(IST)
+        today = when.date().isoformat()
+        close = IST.localize(datetime.combine(when.date(), MARKET_CLOSE)) + timedelta(seconds=self.compact_after)
+        return [day for day in self.segment_days() if day < today or (day == today and when >= close)]
+
+    def compact_due(self, when: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        results = []
+        for day in self.due_days(when):
+            try:
+                results.append(self.compact(day))
+            except Exception as e:
+                logger.error(f"Tick compaction of {day} failed: {str(e)}")
+        return results
+
+    def _day_dataset(self, day: str) -> Optional[ds.Dataset]:
+        """A day's compacted files and segments as one dataset, None if it has neither"""
+        sources = []
+        if self.day_dir(day).exists():
+            sources.append(ds.dataset(self.day_dir(day), schema=TICK_SCHEMA, format="parquet",
+                                      partitioning=PARTITIONING))
+        files = sorted(str(path) for path in self.segment_dir(day).glob("*.parquet"))
+        if files:
+            sources.append(ds.dataset(files, schema=TICK_SCHEMA, format="parquet"))
+        return ds.dataset(sources) if sources else None
+
+    def read(self, symbol: str, day: str) -> pa.Table:
+        """One symbol's ticks of a day in time order, compacted or not"""
+        dataset = self._day_dataset(day)
+        if dataset is None:
+            return TICK_SCHEMA.empty_table()
+        underlying = underlying_of(symbol, self.aliases)
+        table = dataset.to_table(
+            filter=(pc.field("underlying") == underlying) & (pc.field("symbol") == symbol))
+        return table.sort_by(SORT_KEYS)
+
+    def latest(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Last archived tick of a symbol, None if it has none on the most recent archived day"""
+        if not self._latest_loaded:
+            self._load_latest()
+        return self._latest.get(symbol)
+
+    def _load_latest(self):
+        """Seed the last tick cache with the most recent archived day, e.g. after a restart"""
+        days = sorted(set(self.segment_days()) | set(self.days()))
+        dataset = self._day_dataset(days[-1]) if days else None
+        if dataset is not None:
+            table = dataset.to_table().sort_by(SORT_KEYS)
+            if table.num_rows:
+                # Sorted by symbol, so each symbol's last tick ends its run
+                symbols = table["symbol"].to_numpy(zero_copy_only=False)
+                ends = np.flatnonzero(np.append(symbols[1:] != symbols[:-1], True))
+                for row in table.take(ends).to_pylist():
+                    # Ticks flushed meanwhile are newer
+                    self._latest.setdefault(row["symbol"], row)
+        self._latest_loaded = True
+
+    def _run(self):
+        last_check = 0.0
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Tick archive flush failed: {str(e)}")
+            if time.monotonic() - last_check > 60 and not self._compact_lock.locked():
+                last_check = time.monotonic()
+                if self.due_days():
+                    threading.Thread(target=self.compact_due, daemon=True, name="tick-compaction").start()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name="tick-archive")
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "pending": len(self._pending), "segment_days": self.segment_days(),
+                "last_compaction": self._last_compaction}
@@ -0,0 +1,273 @@
+"""
+Micro-benchmark of the live tick pipeline.
+
+Drives `main.on_message` (the server's ingest pipeline, one stage per
+sink) and a standalone `FyersWebsocketClient.on_message` (Redis write,
+Socket.IO emit, callback) with synthetic Fyers SymbolUpdate ticks and
+reports throughput, per-stage p50/p99 latency and bytes allocated per tick.
+
+    python tick_bench.py --symbols 200 --ticks 20000
+    python tick_bench.py --symbols 200 --rate 5000 --save-baseline
+    python tick_bench.py --symbols 200 --rate 5000   # fails on regression
+
+Baselines are stored per (target, symbols, rate) in a JSON file, so runs
+at different symbol counts never get compared with each other.
+"""
+import argparse
+import json
+import logging
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_BASELINE = Path(__file__).parent / "tick_bench_baseline.json"
+TARGETS = ("main", "fyers_ws")
+
+class SyntheticFeed:
+    """Random-walk ticks shaped like Fyers SymbolUpdate messages"""
+
+    def __init__(self, symbols: int = 50, seed: int = 0):
+        self._rng = random.Random(seed)
+        names = ["NSE:NIFTY50-INDEX", "NSE:NIFTYBANK-INDEX"]
+        strike = 20000
+        while len(names) < symbols:
+            names += [f"NSE:NIFTY25116{strike}CE", f"NSE:NIFTY25116{strike}PE"]
+            strike += 50
+        self.symbols = names[:symbols]
+        self._ltp = {symbol: self._rng.uniform(50, 500) for symbol in self.symbols}
+        self._volume = {symbol: 0 for symbol in self.symbols}
+
+    def tick(self, as_json: bool = True):
+        symbol = self._rng.choice(self.symbols)
+        prev = self._ltp[symbol]
+        ltp = round(max(0.05, prev + self._rng.gauss(0, 0.5)), 2)
+        self._ltp[symbol] = ltp
+        self._volume[symbol] += self._rng.randint(25, 2500)
+        message = {
+            "type": "sf",
+            "symbol": symbol,
+            "ltp": ltp,
+            "open_price": prev,
+            "high_price": max(prev, ltp),
+            "low_price": min(prev, ltp),
+            "prev_close_price": prev,
+            "ch": round(ltp - prev, 2),
+            "chp": round((ltp - prev) / prev * 100, 2),
+            "vol_traded_today": self._volume[symbol],
+            "exch_feed_time": int(time.time()),
+            "bid_price": round(ltp - 0.05, 2),
+            "ask_price": round(ltp + 0.05, 2),
+            "bid_size": self._rng.randint(25, 5000),
+            "ask_size": self._rng.randint(25, 5000),
+        }
+        return json.dumps(message) if as_json else message
+
+    def ticks(self, count: int, as_json: bool = True) -> List[Any]:
+        """Pre-generated ticks, so generation is not part of the timings"""
+        return [self.tick(as_json) for _ in range(count)]
+
+class StageTimer:
+    """Collects per-call durations for named stages"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[int]] = {}
+
+    def wrap(self, name: str, fn: Callable) -> Callable:
+        samples = self.samples.setdefault(name, [])
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                samples.append(time.perf_counter_ns() - start)
+        return timed
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        out = {}
+        for name, samples in self.samples.items():
+            if samples:
+                values = np.asarray(samples) / 1000
+                out[name] = {"p50_us": round(float(np.percentile(values, 50)), 2),
+                             "p99_us": round(float(np.percentile(values, 99)), 2)}
+        return out
+
+class MemoryRedis:
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def expire(self, key, seconds):
+        pass
+
+class NullSocketIO:
+    def emit(self, event, data=None, **kwargs):
+        pass
+
+def instrumented_pipeline(target: str, timer: StageTimer, workdir: Path):
+    """(entry point, restore) for a target with its stages instrumented"""
+    if target == "main":
+        import main
+        saved = (main.tick_archive.root, dict(main.ingest.sinks), main.ingest.recorder)
+        main.tick_archive.root = workdir
+        main.ingest.recorder = None
+        for name, sink in saved[1].items():
+            main.ingest.add_sink(name, timer.wrap(name, sink))
+
+        def restore():
+            main.tick_archive.flush()
+            main.tick_archive.root, main.ingest.sinks, main.ingest.recorder = saved
+        return main.ingest.on_message, restore
+
+    from fyers_ws import FyersWebsocketClient
+    redis_client, socketio = MemoryRedis(), NullSocketIO()
+    redis_client.set = timer.wrap("redis_set", redis_client.set)
+    socketio.emit = timer.wrap("emit", socketio.emit)
+    client = FyersWebsocketClient(access_token="bench", redis_client=redis_client, socketio=socketio)
+    client.set_callbacks(market_update_cb=timer.wrap("callback", lambda update: None))
+    return client.on_message, lambda: None
+
+def run_target(target: str, symbols: int = 50, ticks: int = 5000, rate: float = 0.0,
+               alloc_ticks: int = 1000, seed: int = 0, log_level: Optional[str] = "WARNING",
+               recorded: Optional[List[Any]] = None) -> Dict[str, Any]:
+    """
+    Benchmark one entry point.
+
+    `rate` paces ticks at that many per second (0 sends them back to back).
+    Allocation is measured in a separate tracemalloc pass so tracing does
+    not distort the latency numbers. The tick path only logs errors
+    (unparseable messages, failing sinks); `log_level` is applied after
+    the handlers are imported (None keeps theirs).
+    `recorded` messages (e.g. a journaled market open) replace the
+    synthetic feed; they are played once untimed to warm up, then timed.
+    """
+    feed = SyntheticFeed(symbols, seed)
+    if recorded is not None:
+        ticks = len(recorded)
+    with tempfile.TemporaryDirectory() as workdir:
+        timer = StageTimer()
+        handler, restore = instrumented_pipeline(target, timer, Path(workdir))
+        if log_level:
+            logging.getLogger().setLevel(log_level)
+        try:
+            # Warm up once per symbol so first-tick work (file creation, caches) is not timed
+            for message in recorded if recorded is not None else feed.ticks(symbols * 2):
+                handler(message)
+            for samples in timer.samples.values():
+                samples.clear()
+            total = timer.wrap("total", handler)
+
+            messages = recorded if recorded is not None else feed.ticks(ticks)
+            start = time.perf_counter()
+            for i, message in enumerate(messages):
+                if rate:
+                    delay = start + i / rate - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                total(message)
+            elapsed = time.perf_counter() - start
+            busy = sum(timer.samples["total"]) / 1e9
+            stages = timer.summary()
+
+            alloc_messages = recorded[:alloc_ticks] if recorded is not None else feed.ticks(alloc_ticks)
+            allocated = []
+            tracemalloc.start()
+            try:
+                for message in alloc_messages:
+                    before = tracemalloc.get_traced_memory()[0]
+                    tracemalloc.reset_peak()
+                    handler(message)
+                    allocated.append(tracemalloc.get_traced_memory()[1] - before)
+            finally:
+                tracemalloc.stop()
+        finally:
+            restore()
+
+    return {
+        "target": target,
+        "symbols": symbols,
+        "ticks": ticks,
+        "rate": rate,
+        "ticks_per_sec": round(ticks / elapsed, 1),
+        "capacity_ticks_per_sec": round(ticks / busy, 1) if busy else None,
+        "stages": stages,
+        "alloc_bytes_per_tick": {"p50": int(np.percentile(allocated, 50)), "mean": int(np.mean(allocated))}
+        if allocated else None,
+    }
+
+def baseline_key(result: Dict[str, Any]) -> str:
+    return f"{result['target']}:symbols={result['symbols']}:rate={result['rate']:g}"
+
+def compare_to_baseline(result: Dict[str, Any], baseline: Optional[Dict[str, Any]],
+                        tolerance: float = 0.3, min_delta_us: float = 1.0) -> List[str]:
+    """
+    Regressions beyond `tolerance` (fractional) against a saved result.
+
+    Latency changes under `min_delta_us` are ignored, sub-microsecond stages
+    are dominated by timer noise.
+    """
+    if not baseline:
+        return []
+    regressions = []
+    if baseline.get("capacity_ticks_per_sec") and result["capacity_ticks_per_sec"] is not None:
+        if result["capacity_ticks_per_sec"] < baseline["capacity_ticks_per_sec"] * (1 - tolerance):
+            regressions.append(f"capacity {result['capacity_ticks_per_sec']} ticks/s < "
+                               f"baseline {baseline['capacity_ticks_per_sec']}")
+    for stage, stats in result["stages"].items():
+        for metric, value in stats.items():
+            base = baseline.get("stages", {}).get(stage, {}).get(metric)
+            if base and value > base * (1 + tolerance) and value - base > min_delta_us:
+                regressions.append(f"{stage} {metric} {value} > baseline {base}")
+    base_alloc = (baseline.get("alloc_bytes_per_tick") or {}).get("mean")
+    alloc = (result.get("alloc_bytes_per_tick") or {}).get("mean")
+    if base_alloc and alloc is not None and alloc > base_alloc * (1 + tolerance):
+        regressions.append(f"alloc {alloc} B/tick > baseline {base_alloc}")
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Tick pipeline micro-benchmark")
+    parser.add_argument("--target", choices=TARGETS + ("all",), default="all")
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--ticks", type=int, default=5000)
+    parser.add_argument("--rate", type=float, default=0.0, help="ticks per second, 0 for back to back")
+    parser.add_argument("--alloc-ticks", type=int, default=1000)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    parser.add_argument("--log-level", default="WARNING", help="root log level while timing; the tick path only logs errors")
+    parser.add_argument("--journal", type=Path, nargs="+", help="benchmark on recorded feed journals instead")
+    args = parser.parse_args(argv)
+
+    recorded = None
+    if args.journal:
+        from feed_journal import read_journal
+        recorded = [message for path in sorted(args.journal) for _, _, message in read_journal(path)]
+
+    targets = TARGETS if args.target == "all" else (args.target,)
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    failed = False
+    for target in targets:
+        result = run_target(target, args.symbols, args.ticks, args.rate, args.alloc_ticks,
+                            log_level=args.log_level, recorded=recorded)
+        key = baseline_key(result)
+        regressions = compare_to_baseline(result, baselines.get(key), args.tolerance)
+        print(json.dumps({**result, "regressions": regressions}, indent=2))
+        failed |= bool(regressions)
+        if args.save_baseline:
+            baselines[key] = result
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(baselines, indent=2))
+        print(f"Saved baseline to {args.baseline}")
+    return 1 if failed and not args.save_baseline else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes, lower runs first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# (requests per second, burst) per endpoint class. Fyers allows 10/s and
+# 200/min per app, so the sustained rates together stay under 200/min.
+DEFAULT_LIMITS = {
+    "history": (2.0, 5),
+    "quotes": (1.0, 3),
+    "profile": (0.2, 1),
+}
+
+# Codes and messages Fyers answers a rate-limited request with
+THROTTLE_CODES = (429, -429)
+THROTTLE_MESSAGES = ("request limit reached", "rate limit exceeded", "too many requests")
+
+def is_throttled(response: Any) -> bool:
+    """Check if a Fyers response is a rate-limit rejection"""
+    if not isinstance(response, dict) or response.get('s') == 'ok':
+        return False
+    if response.get('code') in THROTTLE_CODES:
+        return True
+    message = str(response.get('message', '')).lower()
+    return any(phrase in message for phrase in THROTTLE_MESSAGES)
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)"""
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+class UpstreamScheduler:
+    """
+    Central gate for Fyers REST calls.
+
+    Each endpoint class has its own token bucket. Waiting callers are served
+    in priority order (interactive before background, FIFO within a lane),
+    identical in-flight calls are coalesced, and a throttling response pauses
+    the endpoint class before the call is retried. A lane can also be capped
+    below the endpoint limits (see `set_lane_rate`).
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[float, int]] = None, max_retries: int = 2,
+                 throttle_pause: float = 2.0):
+        self.max_retries = max_retries
+        self.throttle_pause = throttle_pause
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._waiting: Dict[str, list] = {}
+        self._metrics: Dict[str, Dict[str, Any]] = {}
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lane_interval: Dict[int, float] = {}
+        self._lane_next: Dict[int, float] = {}
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        for endpoint, (rate, burst) in (limits or DEFAULT_LIMITS).items():
+            self.set_limit(endpoint, rate, burst)
+
+    def set_limit(self, endpoint: str, rate: float, burst: int):
+        """Create or resize the bucket for an endpoint class"""
+        with self._cond:
+            bucket = self._buckets.get(endpoint)
+            if bucket:
+                bucket.rate, bucket.burst = rate, burst
+            else:
+                self._buckets[endpoint] = TokenBucket(rate, burst)
+                self._waiting[endpoint] = []
+                self._metrics[endpoint] = {
+                    "requests": 0, "coalesced": 0, "throttled": 0,
+                    "wait_total": 0.0, "wait_max": 0.0, "waits": deque(maxlen=1024)
+                }
+            self._cond.notify_all()
+
+    def set_lane_rate(self, priority: int, rate: Optional[float]):
+        """Cap a priority lane at `rate` calls per second across endpoints, None lifts the cap"""
+        with self._cond:
+            if rate:
+                self._lane_interval[priority] = 1 / rate
+            else:
+                self._lane_interval.pop(priority, None)
+                self._lane_next.pop(priority, None)
+            self._cond.notify_all()
+
+    def call(self, endpoint: str, fn: Callable, *args, key: Optional[Hashable] = None,
+             priority: int = INTERACTIVE, **kwargs) -> Any:
+        """Run fn under the endpoint's rate limit, sharing results for equal keys"""
+        if key is None:
+            return self._call(endpoint, fn, args, kwargs, priority)
+
+        with self._cond:
+            future = self._inflight.get(key)
+            if future is not None:
+                self._metrics[endpoint]["coalesced"] += 1
+                owner = False
+            else:
+                future = self._inflight[key] = Future()
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        try:
+            result = self._call(endpoint, fn, args, kwargs, priority)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._cond:
+                self._inflight.pop(key, None)
+
+    def _call(self, endpoint, fn, args, kwargs, priority):
+        for attempt in range(self.max_retries + 1):
+            self._acquire(endpoint, priority)
+            result = fn(*args, **kwargs)
+            if not is_throttled(result):
+                return result
+            self.penalize(endpoint, self.throttle_pause * (attempt + 1))
+            logger.warning(f"Fyers throttled {endpoint} request (attempt {attempt + 1}): {result}")
+        return result
+
+    def _acquire(self, endpoint: str, priority: int):
+        start = time.monotonic()
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            bucket = self._buckets[endpoint]
+            waiting = self._waiting[endpoint]
+            heapq.heappush(waiting, ticket)
+            while True:
+                timeout = None
+                if waiting[0] == ticket:
+                    now = time.monotonic()
+                    timeout = max(bucket.wait_time(now), self._lane_next.get(priority, 0.0) - now)
+                    if timeout <= 0:
+                        heapq.heappop(waiting)
+                        bucket.consume()
+                        if priority in self._lane_interval:
+                            self._lane_next[priority] = now + self._lane_interval[priority]
+                        self._cond.notify_all()
+                        break
+                self._cond.wait(timeout)
+
+            waited = time.monotonic() - start
+            metrics = self._metrics[endpoint]
+            metrics["requests"] += 1
+            metrics["wait_total"] += waited
+            metrics["wait_max"] = max(metrics["wait_max"], waited)
+            metrics["waits"].append(waited)
+
+    def penalize(self, endpoint: str, seconds: float):
+        """Pause an endpoint class after the broker rejected a request"""
+        with self._cond:
+            bucket = self._buckets[endpoint]
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + seconds)
+            bucket.tokens = 0
+            self._metrics[endpoint]["throttled"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-endpoint request counts, queue depth and wait time percentiles"""
+        with self._cond:
+            result = {}
+            for endpoint, metrics in self._metrics.items():
+                waits = sorted(metrics["waits"])
+                result[endpoint] = {
+                    "requests": metrics["requests"],
+                    "coalesced": metrics["coalesced"],
+                    "throttled": metrics["throttled"],
+                    "queued": len(self._waiting[endpoint]),
+                    "wait_avg_ms": round(metrics["wait_total"] / metrics["requests"] * 1000, 2) if metrics["requests"] else 0,
+                    "wait_p50_ms": round(waits[len(waits) // 2] * 1000, 2) if waits else 0,
+                    "wait_p99_ms": round(waits[int(len(waits) * 0.99)] * 1000, 2) if waits else 0,
+                    "wait_max_ms": round(metrics["wait_max"] * 1000, 2),
+                }
+            return result
+
+# Shared scheduler for every Fyers REST call in the process
+upstream_scheduler = UpstreamScheduler()
@@ -0,0 +1,134 @@
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from market_hours import IST, MARKET_CLOSE, MARKET_OPEN, is_trading_day, next_open, now_ist
+from upstream import BACKGROUND, UpstreamScheduler, upstream_scheduler
+
+logger = logging.getLogger(__name__)
+
+# A step gets the shared context dict, so later steps can use what earlier ones found
+WarmupStep = Tuple[str, Callable[[Dict[str, Any]], Any]]
+
+class WarmupScheduler:
+    """
+    Gets the server ready ahead of each session.
+
+    From `lead` seconds before the open of every trading day it runs its
+    steps once, in order (token, master, history, subscriptions in main).
+    A failing step is logged and the rest still run. Outside that window
+    and the session itself, background upstream calls are capped at
+    `offhours_rate` per second so backfills do not eat the broker's daily
+    request budget before the open.
+    """
+
+    def __init__(self, steps: List[WarmupStep], lead: float = 20 * 60, offhours_rate: Optional[float] = 0.5,
+                 scheduler: UpstreamScheduler = upstream_scheduler, poll_interval: float = 30):
+        self.steps = steps
+        self.lead = lead
+        self.offhours_rate = offhours_rate
+        self.scheduler = scheduler
+        self.poll_interval = poll_interval
+        self.last_day: Optional[str] = None
+        self.last_run: Dict[str, Any] = {}
+        self.throttled = False
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def window(self, day: date) -> Tuple[datetime, datetime]:
+        """(warmup start, session close) in IST for a day"""
+        start = IST.localize(datetime.combine(day, MARKET_OPEN)) - timedelta(seconds=self.lead)
+        return start, IST.localize(datetime.combine(day, MARKET_CLOSE))
+
+    def in_window(self, when: datetime) -> bool:
+        """Whether `when` lies between the warmup start and the close of a trading day"""
+        when = when.astimezone(IST)
+        start, close = self.window(when.date())
+        return is_trading_day(when) and start <= when <= close
+
+    def next_run(self, when: Optional[datetime] = None) -> datetime:
+        """When the next warmup will start"""
+        when = (when or now_ist()).astimezone(IST)
+        if self.in_window(when) and self.last_day != when.date().isoformat():
+            return when
+        return next_open(when + timedelta(seconds=self.lead)) - timedelta(seconds=self.lead)
+
+    def tick(self, when: Optional[datetime] = None) -> bool:
+        """Apply the off-hours throttle and run the warmup if it is due, returns whether it ran"""
+        when = (when or now_ist()).astimezone(IST)
+        active = self.in_window(when)
+        # A run sets the throttle itself and restores it when done
+        with self._run_lock:
+            self._set_throttle(not active)
+        if active and self.last_day != when.date().isoformat():
+            self.run_once(when)
+            return True
+        return False
+
+    def _set_throttle(self, throttled: bool):
+        if throttled != self.throttled and self.offhours_rate:
+            self.scheduler.set_lane_rate(BACKGROUND, self.offhours_rate if throttled else None)
+            logger.info(f"Background upstream calls {f'capped at {self.offhours_rate}/s' if throttled else 'uncapped'}")
+        self.throttled = throttled
+
+    def run_once(self, when: Optional[datetime] = None) -> Dict[str, Any]:
+        """Run every step now, regardless of the time of day"""
+        when = (when or now_ist()).astimezone(IST)
+        with self._run_lock:
+            # Warmup is background work too, but it should not crawl when forced off-hours
+            capped = self.throttled
+            self._set_throttle(False)
+            context: Dict[str, Any] = {}
+            results = {}
+            started = time.monotonic()
+            for name, step in self.steps:
+                step_start = time.monotonic()
+                try:
+                    step(context)
+                    results[name] = {"ok": True}
+                except Exception as e:
+                    logger.error(f"Warmup step {name} failed: {str(e)}")
+                    results[name] = {"ok": False, "error": str(e)}
+                results[name]["seconds"] = round(time.monotonic() - step_start, 3)
+            self.last_day = when.date().isoformat()
+            self.last_run = {
+                "started_at": when.isoformat(),
+                "seconds": round(time.monotonic() - started, 3),
+                "steps": results,
+                "symbols": len(context.get("symbols", [])),
+            }
+            logger.info(f"Warmup finished in {self.last_run['seconds']}s: {results}")
+            self._set_throttle(capped)
+            return self.last_run
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Warmup scheduler error: {str(e)}")
+            until_next = (self.next_run() - now_ist()).total_seconds()
+            self._stop.wait(min(self.poll_interval, max(until_next, 1)))
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name="warmup")
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._set_throttle(False)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "next_run": self.next_run().isoformat(),
+            "last_run": self.last_run,
+            "background_capped": self.throttled,
+        }
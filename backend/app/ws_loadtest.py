@@ -0,0 +1,362 @@
+"""
+Fan-out load test for the `/ws` and Socket.IO market data broadcasts.
+
+Runs the FastAPI app under uvicorn in this process with a synthetic feed
+driving its ingest pipeline (`main.on_message`, which fans out to both `/ws`
+and Socket.IO `market_update`), while worker processes connect the
+simulated clients. Each tick carries its send
+time, so clients measure tick -> client latency themselves; the report
+has latency percentiles plus dropped and late messages per transport.
+
+Every client draws a symbol set from `--mix`: `index` watches the index
+symbols only, `atm` one ATM CE/PE pair, `ladder` every leg. Both
+transports broadcast every tick, so a client counts the ticks of its own
+symbols and reports the rest as ignored; drops and latency are also
+broken down per profile.
+
+    python ws_loadtest.py --ws-clients 500 --sio-clients 500 --rate 200 --duration 10
+    python ws_loadtest.py --ws-clients 1000 --slow-fraction 0.1 --slow-delay 0.05
+    python ws_loadtest.py --mix index=0.2,atm=0.7,ladder=0.1
+
+Nothing leaves the machine: the Fyers token check is stubbed out and no
+upstream socket is opened.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing as mp
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from tick_bench import SyntheticFeed
+
+# Latency histogram buckets in milliseconds, log spaced from 0.1 ms to 100 s
+BUCKETS_MS = np.logspace(-1, 5, 241)
+# Symbol sets a simulated client can watch
+PROFILES = ("index", "atm", "ladder")
+DEFAULT_MIX = "index=0.5,atm=0.4,ladder=0.1"
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """`index=0.5,atm=0.4,ladder=0.1` as profile -> weight"""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in PROFILES:
+            raise ValueError(f"Unknown client profile {name!r}, expected one of {PROFILES}")
+        mix[name] = float(weight)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("Client mix needs a positive weight")
+    return mix
+
+def client_symbols(profile: str, symbols: List[str], rng: random.Random) -> List[str]:
+    """Symbols a client with `profile` watches, out of the SyntheticFeed symbols"""
+    indices = [symbol for symbol in symbols if symbol.endswith("-INDEX")]
+    legs = [symbol for symbol in symbols if not symbol.endswith("-INDEX")]
+    if profile == "index" or len(legs) < 2:
+        return indices
+    if profile == "atm":
+        # Legs come in CE, PE pairs along the ladder; ATM is near the middle
+        pairs = len(legs) // 2
+        pair = min(pairs - 1, max(0, pairs // 2 + rng.randint(-1, 1)))
+        return legs[2 * pair:2 * pair + 2]
+    return legs
+
+class ClientStats:
+    """Latency histogram and counters for one simulated client"""
+
+    def __init__(self, transport: str, late_ms: float, profile: str = "ladder",
+                 symbols: Optional[List[str]] = None):
+        self.transport = transport
+        self.late_ms = late_ms
+        self.profile = profile
+        # None watches everything
+        self.symbols = set(symbols) if symbols is not None else None
+        self.histogram = np.zeros(len(BUCKETS_MS) + 1, dtype=np.int64)
+        self.received = 0
+        self.ignored = 0
+        self.late = 0
+        self.connected = False
+        self.error: Optional[str] = None
+
+    def wants(self, symbol: str) -> bool:
+        if self.symbols is None or symbol in self.symbols:
+            return True
+        self.ignored += 1
+        return False
+
+    def record(self, latency_ms: float):
+        self.received += 1
+        self.late += latency_ms > self.late_ms
+        self.histogram[np.searchsorted(BUCKETS_MS, latency_ms)] += 1
+
+async def _ws_client(url: str, stats: ClientStats, read_delay: float, stop: asyncio.Event):
+    import websockets
+    try:
+        async with websockets.connect(url, max_queue=None) as ws:
+            stats.connected = True
+            while not stop.is_set():
+                try:
+                    message = await asyncio.wait_for(ws.recv(), timeout=0.2)
+                except asyncio.TimeoutError:
+                    continue
+                update = json.loads(message)
+                if not stats.wants(update["symbol"]):
+                    continue
+                # The ingest pipeline passes the feed's exch_feed_time through untouched
+                stats.record((time.time() - float(update["timestamp"])) * 1000)
+                if read_delay:
+                    await asyncio.sleep(read_delay)
+    except Exception as e:
+        stats.error = str(e)
+
+async def _sio_client(url: str, stats: ClientStats, read_delay: float, stop: asyncio.Event):
+    """
+    Minimal Socket.IO v5 client over a raw Engine.IO v4 websocket.
+
+    Much lighter per connection than socketio.AsyncClient, which is what
+    lets one worker hold thousands of clients, and needs no aiohttp.
+    """
+    import websockets
+    try:
+        async with websockets.connect(url.replace("http", "ws") + "/socket.io/?EIO=4&transport=websocket",
+                                      max_queue=None) as ws:
+            await ws.recv()         # Engine.IO open
+            await ws.send("40")     # Socket.IO connect to the default namespace
+            while not stop.is_set():
+                try:
+                    packet = await asyncio.wait_for(ws.recv(), timeout=0.2)
+                except asyncio.TimeoutError:
+                    continue
+                if packet == "2":
+                    await ws.send("3")
+                elif packet.startswith("40"):
+                    stats.connected = True
+                elif packet.startswith("42"):
+                    event, data = json.loads(packet[2:])[:2]
+                    if event == "market_update" and stats.wants(data["symbol"]):
+                        # The ingest pipeline stamps ticks in ms when it receives them
+                        stats.record(time.time() * 1000 - data["timestamp"])
+                        if read_delay:
+                            await asyncio.sleep(read_delay)
+    except Exception as e:
+        stats.error = str(e)
+
+async def _run_worker(base_url: str, ws_clients: int, sio_clients: int, slow_every: int, slow_delay: float,
+                      late_ms: float, symbols: int, mix: Dict[str, float], seed: int,
+                      ready, stop_event) -> List[ClientStats]:
+    stop = asyncio.Event()
+    clients, tasks = [], []
+    rng = random.Random(seed)
+    feed_symbols = SyntheticFeed(symbols).symbols
+    for i in range(ws_clients + sio_clients):
+        transport = "ws" if i < ws_clients else "socketio"
+        profile = rng.choices(list(mix), weights=list(mix.values()))[0]
+        stats = ClientStats(transport, late_ms, profile, client_symbols(profile, feed_symbols, rng))
+        delay = slow_delay if slow_every and i % slow_every == 0 else 0.0
+        if transport == "ws":
+            coro = _ws_client(base_url.replace("http", "ws") + "/ws", stats, delay, stop)
+        else:
+            coro = _sio_client(base_url, stats, delay, stop)
+        clients.append(stats)
+        tasks.append(asyncio.create_task(coro))
+        # Stagger connects so the accept queue is not flooded
+        if i % 50 == 49:
+            await asyncio.sleep(0.05)
+
+    deadline = time.time() + 30
+    while time.time() < deadline and not all(c.connected or c.error for c in clients):
+        await asyncio.sleep(0.1)
+    ready.put(sum(c.connected for c in clients))
+    while not stop_event.is_set():
+        await asyncio.sleep(0.1)
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return clients
+
+def client_worker(base_url: str, ws_clients: int, sio_clients: int, slow_every: int, slow_delay: float,
+                  late_ms: float, symbols: int, mix: Dict[str, float], seed: int, ready, stop_event, results):
+    """Process entry point: run a share of the clients and report their stats"""
+    clients = asyncio.run(_run_worker(base_url, ws_clients, sio_clients, slow_every, slow_delay,
+                                      late_ms, symbols, mix, seed, ready, stop_event))
+    results.put([{"transport": c.transport, "profile": c.profile, "symbols": sorted(c.symbols) if c.symbols is not None else None,
+                  "received": c.received, "ignored": c.ignored, "late": c.late,
+                  "connected": c.connected, "error": c.error, "histogram": c.histogram.tolist()}
+                 for c in clients])
+
+def _percentile(histogram: np.ndarray, q: float) -> Optional[float]:
+    total = histogram.sum()
+    if not total:
+        return None
+    idx = int(np.searchsorted(np.cumsum(histogram), q / 100 * total))
+    return round(float(BUCKETS_MS[min(idx, len(BUCKETS_MS) - 1)]), 2)
+
+def expected_messages(client: Dict[str, Any], sent: Dict[str, int]) -> int:
+    """Ticks sent for the symbols a client watches (all of them when it has no set)"""
+    if client.get("symbols") is None:
+        return sum(sent.values())
+    return sum(sent.get(symbol, 0) for symbol in client["symbols"])
+
+def _group_report(group: List[Dict[str, Any]], sent: Dict[str, int]) -> Dict[str, Any]:
+    histogram = np.sum([c["histogram"] for c in group], axis=0)
+    connected = [c for c in group if c["connected"]]
+    received = sum(c["received"] for c in connected)
+    wanted = sum(expected_messages(c, sent) for c in connected)
+    return {
+        "clients": len(group),
+        "connected": len(connected),
+        "expected_messages": wanted,
+        "received_messages": received,
+        "ignored_messages": sum(c.get("ignored", 0) for c in connected),
+        "dropped": max(wanted - received, 0),
+        "dropped_pct": round(100 * max(wanted - received, 0) / wanted, 3) if wanted else None,
+        "late": sum(c["late"] for c in connected),
+        "latency_ms": {f"p{q}": _percentile(histogram, q) for q in (50, 90, 99, 99.9)},
+    }
+
+def summarize(clients: List[Dict[str, Any]], sent: Dict[str, int]) -> Dict[str, Any]:
+    """Per-transport and per-profile latency percentiles (histogram bucket upper bounds) and loss"""
+    report = {}
+    for transport in ("ws", "socketio"):
+        group = [c for c in clients if c["transport"] == transport]
+        if not group:
+            continue
+        report[transport] = {
+            **_group_report(group, sent),
+            "connect_errors": sorted({c["error"] for c in group if c["error"] and not c["connected"]})[:5],
+            "profiles": {
+                profile: _group_report([c for c in group if c.get("profile") == profile], sent)
+                for profile in PROFILES if any(c.get("profile") == profile for c in group)
+            },
+        }
+    return report
+
+class LoadTestServer:
+    """The real app under uvicorn on a background thread, with a stubbed Fyers login"""
+
+    def __init__(self, port: int):
+        import uvicorn
+        import main
+
+        self.main = main
+        main.ensure_valid_token = lambda: None
+        # Keep synthetic ticks out of the real archive
+        self._cache_dir = tempfile.TemporaryDirectory()
+        main.tick_archive.root = Path(self._cache_dir.name)
+        main.ingest.recorder = None
+        # Startup and warmup log at INFO; keep the report readable
+        logging.getLogger().setLevel(logging.WARNING)
+        self.server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def start(self, timeout: float = 30):
+        self.thread.start()
+        deadline = time.time() + timeout
+        while not self.server.started:
+            if time.time() > deadline:
+                raise RuntimeError("uvicorn did not start")
+            time.sleep(0.05)
+
+    def run_feed(self, symbols: int, rate: float, duration: float) -> Counter:
+        """Send ticks through the ingest pipeline at `rate` per second, returns the count per symbol"""
+        feed = SyntheticFeed(symbols)
+        sent = Counter()
+        count = int(rate * duration)
+        start = time.perf_counter()
+        for i in range(count):
+            delay = start + i / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            tick = feed.tick(as_json=False)
+            tick["exch_feed_time"] = time.time()
+            self.main.on_message(tick)
+            sent[tick["symbol"]] += 1
+        return sent
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+        self._cache_dir.cleanup()
+
+def run_load_test(ws_clients: int = 100, sio_clients: int = 100, workers: int = 4, symbols: int = 50,
+                  rate: float = 100, duration: float = 5, slow_fraction: float = 0.0, slow_delay: float = 0.05,
+                  late_ms: float = 250, grace: float = 2.0, mix: str = DEFAULT_MIX,
+                  seed: int = 0) -> Dict[str, Any]:
+    weights = parse_mix(mix)
+    port = free_port()
+    server = LoadTestServer(port)
+    server.start()
+
+    ctx = mp.get_context("spawn")
+    ready, results, stop_event = ctx.Queue(), ctx.Queue(), ctx.Event()
+    slow_every = int(round(1 / slow_fraction)) if slow_fraction else 0
+    processes = []
+    for w in range(workers):
+        share_ws = ws_clients // workers + (w < ws_clients % workers)
+        share_sio = sio_clients // workers + (w < sio_clients % workers)
+        process = ctx.Process(target=client_worker, daemon=True,
+                              args=(f"http://127.0.0.1:{port}", share_ws, share_sio, slow_every, slow_delay,
+                                    late_ms, symbols, weights, seed + w, ready, stop_event, results))
+        process.start()
+        processes.append(process)
+
+    connected = sum(ready.get(timeout=120) for _ in processes)
+    started = time.time()
+    sent = server.run_feed(symbols, rate, duration)
+    feed_seconds = time.time() - started
+    time.sleep(grace)
+    stop_event.set()
+    clients = [client for _ in processes for client in results.get(timeout=120)]
+    for process in processes:
+        process.join(timeout=10)
+    server.stop()
+
+    return {
+        "config": {"ws_clients": ws_clients, "sio_clients": sio_clients, "workers": workers, "symbols": symbols,
+                   "rate": rate, "duration": duration, "slow_fraction": slow_fraction, "slow_delay": slow_delay,
+                   "late_ms": late_ms, "mix": weights},
+        "connected": connected,
+        "ticks_sent": sum(sent.values()),
+        "feed_ticks_per_sec": round(sum(sent.values()) / feed_seconds, 1),
+        "transports": summarize(clients, sent),
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="WebSocket / Socket.IO fan-out load test")
+    parser.add_argument("--ws-clients", type=int, default=100)
+    parser.add_argument("--sio-clients", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=4, help="client processes")
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=100, help="feed ticks per second")
+    parser.add_argument("--duration", type=float, default=5, help="feed seconds")
+    parser.add_argument("--slow-fraction", type=float, default=0.0, help="share of clients that read slowly")
+    parser.add_argument("--slow-delay", type=float, default=0.05, help="seconds a slow client spends per message")
+    parser.add_argument("--late-ms", type=float, default=250, help="latency above which a message counts as late")
+    parser.add_argument("--grace", type=float, default=2.0, help="seconds to drain after the feed stops")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="client profile weights, e.g. index=0.5,atm=0.4,ladder=0.1")
+    parser.add_argument("--seed", type=int, default=0, help="seed for drawing client profiles")
+    args = parser.parse_args(argv)
+
+    report = run_load_test(args.ws_clients, args.sio_clients, args.workers, args.symbols, args.rate,
+                           args.duration, args.slow_fraction, args.slow_delay, args.late_ms, args.grace,
+                           args.mix, args.seed)
+    print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,24 +13,6 @@ import { Switch } from "@/components/ui/switch"
 import { Socket } from 'socket.io-client'
 import io from 'socket.io-client'
 
-// Add market update interface
-interface MarketUpdate {
-  symbol: string
-  timestamp: number
-  ltp: number
-  open: number
-  high: number
-  low: number
-  close: number
-  volume: number
-  bid: number
-  ask: number
-  bid_qty: number
-  ask_qty: number
-  change: number
-  change_percent: number
-}
-
 const BACKEND_URL = process.env.NEXT_PUBLIC_BACKEND_URL || 'http://localhost:8000'
 const socket = io(BACKEND_URL)
 
@@ -74,6 +56,22 @@ const formatDate = (dateStr: string) => {
   return `${year}-${month}-${day} ${hours}:${minutes}`
 }
 
+// Replace the forming bar or append the next one
+const mergeBars = (
+  data: [string, number, number, number, number, number][],
+  bars: [string, number, number, number, number, number][]
+): [string, number, number, number, number, number][] => {
+  const merged = [...data]
+  bars.forEach(bar => {
+    if (merged.length > 0 && merged[merged.length - 1][0] === bar[0]) {
+      merged[merged.length - 1] = bar
+    } else {
+      merged.push(bar)
+    }
+  })
+  return merged
+}
+
 const resampleData = (
   data: [string, number, number, number, number, number][],
   timeframeMinutes: number
@@ -207,75 +205,77 @@ export default function ModernChart() {
       pe: false
     }
   })
-  // Add state for live data
-  const [liveData, setLiveData] = useState<{[key: string]: MarketUpdate}>({})
-  const subscribedSymbols = useRef<Set<string>>(new Set())
-
-  // Function to subscribe to symbols
-  const subscribeToSymbols = async (symbols: string[]) => {
-    try {
-      // Filter out already subscribed symbols
-      const newSymbols = symbols.filter(s => !subscribedSymbols.current.has(s))
-      if (newSymbols.length === 0) return
-
-      console.log('Subscribing to symbols:', newSymbols)
-      
-      const response = await fetch(`${BACKEND_URL}/subscribe`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({ symbols: newSymbols }),
-      })
-
-      if (!response.ok) {
-        throw new Error('Failed to subscribe to symbols')
-      }
-
-      // Add to subscribed set
-      newSymbols.forEach(s => subscribedSymbols.current.add(s))
-    } catch (error) {
-      console.error('Error subscribing to symbols:', error)
+  // Chart session: history, then sequenced bar updates on the socket
+  const chartSession = useRef<{ id: number, seq: number, index: string, strike: string } | null>(null)
+  const pendingBars = useRef<{
+    ce: [string, number, number, number, number, number][],
+    pe: [string, number, number, number, number, number][]
+  }>({ ce: [], pe: [] })
+  const flushTimer = useRef<ReturnType<typeof setTimeout> | null>(null)
+
+  const openChart = (index: string, strike: string) => {
+    const previous = chartSession.current
+    if (previous) {
+      socket.emit('close_chart', { chart: String(previous.id) })
     }
+    const id = (previous?.id ?? 0) + 1
+    chartSession.current = { id, seq: -1, index, strike }
+    pendingBars.current = { ce: [], pe: [] }
+    // The server subscribes the legs and holds them while the session is open
+    socket.emit('open_chart', { chart: String(id), index, strike, resolution: '1' }, (reply: any) => {
+      if (reply?.status !== 'success') {
+        console.error('Error opening chart session:', reply?.detail)
+        setIsLoading(false)
+      }
+    })
   }
 
-  // Update socket handler with proper typing
+  // Chart session events
   useEffect(() => {
-    socket.on('market_update', (data: MarketUpdate) => {
-      console.log('Received market update:', data)
-      setLiveData(prev => ({
-        ...prev,
-        [data.symbol]: data
-      }))
+    // A new socket id holds no sessions, open the current chart again
+    socket.on('connect', () => {
+      const session = chartSession.current
+      if (session) {
+        openChart(session.index, session.strike)
+      }
     })
 
-    return () => {
-      socket.off('market_update')
-    }
-  }, [])
-
-  // Update chart with live data
-  useEffect(() => {
-    if (chartInstance.current && Object.keys(liveData).length > 0) {
-      const option = chartInstance.current.getOption()
-      const series = option.series as any[]
-      let updated = false
-
-      series.forEach((s: any) => {
-        if (liveData[s.name]) {
-          const lastIndex = s.data.length - 1
-          if (lastIndex >= 0) {
-            s.data[lastIndex] = liveData[s.name].ltp
-            updated = true
-          }
-        }
-      })
+    socket.on('chart_history', (data: any) => {
+      const session = chartSession.current
+      if (!session || data.chart !== String(session.id)) return
+      session.seq = data.seq
+      pendingBars.current = { ce: [], pe: [] }
+      console.log(`Chart history for ${data.ce_symbol} / ${data.pe_symbol} up to seq ${data.seq}`)
+      setRawCEData(data.ce)
+      setRawPEData(data.pe)
+      setIsLoading(false)
+    })
 
-      if (updated) {
-        chartInstance.current.setOption({ series })
+    socket.on('chart_update', (data: any) => {
+      const session = chartSession.current
+      // Updates continue the history, anything up to its seq is already drawn
+      if (!session || data.chart !== String(session.id) || data.seq <= session.seq) return
+      session.seq = data.seq
+      if (data.ce) pendingBars.current.ce.push(data.ce)
+      if (data.pe) pendingBars.current.pe.push(data.pe)
+      // Redraw at most every 250ms however fast the legs tick
+      if (!flushTimer.current) {
+        flushTimer.current = setTimeout(() => {
+          flushTimer.current = null
+          const { ce, pe } = pendingBars.current
+          pendingBars.current = { ce: [], pe: [] }
+          if (ce.length > 0) setRawCEData(prev => mergeBars(prev, ce))
+          if (pe.length > 0) setRawPEData(prev => mergeBars(prev, pe))
+        }, 250)
       }
+    })
+
+    return () => {
+      socket.off('connect')
+      socket.off('chart_history')
+      socket.off('chart_update')
     }
-  }, [liveData])
+  }, [])
 
   const fetchStrikePrices = async (index: string) => {
     try {
@@ -297,30 +297,15 @@ export default function ModernChart() {
     }
   }
 
-  // Modify handleChartUpdate to subscribe to symbols
-  const handleChartUpdate = async () => {
-    try {
-      if (!selectedStrike) {
-        console.log('No strike selected, skipping chart update')
-        return
-      }
-
-      setIsLoading(true)
-      const response = await fetch(`${BACKEND_URL}/historical_straddle/${selectedIndex}/${selectedStrike}`)
-      if (!response.ok) throw new Error('Failed to fetch chart data')
-      
-      const data = await response.json()
-      
-      // Subscribe to CE and PE symbols
-      const symbolsToSubscribe = [data.ce_data.symbol, data.pe_data.symbol]
-      await subscribeToSymbols(symbolsToSubscribe)
-      
-      processChartData(data)
-    } catch (error) {
-      console.error('Error updating chart:', error)
-    } finally {
-      setIsLoading(false)
+  // Open a chart session for the selected strike
+  const handleChartUpdate = () => {
+    if (!selectedStrike) {
+      console.log('No strike selected, skipping chart update')
+      return
     }
+
+    setIsLoading(true)
+    openChart(selectedIndex, selectedStrike)
   }
 
   // Load initial data and setup chart
@@ -338,44 +323,6 @@ export default function ModernChart() {
     }
   }, [selectedStrike])
 
-  const processChartData = (data: any) => {
-    // Get symbols directly from response
-    const ceSymbol = data.ce_data.symbol
-    const peSymbol = data.pe_data.symbol
-    
-    // Store raw data
-    setRawCEData(data.ce_data.data)
-    setRawPEData(data.pe_data.data)
-    
-    console.log(`Raw Data Points - ${ceSymbol}:`, data.ce_data.data.length)
-    console.log(`Raw Data Points - ${peSymbol}:`, data.pe_data.data.length)
-    
-    // Filter and resample data
-    const timeframeMinutes = parseInt(selectedTimeframe)
-    let resampledCEData = resampleData(data.ce_data.data, timeframeMinutes)
-    let resampledPEData = resampleData(data.pe_data.data, timeframeMinutes)
-
-    // Sort data in ascending order
-    resampledCEData.sort((a, b) => new Date(a[0]).getTime() - new Date(b[0]).getTime())
-    resampledPEData.sort((a, b) => new Date(a[0]).getTime() - new Date(b[0]).getTime())
-    
-    // Create straddle data
-    const straddleData = createStraddleData(resampledCEData, resampledPEData)
-    
-    if (chartInstance.current) {
-      const timestamps = straddleData.map(d => String(d[0]))
-      updateChartWithData(
-        chartInstance.current, 
-        timestamps, 
-        straddleData, 
-        resampledCEData, 
-        resampledPEData,
-        ceSymbol,
-        peSymbol
-      )
-    }
-  }
-
   const createStraddleData = (
     resampledCEData: [string, number, number, number, number, number][],
     resampledPEData: [string, number, number, number, number, number][]